@@ -1,5 +1,8 @@
 import numpy as np
-from sympl import Stepper, DataArray, datetime, timedelta
+from sympl import (
+    Stepper, TendencyComponent, AdamsBashforth, DataArray, datetime, timedelta)
+import subprocess
+import sys
 import time
 
 class BenchmarkStepper(Stepper):
@@ -18,6 +21,35 @@ class BenchmarkStepper(Stepper):
             new_state[key] = state[key] + 1.0
         return {}, new_state
 
+class BenchmarkTendencyComponent(TendencyComponent):
+    input_properties = {}
+    tendency_properties = {}
+    diagnostic_properties = {}
+
+    def __init__(self, properties, shape):
+        self.input_properties = properties
+        self.tendency_properties = {
+            key: {'dims': value['dims'], 'units': value['units'] + ' s^-1'}
+            for key, value in properties.items()}
+        self.tendencies = {
+            key: np.random.rand(*shape) for key in properties}
+        super().__init__()
+
+    def array_call(self, state):
+        return self.tendencies, {}
+
+def run_import_benchmark(n_runs=10):
+    # Each run imports sympl in a new interpreter, as a worker process would
+    print(f"\nRunning benchmark (import sympl) in {n_runs} new interpreters...")
+    code = (
+        "import time; start_time = time.perf_counter(); import sympl; "
+        "print(time.perf_counter() - start_time)")
+    durations = [
+        float(subprocess.check_output([sys.executable, '-W', 'ignore', '-c', code]))
+        for _ in range(n_runs)]
+    print(f"Mean import time: {np.mean(durations):.4f} seconds")
+    print(f"Min import time: {min(durations):.4f} seconds")
+
 def run_benchmark():
     nx, ny, nz = 50, 50, 50
     n_steps = 1000
@@ -79,5 +111,55 @@ def run_benchmark():
     print(f"Total time: {duration:.4f} seconds")
     print(f"Time per step: {duration / n_steps:.6f} seconds")
 
+    # Case 3: Unit conversion needed on every call
+    print(f"\nRunning benchmark (Unit conversion) with shape {shape} for {n_steps} steps...")
+    properties_converted = {
+        'x_velocity': {'dims': ['x', 'y', 'z'], 'units': 'km s^-1'},
+        'y_velocity': {'dims': ['x', 'y', 'z'], 'units': 'km s^-1'},
+        'temperature': {'dims': ['x', 'y', 'z'], 'units': 'degC'},
+    }
+    stepper_converted = BenchmarkStepper(properties_converted)
+
+    state = {
+        'time': datetime(2023, 1, 1),
+        'x_velocity': DataArray(np.random.rand(*shape), dims=dims, attrs={'units': 'm s^-1'}),
+        'y_velocity': DataArray(np.random.rand(*shape), dims=dims, attrs={'units': 'm s^-1'}),
+        'temperature': DataArray(np.random.rand(*shape), dims=dims, attrs={'units': 'K'}),
+    }
+
+    start_time = time.time()
+    for _ in range(n_steps):
+        # state is not replaced, so that its units differ from the stepper's on every call
+        stepper_converted(state, timestep)
+    end_time = time.time()
+    duration = end_time - start_time
+    print(f"Total time: {duration:.4f} seconds")
+    print(f"Time per step: {duration / n_steps:.6f} seconds")
+
+    # Case 4: Third-order Adams-Bashforth, default and in-place
+    for in_place in (False, True):
+        print(f"\nRunning benchmark (AdamsBashforth, in_place={in_place}) with shape {shape} for {n_steps} steps...")
+        stepper_bashforth = AdamsBashforth(
+            BenchmarkTendencyComponent(properties_matching, shape), order=3,
+            in_place=in_place)
+
+        state = {
+            'time': datetime(2023, 1, 1),
+            'x_velocity': DataArray(np.random.rand(*shape), dims=dims, attrs={'units': 'm s^-1'}),
+            'y_velocity': DataArray(np.random.rand(*shape), dims=dims, attrs={'units': 'm s^-1'}),
+            'temperature': DataArray(np.random.rand(*shape), dims=dims, attrs={'units': 'K'}),
+        }
+
+        start_time = time.time()
+        for _ in range(n_steps):
+            _, new_state = stepper_bashforth(state, timestep)
+            new_state['time'] = state['time'] + timestep
+            state = new_state
+        end_time = time.time()
+        duration = end_time - start_time
+        print(f"Total time: {duration:.4f} seconds")
+        print(f"Time per step: {duration / n_steps:.6f} seconds")
+
 if __name__ == "__main__":
+    run_import_benchmark()
     run_benchmark()
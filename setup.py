@@ -31,6 +31,7 @@ setup(
     packages=['sympl'],
     include_package_data=True,
     install_requires=requirements,
+    python_requires='>=3.8',
     license="BSD license",
     zip_safe=True,
     keywords='sympl',
@@ -39,11 +40,8 @@ setup(
         'Intended Audience :: Developers',
         'License :: OSI Approved :: BSD License',
         'Natural Language :: English',
-        "Programming Language :: Python :: 2",
-        'Programming Language :: Python :: 2.7',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
+        'Programming Language :: Python :: 3.8',
     ],
     test_suite='tests',
     tests_require=test_requirements
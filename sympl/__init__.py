@@ -12,9 +12,16 @@ from ._components import (
     RelaxationTendencyComponent,
     RestartMonitor,
     TimeDifferencingWrapper,
+    ZarrMonitor,
 )
 from ._components.timesteppers import AdamsBashforth, Leapfrog, SSPRungeKutta
-from ._core.backend import DataArrayBackend, StateBackend, get_backend, set_backend
+from ._core.backend import (
+    DataArrayBackend,
+    NumpyBackend,
+    StateBackend,
+    get_backend,
+    set_backend,
+)
 from ._core.base_components import (
     DiagnosticComponent,
     ImplicitTendencyComponent,
@@ -35,7 +42,7 @@ from ._core.constants import (
     set_condensible_name,
     set_constant,
 )
-from ._core.dataarray import DataArray
+from ._core.quantity_array import QuantityArray
 from ._core.exceptions import (
     ComponentExtraOutputError,
     ComponentMissingOutputError,
@@ -44,6 +51,10 @@ from ._core.exceptions import (
     InvalidStateError,
     SharedKeyError,
 )
+from ._core.state import axpby
+from ._core.ensemble import (
+    get_ensemble_member, stack_ensemble_members, EnsembleRunner,
+    EnsembleMemberResult)
 from ._core.tendencystepper import TendencyStepper
 from ._core.time import datetime, timedelta
 from ._core.tracers import (
@@ -61,63 +72,82 @@ from ._core.util import (
     restore_dimensions,
 )
 from ._core.wrappers import ScalingWrapper, UpdateFrequencyWrapper
+from ._core.decomposition import DomainDecompositionWrapper
 
 __version__ = "0.4.1"
 __all__ = (
-    TendencyComponent,
-    DiagnosticComponent,
-    Stepper,
-    Monitor,
-    TendencyComponentComposite,
-    ImplicitTendencyComponentComposite,
-    DiagnosticComponentComposite,
-    MonitorComposite,
-    ImplicitTendencyComponent,
-    TendencyStepper,
-    Leapfrog,
-    AdamsBashforth,
-    SSPRungeKutta,
-    InvalidStateError,
-    SharedKeyError,
-    DependencyError,
-    InvalidPropertyDictError,
-    ComponentExtraOutputError,
-    ComponentMissingOutputError,
-    units_are_same,
-    units_are_compatible,
-    is_valid_unit,
-    DataArray,
-    get_constant,
-    set_constant,
-    set_condensible_name,
-    reset_constants,
-    get_constants_string,
-    TimeDifferencingWrapper,
-    ensure_no_shared_keys,
-    set_backend,
-    get_backend,
-    StateBackend,
-    DataArrayBackend,
-    get_numpy_array,
-    jit,
-    register_tracer,
-    get_tracer_unit_dict,
-    get_tracer_input_properties,
-    get_tracer_names,
-    restore_dimensions,
-    get_numpy_arrays_with_properties,
-    restore_data_arrays_with_properties,
-    initialize_numpy_arrays_with_properties,
-    get_component_aliases,
-    combine_component_properties,
-    PlotFunctionMonitor,
-    NetCDFMonitor,
-    RestartMonitor,
-    ConstantTendencyComponent,
-    ConstantDiagnosticComponent,
-    RelaxationTendencyComponent,
-    UpdateFrequencyWrapper,
-    ScalingWrapper,
-    datetime,
-    timedelta,
+    "TendencyComponent",
+    "DiagnosticComponent",
+    "Stepper",
+    "Monitor",
+    "TendencyComponentComposite",
+    "ImplicitTendencyComponentComposite",
+    "DiagnosticComponentComposite",
+    "MonitorComposite",
+    "ImplicitTendencyComponent",
+    "TendencyStepper",
+    "Leapfrog",
+    "AdamsBashforth",
+    "SSPRungeKutta",
+    "InvalidStateError",
+    "SharedKeyError",
+    "DependencyError",
+    "InvalidPropertyDictError",
+    "ComponentExtraOutputError",
+    "ComponentMissingOutputError",
+    "units_are_same",
+    "units_are_compatible",
+    "is_valid_unit",
+    "DataArray",
+    "get_constant",
+    "set_constant",
+    "set_condensible_name",
+    "reset_constants",
+    "get_constants_string",
+    "TimeDifferencingWrapper",
+    "ensure_no_shared_keys",
+    "set_backend",
+    "get_backend",
+    "StateBackend",
+    "DataArrayBackend",
+    "NumpyBackend",
+    "QuantityArray",
+    "get_numpy_array",
+    "jit",
+    "register_tracer",
+    "get_tracer_unit_dict",
+    "get_tracer_input_properties",
+    "get_tracer_names",
+    "restore_dimensions",
+    "get_numpy_arrays_with_properties",
+    "restore_data_arrays_with_properties",
+    "initialize_numpy_arrays_with_properties",
+    "get_component_aliases",
+    "combine_component_properties",
+    "PlotFunctionMonitor",
+    "NetCDFMonitor",
+    "RestartMonitor",
+    "ZarrMonitor",
+    "ConstantTendencyComponent",
+    "ConstantDiagnosticComponent",
+    "RelaxationTendencyComponent",
+    "UpdateFrequencyWrapper",
+    "ScalingWrapper",
+    "DomainDecompositionWrapper",
+    "datetime",
+    "timedelta",
+    "axpby",
+    "get_ensemble_member",
+    "stack_ensemble_members",
+    "EnsembleRunner",
+    "EnsembleMemberResult",
 )
+
+
+def __getattr__(name):
+    # DataArray subclasses xarray.DataArray, so xarray (which is slow to
+    # import) is only imported when DataArray is first used.
+    if name == "DataArray":
+        from ._core.dataarray import DataArray
+        return DataArray
+    raise AttributeError("module {} has no attribute {}".format(__name__, name))
@@ -1,4 +1,5 @@
 from .netcdf import NetCDFMonitor, RestartMonitor
+from .zarr_monitor import ZarrMonitor
 from .plot import PlotFunctionMonitor
 from .basic import (
     ConstantTendencyComponent, ConstantDiagnosticComponent, RelaxationTendencyComponent,
@@ -6,6 +7,6 @@ from .basic import (
 
 __all__ = (
     PlotFunctionMonitor,
-    NetCDFMonitor, RestartMonitor,
+    NetCDFMonitor, RestartMonitor, ZarrMonitor,
     ConstantTendencyComponent, ConstantDiagnosticComponent, RelaxationTendencyComponent,
     TimeDifferencingWrapper)
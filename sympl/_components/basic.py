@@ -1,6 +1,6 @@
-from .._core.dataarray import DataArray
+from .._core.quantity_array import QuantityArray, is_dataarray
 from .._core.base_components import ImplicitTendencyComponent, TendencyComponent, DiagnosticComponent
-from .._core.units import unit_registry as ureg
+from .._core.units import get_unit_registry
 
 
 class ConstantTendencyComponent(TendencyComponent):
@@ -278,6 +278,7 @@ class RelaxationTendencyComponent(TendencyComponent):
 
     @property
     def tendency_properties(self):
+        ureg = get_unit_registry()
         return {
             self._quantity_name: {
                 'dims': ['*'],
@@ -409,7 +410,7 @@ class TimeDifferencingWrapper(ImplicitTendencyComponent):
         tendencies = {}
         timestep_seconds = timestep.total_seconds()
         for varname, data_array in new_state.items():
-            if isinstance(data_array, DataArray):
+            if isinstance(data_array, QuantityArray) or is_dataarray(data_array):
                 if varname in self._implicit.output_properties.keys():
                     if varname not in state.keys():
                         raise RuntimeError(
@@ -0,0 +1,269 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+import numpy as np
+from .._core.quantity_array import is_quantity
+from .._core.time import get_cftime
+from .._core.util import get_json_attrs
+
+# Name of the file in a checkpoint directory describing its contents.
+MANIFEST_FILENAME = 'manifest.json'
+
+# Version of the checkpoint directory layout, stored in its manifest.
+CHECKPOINT_VERSION = 1
+
+# Directory within an incremental checkpoint holding its arrays, each in a
+# file named by the hash of its contents.
+OBJECTS_DIRNAME = 'objects'
+
+
+def is_npy_checkpoint(path):
+    """Returns True if path is a checkpoint directory written by
+    write_npy_checkpoint."""
+    return os.path.isfile(os.path.join(path, MANIFEST_FILENAME))
+
+
+def encode_time(time):
+    """Returns a dictionary describing a model time, which can be stored
+    as JSON and converted back to the time with decode_time."""
+    if isinstance(time, timedelta):
+        return {
+            'type': 'timedelta', 'days': time.days, 'seconds': time.seconds,
+            'microseconds': time.microseconds}
+    fields = [
+        time.year, time.month, time.day, time.hour, time.minute, time.second,
+        time.microsecond]
+    if isinstance(time, datetime):
+        return {'type': 'datetime', 'fields': fields}
+    else:  # assume cftime datetime
+        return {
+            'type': 'cftime', 'class': type(time).__name__, 'fields': fields,
+            'calendar': time.calendar}
+
+
+def decode_time(time_dict):
+    """Returns the model time described by a dictionary from encode_time."""
+    if time_dict['type'] == 'timedelta':
+        return timedelta(
+            days=time_dict['days'], seconds=time_dict['seconds'],
+            microseconds=time_dict['microseconds'])
+    elif time_dict['type'] == 'datetime':
+        return datetime(*time_dict['fields'])
+    time_class = getattr(get_cftime(), time_dict['class'])
+    if time_dict['class'] == 'datetime':
+        return time_class(*time_dict['fields'], calendar=time_dict['calendar'])
+    return time_class(*time_dict['fields'])
+
+
+def write_npy_checkpoint(directory, state):
+    """
+    Writes a model state to a new checkpoint directory, containing a .npy
+    file for the values of each quantity and a JSON manifest of their names,
+    dims, attributes, dtypes and shapes, and the model time.
+
+    Args
+    ----
+    directory : str
+        The directory to create.
+    state : dict
+        A model state dictionary.
+
+    Raises
+    ------
+    TypeError
+        If a value in the state other than time is not a quantity.
+    """
+    os.mkdir(directory)
+    quantities = {}
+    names = sorted(name for name in state.keys() if name != 'time')
+    for i, name in enumerate(names):
+        value = state[name]
+        if not is_quantity(value):
+            raise TypeError(
+                'Cannot write {} of type {} to a checkpoint'.format(
+                    name, type(value)))
+        filename = '{}.npy'.format(i)
+        array = np.asarray(value.values)
+        np.save(os.path.join(directory, filename), array)
+        quantities[name] = get_quantity_properties(value, array, filename)
+    write_manifest(directory, state['time'], quantities)
+
+
+def get_quantity_properties(value, array, filename):
+    """Returns the manifest entry for a quantity whose values array is
+    stored in filename."""
+    return {
+        'file': filename,
+        'dims': list(value.dims),
+        'attrs': get_json_attrs(value.attrs),
+        'dtype': array.dtype.str,
+        'shape': list(array.shape),
+    }
+
+
+def read_manifest(directory):
+    """Returns the manifest of a checkpoint directory."""
+    with open(os.path.join(directory, MANIFEST_FILENAME), 'r') as f:
+        return json.load(f)
+
+
+def write_manifest(directory, time, quantities, generation=0):
+    """Writes the manifest of a checkpoint directory, replacing any
+    existing manifest in a single rename so that readers see either the
+    old or the new manifest in full."""
+    manifest = {
+        'version': CHECKPOINT_VERSION,
+        'generation': generation,
+        'time': encode_time(time),
+        'quantities': quantities,
+    }
+    filename = os.path.join(directory, MANIFEST_FILENAME)
+    with open(filename + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(filename + '.tmp', filename)
+
+
+def get_array_hash(array):
+    """Returns a hash of the dtype, shape and contents of a numpy array."""
+    digest = hashlib.sha256()
+    digest.update('{}{}'.format(array.dtype.str, array.shape).encode('ascii'))
+    digest.update(np.ascontiguousarray(array).reshape(-1).view(np.uint8))
+    return digest.hexdigest()
+
+
+def write_incremental_npy_checkpoint(directory, state):
+    """
+    Writes a model state to a checkpoint directory in which each array is
+    stored in a file named by the hash of its contents, creating the
+    directory if needed. Arrays whose contents are already stored in the
+    directory, such as quantities which have not changed since the last
+    checkpoint, are not written again. The new manifest then replaces the
+    old one, and files used only by the old manifest are removed.
+
+    Args
+    ----
+    directory : str
+        The checkpoint directory.
+    state : dict
+        A model state dictionary.
+
+    Returns
+    -------
+    n_written : int
+        The number of arrays which were written.
+
+    Raises
+    ------
+    TypeError
+        If a value in the state other than time is not a quantity.
+    """
+    objects_directory = os.path.join(directory, OBJECTS_DIRNAME)
+    if not os.path.isdir(objects_directory):
+        os.makedirs(objects_directory)
+    if is_npy_checkpoint(directory):
+        old_manifest = read_manifest(directory)
+    else:
+        old_manifest = {'generation': -1, 'quantities': {}}
+    quantities = {}
+    n_written = 0
+    for name in sorted(name for name in state.keys() if name != 'time'):
+        value = state[name]
+        if not is_quantity(value):
+            raise TypeError(
+                'Cannot write {} of type {} to a checkpoint'.format(
+                    name, type(value)))
+        array = np.asarray(value.values)
+        filename = os.path.join(
+            OBJECTS_DIRNAME, '{}.npy'.format(get_array_hash(array)))
+        path = os.path.join(directory, filename)
+        if not os.path.isfile(path):
+            with open(path + '.tmp', 'wb') as f:
+                np.save(f, array)
+            os.replace(path + '.tmp', path)
+            n_written += 1
+        quantities[name] = get_quantity_properties(value, array, filename)
+    write_manifest(
+        directory, state['time'], quantities,
+        generation=old_manifest.get('generation', 0) + 1)
+    used_files = get_manifest_files(quantities)
+    for filename in get_manifest_files(old_manifest['quantities']):
+        if filename not in used_files:
+            os.remove(os.path.join(directory, filename))
+    return n_written
+
+
+def get_manifest_files(quantities):
+    """Returns the set of files used by the quantities of a manifest."""
+    return set(
+        os.path.normpath(properties['file'])
+        for properties in quantities.values())
+
+
+def compact_npy_checkpoint(directory):
+    """
+    Removes every file in a checkpoint directory which is not used by its
+    manifest, such as files left by an interrupted write.
+
+    Args
+    ----
+    directory : str
+        The checkpoint directory.
+
+    Returns
+    -------
+    n_removed : int
+        The number of files removed.
+    """
+    used_files = get_manifest_files(read_manifest(directory)['quantities'])
+    used_files.add(MANIFEST_FILENAME)
+    n_removed = 0
+    for dirpath, _, filenames in os.walk(directory):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            if os.path.relpath(path, directory) not in used_files:
+                os.remove(path)
+                n_removed += 1
+    return n_removed
+
+
+def get_state_snapshot(state):
+    """Returns a copy of state holding copies of the arrays of its
+    quantities, which is unaffected by later changes to state."""
+    return {
+        name: value.copy(deep=True) if is_quantity(value) else value
+        for name, value in state.items()}
+
+
+def read_npy_checkpoint(directory, mmap_mode='c'):
+    """
+    Reads a model state from a checkpoint directory written by
+    write_npy_checkpoint.
+
+    Args
+    ----
+    directory : str
+        The checkpoint directory.
+    mmap_mode : str, optional
+        The mode used to memory-map the .npy files, as for numpy.load.
+        The default 'c' (copy-on-write) maps each file so that its data is
+        read from disk as it is used, and arrays can be modified without
+        modifying the file. If None, arrays are read into memory.
+
+    Returns
+    -------
+    state : dict
+        The model state, whose quantities are DataArrays.
+    """
+    from .._core.dataarray import DataArray
+    manifest = read_manifest(directory)
+    state = {'time': decode_time(manifest['time'])}
+    for name, properties in manifest['quantities'].items():
+        filename = os.path.join(directory, properties['file'])
+        if mmap_mode is not None and np.prod(properties['shape']) > 0:
+            array = np.load(filename, mmap_mode=mmap_mode)
+        else:  # empty files cannot be memory-mapped
+            array = np.load(filename)
+        state[name] = DataArray(
+            array, dims=properties['dims'], attrs=properties['attrs'])
+    return state
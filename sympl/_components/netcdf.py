@@ -2,27 +2,121 @@ from .._core.base_components import Monitor
 from .._core.exceptions import (
     DependencyError, InvalidStateError)
 from .._core.units import from_unit_to_another
-from .._core.dataarray import DataArray
+from .._core.quantity_array import to_dataarray, is_xarray_dataarray
 from .._core.util import same_list, datetime64_to_datetime
-import xarray as xr
+from .checkpoint import (
+    is_npy_checkpoint, read_npy_checkpoint, write_npy_checkpoint,
+    write_incremental_npy_checkpoint, compact_npy_checkpoint,
+    get_state_snapshot)
 import os
+import shutil
+import threading
+import weakref
+from concurrent.futures import Future
+from six.moves import queue
 import numpy as np
 from datetime import timedelta
 from six import string_types
 
-try:
-    import netCDF4 as nc4
-except ImportError:
-    nc4 = None
+
+def import_netcdf4(class_name):
+    """
+    Returns the netCDF4 module, which is imported when it is first needed
+    rather than when Sympl is imported, since importing it is slow.
+
+    Raises
+    ------
+    DependencyError
+        If netCDF4 is not installed.
+    """
+    try:
+        import netCDF4
+    except ImportError:
+        raise DependencyError(
+            'netCDF4-python must be installed to use {}'.format(class_name))
+    return netCDF4
+
+
+# Held while Sympl calls netCDF4 when xarray is not available to provide
+# its lock (see get_netcdf_lock).
+_netcdf_lock = threading.Lock()
+
+
+def get_netcdf_lock():
+    """
+    Returns the lock which must be held while calling netCDF4, since the
+    netCDF-C and HDF5 libraries are not thread-safe and netCDF4 releases the
+    GIL while calling them. This is the HDF5 lock used by xarray, so that
+    Sympl's writes are also serialized with xarray's reads of NetCDF files.
+    The lock is not reentrant.
+    """
+    try:
+        from xarray.backends.locks import HDF5_LOCK
+    except ImportError:
+        return _netcdf_lock
+    return HDF5_LOCK
 
 
 class NetCDFMonitor(Monitor):
     """A Monitor which caches stored states and then writes them to a
-    NetCDF file when requested."""
+    NetCDF file when requested.
+
+    With stream=True, the NetCDF file is instead opened once, and each stored
+    state is appended to it directly. The variables in the file are checked
+    against the first state written, and later states are only compared
+    with the dims and attributes of that state (a state which does not
+    match raises an exception and is not written). Data is flushed to disk
+    every flush_interval stored states, and when flush() or close() is
+    called. The monitor can be used as a context manager, which closes it
+    on exit:
+
+    >>> with NetCDFMonitor('out.nc', stream=True, flush_interval=10) as monitor:
+    ...     for i in range(n_steps):
+    ...         monitor.store(state)
+    ...         diagnostics, state = stepper(state, timestep)
+
+    Otherwise, cached states are kept (with references to their quantities)
+    until write() is called. To bound the memory this uses, pass
+    max_cached_states or max_cache_bytes, and the cached states are written
+    to file whenever either limit is reached.
+
+    The storage of variables created in the file is controlled with
+    default_encoding, which applies to all variables, and encoding, which
+    gives options for individual variables by name (after aliases are
+    applied). Options are passed to netCDF4.Dataset.createVariable, and
+    include "zlib", "complevel" and "shuffle" for compression,
+    "least_significant_digit" to quantize data so that it compresses
+    better, and "chunksizes". The "dtype" option sets the type stored in
+    the file, such as "float32" to store float64 quantities at single
+    precision. Variables given any options are stored in chunks holding
+    one time each unless "chunksizes" or "contiguous" is given, so that
+    each stored state is written to its own chunks:
+
+    >>> monitor = NetCDFMonitor(
+    ...     'out.nc', default_encoding={'zlib': True, 'dtype': 'float32'},
+    ...     encoding={'air_temperature': {'least_significant_digit': 2}})
+
+    With write_in_background=True, store() copies the quantities to be
+    stored and puts them in a queue, and a writer thread caches and writes
+    them as store() would, so that writing overlaps with computation.
+    store() waits for space in the queue if it is full. write(), flush()
+    and close() are performed by the writer thread after any states already
+    queued, and wait for it to finish. An error raised while writing a
+    queued state is raised by the next call to write(), flush() or close(),
+    or by store() if it has already occurred. A monitor which is still
+    writing in the background at interpreter exit is closed, so that queued
+    states are written. Sympl holds the lock from
+    get_netcdf_lock() whenever it calls netCDF4, which is also held by
+    xarray while it reads NetCDF files, so other threads can write or read
+    NetCDF files while the writer thread is writing.
+    """
 
     def __init__(
             self, filename, time_units='seconds', store_names=None,
-            write_on_store=False, aliases=None):
+            write_on_store=False, aliases=None, stream=False,
+            flush_interval=None, write_in_background=False, queue_size=4,
+            max_cached_states=None, max_cache_bytes=None,
+            default_encoding=None, encoding=None):
         """
         Args
         ----
@@ -43,23 +137,62 @@ class NetCDFMonitor(Monitor):
         aliases : dict
             A dictionary of string replacements to apply to state variable
             names before saving them in netCDF files.
+        stream : bool, optional
+            If True, the NetCDF file is kept open and each stored state is
+            appended to it directly, until close() is called. Default is
+            False.
+        flush_interval : int, optional
+            If stream is True, the number of stored states after which
+            data is flushed to disk. Default is to flush only when flush()
+            or close() is called.
+        write_in_background : bool, optional
+            If True, stored states are copied and written to file by a
+            writer thread. Default is False.
+        queue_size : int, optional
+            If write_in_background is True, the number of stored states
+            which can wait to be written before store() blocks. Default
+            is 4.
+        max_cached_states : int, optional
+            The number of cached states at which they are written to file.
+            Default is to write them only when write() is called.
+        max_cache_bytes : int, optional
+            The total size in bytes of the quantities in cached states at
+            which they are written to file. Default is to write them only
+            when write() is called.
+        default_encoding : dict, optional
+            Options used to create every variable in the NetCDF file, as
+            described above.
+        encoding : dict, optional
+            A dictionary whose keys are variable names and values are
+            dictionaries of options used to create that variable, which
+            take precedence over default_encoding.
         """
-        if nc4 is None:
-            raise DependencyError(
-                'netCDF4-python must be installed to use NetCDFMonitor')
+        import_netcdf4('NetCDFMonitor')
         self._cached_state_dict = {}
+        self._cache_bytes = 0
+        self._max_cached_states = max_cached_states
+        self._max_cache_bytes = max_cache_bytes
+        self._default_encoding = default_encoding or {}
+        self._encoding = encoding or {}
         self._filename = filename
         self._time_units = time_units
         self._write_on_store = write_on_store
+        self._stream = stream
+        self._flush_interval = flush_interval
+        self._dataset = None
+        self._schema = None
+        self._n_unflushed = 0
+        self._write_in_background = write_in_background
+        self._queue_size = queue_size
+        self._queue = None
+        self._writer_thread = None
+        self._writer_error = None
+        self._writer_finalizer = None
         if aliases is None:
             self._aliases = {}
         else:
             self._aliases = aliases
-        for key, val in self._aliases.items():
-            if not isinstance(key, string_types):
-                raise TypeError("Bad alias key type: {}. Expected string.".format(type(key)))
-            elif not isinstance(val, string_types):
-                raise TypeError("Bad alias value type: {}. Expected string.".format(type(val)))
+        check_aliases(self._aliases)
         if store_names is None:
             self._store_names = None
         else:
@@ -67,9 +200,11 @@ class NetCDFMonitor(Monitor):
 
     def store(self, state):
         """
-        Caches the given state. If write_on_store=True was passed on
-        initialization, also writes to file. Normally a call to the
-        write() method is required to write to file.
+        Caches the given state. If write_on_store=True or stream=True was
+        passed on initialization, also writes to file. Normally a call to
+        the write() method is required to write to file. If
+        write_in_background=True was passed, the state is copied and queued
+        to be cached and written by the writer thread.
 
         Args
         ----
@@ -81,39 +216,103 @@ class NetCDFMonitor(Monitor):
         InvalidStateError
             If state is not a valid input for the DiagnosticComponent instance.
         """
-        if self._store_names is not None:
-            name_list = set(state.keys()).intersection(self._store_names)
-            cache_state = {name: state[name] for name in name_list}
+        cache_state = get_state_to_store(
+            state, self._store_names, self._aliases)
+        if self._write_in_background:
+            # copy the state, since the model may modify it in place while
+            # it is waiting to be written
+            cache_state = {
+                name: value.copy() if is_xarray_dataarray(value) else value
+                for name, value in cache_state.items()}
+            self._submit(self._store_cached_state, state['time'], cache_state)
         else:
-            cache_state = state.copy()
-
-        # raise an exception if the state has any empty string variables
-        for full_var_name in cache_state.keys():
-            if len(full_var_name) == 0:
-                raise ValueError('The given state has an empty string as a variable name.')
-
-        # replace cached variable names with their aliases
-        for longname, shortname in self._aliases.items():
-            for full_var_name in tuple(cache_state.keys()):
-                # replace any string in the full variable name that matches longname
-                # example: if longname is "temperature", shortname is "T", and
-                #    full_var_name is "temperature_tendency_from_radiation", the
-                #    alias_name for the variable would be: "T_tendency_from_radiation"
-                if longname in full_var_name:
-                    alias_name = full_var_name.replace(longname, shortname)
-                    if len(alias_name) == 0:  # raise exception if the alias is an empty str
-                        errstr = 'Tried to alias variable "{}" to an empty string.\n' + \
-                                 'xarray will not allow empty strings as variable names.'
-                        raise ValueError(errstr.format(full_var_name))
-                    cache_state[alias_name] = cache_state.pop(full_var_name)
-
-        cache_state.pop('time')  # stored as key, not needed in state dict
-        if state['time'] in self._cached_state_dict.keys():
-            self._cached_state_dict[state['time']].update(cache_state)
+            self._store_cached_state(state['time'], cache_state)
+
+    def _store_cached_state(self, time, cache_state):
+        if time in self._cached_state_dict.keys():
+            self._cache_bytes -= get_state_nbytes(self._cached_state_dict[time])
+            self._cached_state_dict[time].update(cache_state)
         else:
-            self._cached_state_dict[state['time']] = cache_state
-        if self._write_on_store:
+            self._cached_state_dict[time] = cache_state
+        self._cache_bytes += get_state_nbytes(self._cached_state_dict[time])
+        if self._stream:
             self.write()
+            self._n_unflushed += 1
+            if (self._flush_interval is not None and
+                    self._n_unflushed >= self._flush_interval):
+                self.flush()
+        elif self._write_on_store or self._cache_is_full():
+            self.write()
+
+    def _cache_is_full(self):
+        return (
+            (self._max_cached_states is not None and
+             len(self._cached_state_dict) >= self._max_cached_states) or
+            (self._max_cache_bytes is not None and
+             self._cache_bytes >= self._max_cache_bytes))
+
+    def _clear_cache(self):
+        self._cached_state_dict = {}
+        self._cache_bytes = 0
+
+    def _in_background(self):
+        """
+        Returns True if work should be passed to the writer thread, which is
+        the case when writing in the background from any other thread.
+        """
+        return (
+            self._write_in_background and
+            threading.current_thread() is not self._writer_thread)
+
+    def _submit(self, function, *args):
+        """
+        Queue function to be called with args by the writer thread, starting
+        the thread if needed, and return a Future for its result. Raises any
+        error from earlier calls which were not waited on.
+        """
+        if self._writer_error is not None:
+            error, self._writer_error = self._writer_error, None
+            raise error
+        if self._writer_thread is None:
+            self._queue = queue.Queue(maxsize=self._queue_size)
+            self._writer_thread = threading.Thread(
+                target=self._run_writer, args=(self._queue,),
+                name='NetCDFMonitor writer')
+            self._writer_thread.daemon = True
+            self._writer_thread.start()
+            # the writer thread would be stopped at interpreter exit with
+            # states still queued, so close the monitor first
+            self._writer_finalizer = weakref.finalize(self, self.close)
+        future = Future()
+        self._queue.put((function, args, future))
+        return future
+
+    def _run_writer(self, work_queue):
+        while True:
+            function, args, future = work_queue.get()
+            if function is None:
+                return
+            is_store = function == self._store_cached_state
+            try:
+                if not is_store and self._writer_error is not None:
+                    # report errors from queued states to the caller
+                    error, self._writer_error = self._writer_error, None
+                    raise error
+                future.set_result(function(*args))
+            except BaseException as err:
+                future.set_exception(err)
+                if is_store:
+                    self._writer_error = err
+
+    def _stop_writer(self):
+        if self._writer_finalizer is not None:
+            self._writer_finalizer.detach()
+            self._writer_finalizer = None
+        if self._writer_thread is not None:
+            self._queue.put((None, (), None))
+            self._writer_thread.join()
+            self._writer_thread = None
+            self._queue = None
 
     @property
     def _write_mode(self):
@@ -171,19 +370,152 @@ class NetCDFMonitor(Monitor):
             If cached states do not all have the same quantities
             as every other cached and written state.
         """
-        with nc4.Dataset(self._filename, self._write_mode) as dataset:
-            self._ensure_cached_state_keys_compatible_with_dataset(dataset)
-            time_list, state_list = self._get_ordered_times_and_states()
-            self._ensure_time_exists(dataset, time_list[0])
-            it_start = dataset.dimensions['time'].size
-            it_end = it_start + len(time_list)
-            append_times_to_dataset(time_list, dataset, self._time_units)
-            all_states = combine_states(state_list)
-            for name, value in all_states.items():
-                ensure_variable_exists(dataset, name, value)
-                dataset.variables[name][
-                    it_start:it_end, :] = value.values[:, :]
-        self._cached_state_dict = {}
+        if self._in_background():
+            return self._submit(self.write).result()
+        if self._stream:
+            self._write_to_open_dataset()
+            return
+        nc4 = import_netcdf4('NetCDFMonitor')
+        with get_netcdf_lock():
+            with nc4.Dataset(self._filename, self._write_mode) as dataset:
+                self._write_cached_states(dataset)
+        self._clear_cache()
+
+    def _write_cached_states(self, dataset):
+        self._ensure_cached_state_keys_compatible_with_dataset(dataset)
+        time_list, state_list = self._get_ordered_times_and_states()
+        self._ensure_time_exists(dataset, time_list[0])
+        it_start = dataset.dimensions['time'].size
+        write_states_to_dataset(
+            dataset, state_list, it_start, self._get_encoding(state_list[0]))
+        append_times_to_dataset(
+            time_list, dataset, self._time_units, it_start=it_start)
+
+    def _get_encoding(self, state):
+        """Returns a dictionary of the options used to create the variable
+        for each quantity in state."""
+        return_dict = {}
+        for name in state.keys():
+            return_dict[name] = self._default_encoding.copy()
+            return_dict[name].update(self._encoding.get(name, {}))
+        return return_dict
+
+    def _write_to_open_dataset(self):
+        """
+        Append the cached states to the open NetCDF dataset, opening it
+        if needed, and clear the cache. The first states written are fully
+        checked against the dataset, and their variables, dims and
+        attributes are kept as the schema for later states.
+        """
+        if len(self._cached_state_dict) == 0:
+            return
+        with get_netcdf_lock():
+            self._write_cached_states_to_open_dataset()
+
+    def _write_cached_states_to_open_dataset(self):
+        if self._dataset is None:
+            nc4 = import_netcdf4('NetCDFMonitor')
+            self._dataset = nc4.Dataset(self._filename, self._write_mode)
+        try:
+            if self._schema is None:
+                self._write_cached_states(self._dataset)
+                reference_state = tuple(self._cached_state_dict.values())[0]
+                self._schema = {
+                    name: (
+                        self._dataset.variables[name], value.dims,
+                        dict(value.attrs))
+                    for name, value in reference_state.items()}
+            else:
+                time_list, state_list = self._get_ordered_times_and_states()
+                array_list = [
+                    self._get_schema_arrays(state) for state in state_list]
+                it_start = self._dataset.dimensions['time'].size
+                for i, arrays in enumerate(array_list):
+                    for name, array in arrays.items():
+                        self._schema[name][0][it_start + i, ...] = array
+                # times are written last, so that a state which cannot be
+                # written does not leave a time without data
+                append_times_to_dataset(
+                    time_list, self._dataset, self._time_units,
+                    it_start=it_start)
+        finally:
+            # states which could not be written are not kept, so that they
+            # do not prevent later states from being written
+            self._clear_cache()
+
+    def _get_schema_arrays(self, state):
+        """
+        Returns a dictionary of the arrays of the quantities in state, with
+        their dimensions in the order of their variables in the schema.
+
+        Raises
+        ------
+        InvalidStateError
+            If the quantities, attributes or shapes of the state do not
+            match the schema.
+        IOError
+            If the dimensions of a quantity do not match its variable.
+        """
+        if state.keys() != self._schema.keys():
+            raise InvalidStateError(
+                'NetCDFMonitor was passed a different set of '
+                'quantities for different times: {} vs. {}'.format(
+                    list(self._schema.keys()), list(state.keys())))
+        return_dict = {}
+        for name, value in state.items():
+            variable, dims, attrs = self._schema[name]
+            if value.dims != dims and sorted(value.dims) == sorted(dims):
+                value = value.transpose(*dims)
+            if value.dims != dims or value.attrs != attrs:
+                ensure_variable_is_compatible(
+                    variable, name, value.expand_dims('time'))
+            if value.shape != variable.shape[1:]:
+                raise InvalidStateError(
+                    'Shape of {} in the netCDF file is {} but in the state '
+                    'is {}'.format(name, variable.shape[1:], value.shape))
+            return_dict[name] = value.values
+        return return_dict
+
+    def flush(self):
+        """
+        Write any cached states to file, and if the NetCDF file is being
+        streamed to, flush its data to disk. If writing in the background,
+        this waits for all queued states to be written.
+        """
+        if self._in_background():
+            return self._submit(self.flush).result()
+        if len(self._cached_state_dict) > 0:
+            self.write()
+        if self._dataset is not None:
+            with get_netcdf_lock():
+                self._dataset.sync()
+        self._n_unflushed = 0
+
+    def close(self):
+        """
+        Write any cached states to file, and close the NetCDF file if it is
+        being streamed to. If the monitor stores further states, the file is
+        opened again and they are appended to it. If writing in the
+        background, this waits for all queued states to be written and
+        stops the writer thread.
+        """
+        if self._in_background():
+            try:
+                return self._submit(self.close).result()
+            finally:
+                self._stop_writer()
+        self.flush()
+        if self._dataset is not None:
+            with get_netcdf_lock():
+                self._dataset.close()
+            self._dataset = None
+            self._schema = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def _ensure_time_exists(self, dataset, possible_reference_time):
         """Ensure an unlimited time dimension relevant to this monitor
@@ -206,58 +538,292 @@ class RestartMonitor(Monitor):
     """
     A :py:class:`~sympl.Monitor` which stores model state in a NetCDF file,
     and can load that file back into the form of a model state.
+
+    With file_format='npy', the state is instead stored in a directory
+    containing a .npy file for each quantity and a JSON manifest describing
+    them. Writing this involves no conversion of the state, and loading it
+    memory-maps each file, so that data is only read from disk when it is
+    used. In either format, the restart data is first written to a new file
+    or directory which then replaces any existing one, so that an
+    interrupted write does not corrupt existing restart data.
+
+    With incremental=True, 'npy' restart data is instead updated in place,
+    with each array stored in a file named by the hash of its contents.
+    Only arrays whose contents have changed since the last store are
+    written, so quantities which change slowly or not at all (such as
+    surface fields and constants) are written once and then referenced by
+    later checkpoints. The new manifest replaces the old one in a single
+    rename, after which files used only by the old checkpoint are removed.
+    Files left by an interrupted store can be removed with compact().
+
+    With write_in_background=True, store() copies the arrays of the state
+    and returns, and the copy is written on a writer thread while the model
+    continues. At most one state is written at a time: store() first waits
+    for the previous one to be written. An error raised while writing a
+    state is raised by the next call to store(), wait(), load() or
+    compact(). Completed restart data only becomes visible once it is
+    fully written, replacing a NetCDF file in a single rename, and load()
+    reads the previous restart data if it is called while a directory is
+    being replaced. A state still being written when the interpreter exits
+    is written before it exits. NetCDF restart files are written while
+    holding the lock from get_netcdf_lock(), so the model can use NetCDF
+    files (for example with a NetCDFMonitor) while a restart file is being
+    written.
     """
 
-    def __init__(self, filename):
-        if nc4 is None:
-            raise DependencyError(
-                'netCDF4-python must be installed to use RestartMonitor')
+    def __init__(
+            self, filename, file_format='netcdf', incremental=False,
+            write_in_background=False):
+        """
+        Args
+        ----
+        filename : str
+            The restart file, or directory if file_format is 'npy'.
+        file_format : str, optional
+            The format in which to store states, either 'netcdf' or 'npy'.
+            Default is 'netcdf'. States can be loaded in either format.
+        incremental : bool, optional
+            If True, only write the arrays which have changed since the
+            last store. Requires file_format='npy'. Default is False.
+        write_in_background : bool, optional
+            If True, store() writes a copy of the state on a writer thread
+            instead of waiting for it to be written. Default is False.
+        """
+        if file_format == 'netcdf':
+            import_netcdf4('RestartMonitor')
+        elif file_format != 'npy':
+            raise ValueError(
+                "file_format must be 'netcdf' or 'npy', got {}".format(
+                    file_format))
+        if incremental and file_format != 'npy':
+            raise ValueError(
+                "incremental restart data requires file_format='npy'")
         self._filename = filename
+        self._file_format = file_format
+        self._incremental = incremental
+        self._write_in_background = write_in_background
+        self._writer_future = None
+        self._lazy_datasets = []
 
     def store(self, state):
         """
         Write the state to the restart file, replacing any existing restart
-        data.
+        data. If write_in_background=True was passed, the state is copied
+        and written on a writer thread, after waiting for any previous state
+        to be written.
 
         Parameters
         ----------
         state : dict
             A model state dictionary.
         """
+        if self._write_in_background:
+            self.wait()
+            future = Future()
+            thread = threading.Thread(
+                target=self._run_writer,
+                args=(future, get_state_snapshot(state)),
+                name='RestartMonitor writer')
+            # not a daemon, so that the interpreter waits for the state to
+            # be written before exiting
+            thread.daemon = False
+            self._writer_future = future
+            thread.start()
+        else:
+            self._store(state)
+
+    def _run_writer(self, future, state):
+        try:
+            future.set_result(self._store(state))
+        except BaseException as err:
+            future.set_exception(err)
+
+    def wait(self):
+        """
+        Wait for the state being written in the background, if any, to be
+        written, and raise any error raised while writing it.
+        """
+        if self._writer_future is not None:
+            future, self._writer_future = self._writer_future, None
+            future.result()
+
+    def _store(self, state):
+        if self._incremental and is_npy_checkpoint(self._filename):
+            write_incremental_npy_checkpoint(self._filename, state)
+            return
         new_filename = self._filename + '.new'
-        if os.path.isfile(new_filename):
+        if os.path.exists(new_filename):
             raise IOError('Filename {} already exists'.format(new_filename))
-        netcdf_monitor = NetCDFMonitor(new_filename)
-        netcdf_monitor.store(state)
-        netcdf_monitor.write()
+        try:
+            if self._incremental:
+                write_incremental_npy_checkpoint(new_filename, state)
+            elif self._file_format == 'npy':
+                write_npy_checkpoint(new_filename, state)
+            else:
+                netcdf_monitor = NetCDFMonitor(new_filename)
+                netcdf_monitor.store(state)
+                netcdf_monitor.write()
+        except Exception:
+            remove_path(new_filename)
+            raise
+
+        old_filename = self._filename + '.old'
+        if os.path.isdir(self._filename) or (
+                os.path.exists(self._filename) and
+                os.path.isdir(new_filename)):
+            # directories cannot be replaced in a single rename, so load()
+            # reads the old one until the new one is in place
+            remove_path(old_filename)
+            os.rename(self._filename, old_filename)
+            os.rename(new_filename, self._filename)
+            remove_path(old_filename)
+        else:
+            os.replace(new_filename, self._filename)
 
-        if os.path.isfile(self._filename):
-            os.rename(self._filename, self._filename + '.old')
-        os.rename(new_filename, self._filename)
-        if os.path.isfile(self._filename + '.old'):
-            os.remove(self._filename + '.old')
+    def compact(self):
+        """
+        Remove any files in 'npy' restart data which are not used by the
+        stored state, such as files left by an interrupted incremental
+        store.
+
+        Returns
+        -------
+        n_removed : int
+            The number of files removed.
+        """
+        self.wait()
+        if not is_npy_checkpoint(self._filename):
+            return 0
+        return compact_npy_checkpoint(self._filename)
 
-    def load(self):
+    def load(self, lazy=None):
         """
         Load the state from the restart file.
 
+        Args
+        ----
+        lazy : bool, optional
+            If True, the data of each quantity is read from the restart file
+            only when it is used. For 'npy' restart data the files are
+            memory-mapped copy-on-write, so only the pages of an array which
+            are used are read, and modifying arrays does not modify the
+            files. For NetCDF files the file is kept open until close() is
+            called, and each quantity is read in full when its values are
+            first used. If False, all data is read before returning. Default
+            is True for 'npy' restart data and False for NetCDF files.
+
         Returns
         -------
         state : dict
             The model state stored in the restart file.
         """
-        dataset = xr.open_dataset(self._filename)
+        self.wait()
+        filename = self._filename
+        if not os.path.exists(filename) and os.path.exists(filename + '.old'):
+            filename = filename + '.old'  # being replaced by store()
+        if is_npy_checkpoint(filename):
+            if lazy is None or lazy:
+                return read_npy_checkpoint(filename, mmap_mode='c')
+            else:
+                return read_npy_checkpoint(filename, mmap_mode=None)
+        import xarray as xr
+        from .._core.dataarray import DataArray
+        dataset = xr.open_dataset(filename)
         state = {}
         for name, value in dataset.data_vars.items():
             state[name] = DataArray(value[0, :])  # remove time axis
+            if not lazy:
+                state[name].load()
         state['time'] = datetime64_to_datetime(dataset['time'][0].values)
+        if lazy:
+            self._lazy_datasets.append(dataset)
+        else:
+            dataset.close()
         return state
 
-
-def append_times_to_dataset(times, dataset, time_units):
-    """Appends the given list of times to the dataset. Assumes the time units
-    in the NetCDF4 dataset correspond to the string time_units."""
-    it_start = dataset.dimensions['time'].size
+    def close(self):
+        """
+        Wait for any state being written in the background, and close the
+        NetCDF files kept open by lazy loads. Quantities loaded lazily
+        should have been read before this is called.
+        """
+        try:
+            self.wait()
+        finally:
+            for dataset in self._lazy_datasets:
+                dataset.close()
+            self._lazy_datasets = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def remove_path(path):
+    """Removes the file or directory at path, if it exists."""
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def check_aliases(aliases):
+    """Raises TypeError if the keys and values of aliases are not all
+    strings."""
+    for key, val in aliases.items():
+        if not isinstance(key, string_types):
+            raise TypeError("Bad alias key type: {}. Expected string.".format(type(key)))
+        elif not isinstance(val, string_types):
+            raise TypeError("Bad alias value type: {}. Expected string.".format(type(val)))
+
+
+def get_state_to_store(state, store_names, aliases):
+    """Returns a dictionary of the quantities in state to be stored by a
+    monitor, as DataArrays, with the aliases applied to their names. If
+    store_names is not None, only the names it contains are included. The
+    time of the state is not included.
+
+    Raises ValueError if a name is, or would be aliased to, an empty
+    string."""
+    if store_names is not None:
+        name_list = set(state.keys()).intersection(store_names)
+        cache_state = {name: to_dataarray(state[name]) for name in name_list}
+    else:
+        cache_state = {
+            name: to_dataarray(value) for name, value in state.items()}
+
+    # raise an exception if the state has any empty string variables
+    for full_var_name in cache_state.keys():
+        if len(full_var_name) == 0:
+            raise ValueError('The given state has an empty string as a variable name.')
+
+    # replace cached variable names with their aliases
+    for longname, shortname in aliases.items():
+        for full_var_name in tuple(cache_state.keys()):
+            # replace any string in the full variable name that matches longname
+            # example: if longname is "temperature", shortname is "T", and
+            #    full_var_name is "temperature_tendency_from_radiation", the
+            #    alias_name for the variable would be: "T_tendency_from_radiation"
+            if longname in full_var_name:
+                alias_name = full_var_name.replace(longname, shortname)
+                if len(alias_name) == 0:  # raise exception if the alias is an empty str
+                    errstr = 'Tried to alias variable "{}" to an empty string.\n' + \
+                             'xarray will not allow empty strings as variable names.'
+                    raise ValueError(errstr.format(full_var_name))
+                cache_state[alias_name] = cache_state.pop(full_var_name)
+
+    cache_state.pop('time')  # stored as key, not needed in state dict
+    return cache_state
+
+
+def append_times_to_dataset(times, dataset, time_units, it_start=None):
+    """Appends the given list of times to the dataset, starting at time
+    index it_start if given, or otherwise after the last time. Assumes the
+    time units in the NetCDF4 dataset correspond to the string time_units."""
+    if it_start is None:
+        it_start = dataset.dimensions['time'].size
     it_end = it_start + len(times)
     if isinstance(times[0], timedelta):
         times_list = []
@@ -267,44 +833,69 @@ def append_times_to_dataset(times, dataset, time_units):
             np.array(times_list), 'seconds', time_units)
         dataset.variables['time'][it_start:it_end] = time_array[:]
     else:  # assume datetime
+        nc4 = import_netcdf4('NetCDFMonitor')
         dataset.variables['time'][it_start:it_end] = nc4.date2num(
             times, dataset.variables['time'].units,
             calendar='proleptic_gregorian'
         )
 
 
-def combine_states(states):
-    """Takes in an iterable of state dictionaries, and combines them into a
-    single returned state dictionary, adding a new first dimension to the
-    DataArray values which corresponds to the order of the input state
-    iterable."""
-    return_dict = {}
-    n_states = len(states)
-    for name, value in states[0].items():
-        return_dict[name] = DataArray(
-            np.zeros((n_states,) + value.shape, dtype=value.values.dtype),
-            dims=('time',) + value.dims, attrs=value.attrs)
+def get_state_nbytes(state):
+    """Returns the total size in bytes of the values of the quantities in
+    state."""
+    return sum(
+        value.nbytes for value in state.values() if hasattr(value, 'nbytes'))
+
+
+def write_states_to_dataset(dataset, states, it_start, encoding=None):
+    """Writes the quantities in an iterable of state dictionaries to the
+    NetCDF4 dataset, at consecutive indices of its time dimension starting
+    at it_start. Each state is written directly into the slice of its
+    variables for its time, rather than combining the states into arrays
+    with a time dimension. Variables are created if needed, using the
+    options for their name in encoding, or checked for compatibility, using
+    the first state."""
+    if encoding is None:
+        encoding = {}
+    reference_state = states[0]
+    for name, value in reference_state.items():
+        ensure_variable_exists(
+            dataset, name, value.expand_dims('time'), encoding.get(name))
     for i, state in enumerate(states):
-        for name in state.keys():
-            return_dict[name][i, :] = state[name][:]
-    return return_dict
+        for name, value in state.items():
+            dims = reference_state[name].dims
+            if value.dims != dims:
+                value = value.transpose(*dims)
+            dataset.variables[name][it_start + i, ...] = value.values
 
 
-def ensure_variable_exists(dataset, name, data):
+def ensure_variable_exists(dataset, name, data, encoding=None):
     """Dataset should be nc4.Dataset, name should be a string, and data should
     be a DataArray.
 
     Ensures there is a Variable in the dataset that corresponds to the given
-    name and data, and creates it if not. Raises IOError if there is already
-    a Variable but it is incompatible with the data."""
+    name and data, and creates it with the options in encoding if not. Raises
+    IOError if there is already a Variable but it is incompatible with the
+    data."""
     if name not in dataset.variables:
-        create_variable(dataset, name, data)
+        create_variable(dataset, name, data, encoding)
     else:
         ensure_variable_is_compatible(dataset.variables[name], name, data)
 
 
-def create_variable(dataset, name, data):
-    if isinstance(data, xr.DataArray):
+def create_variable(dataset, name, data, encoding=None):
+    """Creates a Variable in the dataset for the given name and data, whose
+    first dimension is time. encoding is a dictionary of keyword arguments
+    for dataset.createVariable, except that "dtype" gives the data type of
+    the Variable if it should differ from that of data."""
+    kwargs = dict(encoding or {})
+    dtype = kwargs.pop('dtype', data.values.dtype)
+    if (len(kwargs) > 0 and len(data.dims) > 0 and
+            'chunksizes' not in kwargs and not kwargs.get('contiguous')):
+        # one chunk per time, so that each appended time fills whole chunks
+        kwargs['chunksizes'] = (1,) + tuple(
+            max(length, 1) for length in data.values.shape[1:])
+    if is_xarray_dataarray(data):
         for i in range(len(data.dims)):
             try:
                 if i == 0:  # time
@@ -316,8 +907,7 @@ def create_variable(dataset, name, data):
             except IOError as err:
                 raise IOError(
                     'Error while creating {}: {}'.format(name, err))
-        dataset.createVariable(
-            name, data.values.dtype, data.dims)
+        dataset.createVariable(name, dtype, data.dims, **kwargs)
         for key, value in data.attrs.items():
             dataset.variables[name].setncattr(key, value)
     else:
@@ -1,13 +1,14 @@
 from .._core.base_components import Monitor
 from .._core.exceptions import DependencyError
-from .._core.dataarray import DataArray
+from .._core.quantity_array import to_dataarray, is_dataarray
 
 
 def copy_state(state):
     return_state = {}
     for name, quantity in state.items():
-        if isinstance(quantity, DataArray):
-            return_state[name] = DataArray(
+        quantity = to_dataarray(quantity)
+        if is_dataarray(quantity):
+            return_state[name] = quantity.__class__(
                 quantity.values.copy(), quantity.coords, quantity.dims,
                 quantity.name, quantity.attrs)
         else:
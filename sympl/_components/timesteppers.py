@@ -1,6 +1,18 @@
+import numpy as np
 from .._core.tendencystepper import TendencyStepper
-from .._core.dataarray import DataArray
-from .._core.state import copy_untouched_quantities, add, multiply
+from .._core.exceptions import InvalidStateError
+from .._core.quantity_array import (
+    QuantityArray, is_quantity, to_dataarray, is_dataarray)
+from .._core.state import copy_untouched_quantities, axpby
+from .._core.units import get_conversion_factors
+
+# Adams-Bashforth coefficients by order, from newest to oldest tendency.
+bashforth_coefficients = {
+    1: (1.,),
+    2: (3./2, -1./2),
+    3: (23./12, -16./12, 5./12),
+    4: (55./24, -59./24, 37./24, -9./24),
+}
 
 
 class SSPRungeKutta(TendencyStepper):
@@ -57,9 +69,9 @@ class SSPRungeKutta(TendencyStepper):
     def _step_3_stages(self, state, timestep):
         diagnostics, state_1 = self._euler_stepper(state, timestep)
         _, state_1_5 = self._euler_stepper(state_1, timestep)
-        state_2 = add(multiply(0.75, state), multiply(0.25, state_1_5))
+        state_2 = combine_stages(0.75, state, 0.25, state_1_5)
         _, state_2_5 = self._euler_stepper(state_2, timestep)
-        out_state = add(multiply(1./3, state), multiply(2./3, state_2_5))
+        out_state = combine_stages(1./3, state, 2./3, state_2_5)
         return diagnostics, out_state
 
     def _step_2_stages(self, state, timestep):
@@ -67,10 +79,26 @@ class SSPRungeKutta(TendencyStepper):
         diagnostics, state_1 = self._euler_stepper(state, timestep)
         assert state_1 is not None
         _, state_2 = self._euler_stepper(state_1, timestep)
-        out_state = multiply(0.5, add(state, state_2))
+        out_state = combine_stages(0.5, state, 0.5, state_2)
         return diagnostics, out_state
 
 
+def combine_stages(a, state, b, stage_state):
+    """
+    Return a*state + b*stage_state, where stage_state is the output of an
+    Euler step. Only the quantities which were stepped forward are combined,
+    and the result is written into their arrays in stage_state, which are not
+    used elsewhere. Other quantities are carried over from state.
+    """
+    stepped = {
+        key: value for key, value in stage_state.items()
+        if key != 'time' and value is not state.get(key, None)}
+    out_state = axpby(
+        a, {key: state[key] for key in stepped}, b, stepped, out=stepped)
+    copy_untouched_quantities(state, out_state)
+    return out_state
+
+
 class AdamsBashforth(TendencyStepper):
     """A TendencyStepper using the Adams-Bashforth scheme."""
 
@@ -85,7 +113,20 @@ class AdamsBashforth(TendencyStepper):
         order : int, optional
             The order of accuracy to use. Must be between
             1 and 4. 1 is the same as the Euler method. Default is 3.
+        in_place : bool, optional
+            If True, past tendencies are kept in preallocated numpy arrays
+            and the new state is computed into reusable output arrays, so
+            that stepping does not allocate new arrays once the buffers
+            are set up. The arrays in the returned state are then owned by
+            this object, and are overwritten two steps later. Any state
+            which must be kept for longer (for example, by a Monitor which
+            caches states without copying them) must be copied. Requires
+            the prognostic quantities to keep the same shape and dtype
+            between steps. Default is False.
         """
+        self._in_place = kwargs.pop('in_place', False)
+        self._buffers = None
+        self._n_steps = 0
         order = kwargs.pop('order', 3)
         if isinstance(order, float) and order.is_integer():
             order = int(order)
@@ -127,6 +168,10 @@ class AdamsBashforth(TendencyStepper):
         self._ensure_constant_timestep(timestep)
         state = state.copy()
         tendencies, diagnostics = self.prognostic(state, timestep)
+        if self._in_place:
+            new_state = self._perform_step_in_place(state, tendencies, timestep)
+            copy_untouched_quantities(state, new_state)
+            return diagnostics, new_state
         convert_tendencies_units_for_state(tendencies, state)
         self._tendencies_list.append(tendencies)
         new_state = self._perform_step(state, timestep)
@@ -152,6 +197,33 @@ class AdamsBashforth(TendencyStepper):
             raise RuntimeError('order should be integer between 1 and 4')
         return new_state
 
+    def _perform_step_in_place(self, state, tendencies, timestep):
+        if self._buffers is None:
+            self._buffers = {
+                name: AdamsBashforthBuffer(self._order, state[name], tendency)
+                for name, tendency in tendencies.items()}
+        elif set(self._buffers.keys()) != set(tendencies.keys()):
+            raise InvalidStateError(
+                'AdamsBashforth with in_place=True requires tendencies to be '
+                'given for the same quantities on every step, but got {} '
+                'and then {}'.format(
+                    sorted(self._buffers.keys()), sorted(tendencies.keys())))
+        i_newest = self._n_steps % self._order
+        for name, tendency in tendencies.items():
+            self._buffers[name].store_tendency(
+                i_newest, tendency, state[name], name)
+        self._n_steps += 1
+        # weight of each slot of the ring buffer, zero for unfilled slots
+        order = min(self._order, self._n_steps)
+        weights = np.zeros([self._order])
+        for age, coefficient in enumerate(bashforth_coefficients[order]):
+            weights[(i_newest - age) % self._order] = coefficient
+        weights *= timestep.total_seconds()
+        new_state = {}
+        for name, buffer in self._buffers.items():
+            new_state[name] = buffer.step(state[name], weights)
+        return new_state
+
     def _ensure_constant_timestep(self, timestep):
         if self._timestep is None:
             self._timestep = timestep
@@ -160,6 +232,88 @@ class AdamsBashforth(TendencyStepper):
                 'timestep must be constant for Adams-Bashforth time stepping')
 
 
+class AdamsBashforthBuffer(object):
+    """
+    Preallocated arrays used by AdamsBashforth to step one quantity in-place.
+    Past tendencies are stored in a ring buffer of shape (order,) + shape,
+    and new values are written alternately into one of two output arrays,
+    so that the output of one step can be the input of the next.
+    """
+
+    __slots__ = ('history', 'outputs', 'i_output')
+
+    def __init__(self, order, value, tendency):
+        value = get_values(value)
+        dtype = np.result_type(value.dtype, get_values(tendency).dtype, 1.)
+        self.history = np.zeros((order,) + value.shape, dtype=dtype)
+        self.outputs = (
+            np.empty(value.shape, dtype=dtype),
+            np.empty(value.shape, dtype=dtype))
+        self.i_output = 0
+
+    def store_tendency(self, i_slot, tendency, value, name):
+        """
+        Convert the tendency to the units (per second) and dimension order
+        of value, and store it in slot i_slot of the ring buffer.
+        """
+        scale, offset = 1., 0.
+        if is_quantity(tendency):
+            if 'units' in tendency.attrs:
+                scale, offset = get_conversion_factors(
+                    tendency.attrs['units'],
+                    '{} s^-1'.format(value.attrs['units']))
+            if is_quantity(value) and tendency.dims != value.dims:
+                if set(tendency.dims) == set(value.dims):
+                    tendency = tendency.transpose(*value.dims)
+                else:
+                    tendency = to_dataarray(tendency).broadcast_like(
+                        to_dataarray(value)).transpose(*value.dims)
+        tendency = get_values(tendency)
+        out = self.history[i_slot, ...]
+        if tendency.shape != out.shape:
+            raise InvalidStateError(
+                'AdamsBashforth with in_place=True requires quantities to keep '
+                'the same shape, but {} changed from shape {} to {}'.format(
+                    name, out.shape, tendency.shape))
+        if scale == 1.:
+            np.copyto(out, tendency)
+        else:
+            np.multiply(tendency, scale, out=out)
+        if offset != 0.:
+            out += offset
+
+    def step(self, value, weights):
+        """
+        Compute value plus the weighted sum of the stored tendencies into
+        an output array, and return it in the same form as value.
+        """
+        values = get_values(value)
+        out = self.outputs[self.i_output]
+        if np.may_share_memory(out, values):
+            # value is the output of two steps ago, use the other buffer
+            self.i_output = 1 - self.i_output
+            out = self.outputs[self.i_output]
+        self.i_output = 1 - self.i_output
+        np.dot(
+            weights.astype(self.history.dtype, copy=False),
+            self.history.reshape((self.history.shape[0], -1)),
+            out=out.reshape(-1))
+        np.add(out, values, out=out)
+        if is_quantity(value):
+            return value.copy(deep=False, data=out)
+        elif isinstance(value, np.ndarray):
+            return out
+        else:
+            return out[()]
+
+
+def get_values(value):
+    if is_quantity(value):
+        return value.values
+    else:
+        return np.asarray(value)
+
+
 def convert_tendencies_units_for_state(tendencies, state):
     """
     Converts the units of any DataArrays with unit informaton in the
@@ -168,7 +322,9 @@ def convert_tendencies_units_for_state(tendencies, state):
     This is done in-place.
     """
     for quantity_name in tendencies.keys():
-        if isinstance(tendencies[quantity_name], DataArray) and ('units' in tendencies[quantity_name].attrs):
+        if (isinstance(tendencies[quantity_name], QuantityArray) or
+                is_dataarray(tendencies[quantity_name])) and (
+                'units' in tendencies[quantity_name].attrs):
             desired_units = '{} s^-1'.format(state[quantity_name].attrs['units'])
             tendencies[quantity_name] = tendencies[quantity_name].to_units(desired_units)
 
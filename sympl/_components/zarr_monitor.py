@@ -0,0 +1,374 @@
+from .._core.base_components import Monitor
+from .._core.exceptions import DependencyError, InvalidStateError
+from .._core.units import from_unit_to_another
+from .._core.time import get_cftime
+from .._core.util import get_json_attrs
+from .netcdf import check_aliases, get_state_to_store
+import numpy as np
+from datetime import datetime, timedelta
+
+
+def import_zarr(class_name):
+    """
+    Returns the zarr module, which is imported when it is first needed.
+
+    Raises
+    ------
+    DependencyError
+        If zarr is not installed.
+    """
+    try:
+        import zarr
+    except ImportError:
+        raise DependencyError(
+            'zarr must be installed to use {}'.format(class_name))
+    return zarr
+
+
+class ZarrMonitor(Monitor):
+    """
+    A :py:class:`~sympl.Monitor` which writes stored states to a Zarr
+    directory store on the local filesystem, as they are stored.
+
+    Each quantity is stored in an array with a leading "time" dimension,
+    split into chunks holding one time each by default, and the times are
+    stored in a "time" array with CF-style units, so the store can be read
+    with xarray.open_zarr. Store names and aliases are handled in the same
+    way as by :py:class:`~sympl.NetCDFMonitor`.
+
+    Storing a state writes only the chunks for its time. If the arrays have
+    no space left for another time, their time length is doubled (to at
+    least one time chunk), which rewrites their (small) metadata documents
+    but not their data, so metadata is only rewritten after exponentially
+    growing numbers of stores. Times not yet stored hold missing values
+    (NaN), and close() shrinks the arrays to the times stored. As an
+    optimisation, initialize() can be called with a state and the number of
+    times to be stored before storing any states, so that the arrays are
+    never resized.
+
+    Regions of the arrays can be written by separate monitors, including
+    monitors in different processes, such as the members of an
+    :py:class:`~sympl.EnsembleRunner` or the subdomains of a model. The
+    arrays must first be created for the whole domain with initialize(),
+    and each region monitor is then given the index (for a dimension which
+    is not in the states it stores, such as "ensemble") or slice of each
+    dimension it writes to. The chunks of the arrays must not span more
+    than one region, so that no two monitors write to the same chunk.
+    Region monitors write their first state at the first time index, and
+    the monitor whose region starts at index 0 of every dimension writes
+    the times.
+
+    Example
+    -------
+    >>> ZarrMonitor('out.zarr', chunks={'ensemble': 1}).initialize(
+    ...     ensemble_state, n_times=n_steps)
+    >>> # then, in the process running member i
+    >>> monitor = ZarrMonitor('out.zarr', region={'ensemble': i})
+    """
+
+    def __init__(
+            self, path, time_units='seconds', store_names=None, aliases=None,
+            chunks=None, region=None):
+        """
+        Args
+        ----
+        path : str
+            The directory of the Zarr store. It is created if it does not
+            exist.
+        time_units : str, optional
+            The units in which time will be stored. Default is seconds.
+        store_names : iterable of str, optional
+            Names of quantities to store. If not given, all quantities are
+            stored.
+        aliases : dict, optional
+            A dictionary of string replacements to apply to state variable
+            names before storing them.
+        chunks : dict, optional
+            The length of the chunks of each dimension, for arrays created
+            by this monitor. Default is 1 for "time" and the whole length
+            of other dimensions.
+        region : dict, optional
+            The index or slice of each dimension to write to, for a monitor
+            writing a region of arrays created by initialize(). Default is
+            to write to the whole arrays.
+        """
+        import_zarr('ZarrMonitor')
+        self._path = path
+        self._time_units = time_units
+        if aliases is None:
+            self._aliases = {}
+        else:
+            self._aliases = aliases
+        check_aliases(self._aliases)
+        if store_names is None:
+            self._store_names = None
+        else:
+            self._store_names = ['time'] + list(store_names)
+        self._chunks = chunks or {}
+        self._region = region
+        self._group = None
+        self._schema = None
+        self._time_array = None
+        self._time_index = None
+        self._initialized_length = 0
+        self._reference_time = None
+
+    def _get_group(self):
+        if self._group is None:
+            zarr = import_zarr('ZarrMonitor')
+            self._group = zarr.open_group(store=self._path, mode='a')
+        return self._group
+
+    def initialize(self, state, n_times):
+        """
+        Create the arrays for the quantities in state, with space for
+        n_times times, without storing the state. Arrays which already exist
+        are checked to be compatible with the state.
+
+        Args
+        ----
+        state : dict
+            A model state dictionary for the whole domain.
+        n_times : int
+            The number of times for which to allocate space.
+        """
+        group = self._get_group()
+        self._ensure_time_exists(group, state['time'], n_times)
+        self._initialized_length = max(self._initialized_length, n_times)
+        for name, value in get_state_to_store(
+                state, self._store_names, self._aliases).items():
+            if name in group:
+                ensure_array_is_compatible(group[name], name, value)
+            else:
+                create_array(group, name, value, n_times, self._chunks)
+
+    def store(self, state):
+        """
+        Write the given state to the store, at the time index after the
+        last one written by this monitor.
+
+        Args
+        ----
+        state : dict
+            A model state dictionary.
+
+        Raises
+        ------
+        InvalidStateError
+            If the state does not have the same quantities, dims and
+            attributes as the arrays in the store, or if a region monitor
+            has no space left for another time.
+        """
+        group = self._get_group()
+        store_state = get_state_to_store(
+            state, self._store_names, self._aliases)
+        if self._schema is None:
+            self._initialize_schema(group, state, store_state)
+        elif store_state.keys() != self._schema.keys():
+            raise InvalidStateError(
+                'ZarrMonitor was passed a different set of quantities for '
+                'different times: {} vs. {}'.format(
+                    list(self._schema.keys()), list(store_state.keys())))
+        index = self._time_index
+        time_array = self._time_array
+        if index >= time_array.shape[0]:
+            if self._region is not None:
+                raise InvalidStateError(
+                    'Cannot store more than {} times in a region of {}'.format(
+                        time_array.shape[0], self._path))
+            self._resize_arrays(max(
+                2 * time_array.shape[0], index + 1, time_array.chunks[0]))
+        for name, value in store_state.items():
+            array, dims, attrs, region_index = self._schema[name]
+            if value.attrs != attrs:
+                ensure_array_is_compatible(
+                    array, name, value, ignore_dims=self._region)
+                attrs.update(value.attrs)
+            if value.dims != dims:
+                value = value.transpose(*dims)
+            array[(index,) + region_index] = value.values
+        if self._writes_time():
+            time_array[index] = self._get_time_value(
+                state['time'], time_array)
+        self._time_index += 1
+
+    def _resize_arrays(self, n_times):
+        """Set the length of the time dimension of all arrays written by
+        this monitor."""
+        for array in [self._time_array] + [
+                entry[0] for entry in self._schema.values()]:
+            array.resize((n_times,) + array.shape[1:])
+
+    def close(self):
+        """
+        Shrink the arrays to the times which have been stored, removing any
+        space added when they were extended. Space allocated by this
+        monitor's initialize() is kept. Further states can still be stored.
+        """
+        if self._schema is None or self._region is not None:
+            return
+        # count the times in the store, which may have been extended by
+        # another monitor since this one last stored a state
+        n_stored = int(np.sum(~np.isnan(self._time_array[:])))
+        n_times = max(n_stored, self._initialized_length)
+        if self._time_array.shape[0] > n_times:
+            self._resize_arrays(n_times)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _get_time_value(self, time, time_array):
+        """Returns the value to store in time_array for the given time, in
+        its units."""
+        units = time_array.attrs['units']
+        if isinstance(time, timedelta):
+            return from_unit_to_another(time.total_seconds(), 'seconds', units)
+        time_units, reference = units.split(' since ')
+        if self._reference_time is None:
+            if hasattr(time, 'calendar'):  # cftime datetime
+                self._reference_time = get_cftime().num2date(
+                    0, units, calendar=time.calendar)
+            else:
+                self._reference_time = datetime.strptime(
+                    reference, '%Y-%m-%d %H:%M:%S')
+        return from_unit_to_another(
+            (time - self._reference_time).total_seconds(), 'seconds',
+            time_units)
+
+    def _initialize_schema(self, group, state, store_state):
+        """Check the quantities to be stored against the store, creating
+        arrays for them if this is not a region monitor, and keep their
+        arrays, dims and attributes to check later states against."""
+        if self._region is None:
+            self._ensure_time_exists(group, state['time'], 0)
+        elif 'time' not in group:
+            raise InvalidStateError(
+                'Arrays in {} must be created with initialize() before a '
+                'region of them can be stored'.format(self._path))
+        time_array = group['time']
+        self._time_array = time_array
+        self._schema = {}
+        for name, value in store_state.items():
+            if name not in group:
+                if self._region is not None:
+                    raise InvalidStateError(
+                        'Quantity {} is not present in {}'.format(
+                            name, self._path))
+                create_array(
+                    group, name, value, time_array.shape[0], self._chunks)
+            array = group[name]
+            ensure_array_is_compatible(
+                array, name, value, ignore_dims=self._region)
+            region = self._get_region()
+            array_dims = get_array_dims(array)[1:]
+            dims = tuple(
+                dim for dim in array_dims
+                if not isinstance(region.get(dim), int))
+            region_index = tuple(
+                region.get(dim, slice(None)) for dim in array_dims)
+            self._schema[name] = (array, dims, dict(value.attrs), region_index)
+        if self._region is not None:
+            self._time_index = 0
+        else:
+            # continue after the times already written
+            self._time_index = int(np.sum(~np.isnan(time_array[:])))
+
+    def _get_region(self):
+        if self._region is None:
+            return {}
+        return self._region
+
+    def _writes_time(self):
+        for index in self._get_region().values():
+            if isinstance(index, slice):
+                index = index.start
+            if index not in (0, None):
+                return False
+        return True
+
+    def _ensure_time_exists(self, group, reference_time, n_times):
+        if 'time' in group:
+            return
+        if isinstance(reference_time, timedelta):
+            attrs = {'units': self._time_units}
+        else:  # assume datetime
+            attrs = {
+                'units': '{} since {}'.format(
+                    self._time_units,
+                    reference_time.strftime('%Y-%m-%d %H:%M:%S')),
+                'calendar': getattr(
+                    reference_time, 'calendar', 'proleptic_gregorian'),
+            }
+        time_array = create_zarr_array(
+            group, 'time', (n_times,), np.float64,
+            (self._chunks.get('time', 1),), ('time',))
+        time_array.attrs.update(attrs)
+
+
+def get_array_dims(array):
+    """Returns the dimension names of a zarr array."""
+    dimension_names = getattr(
+        getattr(array, 'metadata', None), 'dimension_names', None)
+    if dimension_names is not None:  # zarr 3
+        return tuple(dimension_names)
+    return tuple(array.attrs['_ARRAY_DIMENSIONS'])
+
+
+def create_zarr_array(group, name, shape, dtype, chunks, dims):
+    """Creates an array of missing values with named dimensions in a zarr
+    group, in a way which can be read by xarray."""
+    if np.issubdtype(dtype, np.floating):
+        fill_value = np.nan
+    else:
+        fill_value = 0
+    if hasattr(group, 'create_array'):  # zarr 3
+        return group.create_array(
+            name, shape=shape, dtype=dtype, chunks=chunks,
+            fill_value=fill_value, dimension_names=dims)
+    array = group.create_dataset(
+        name, shape=shape, dtype=dtype, chunks=chunks, fill_value=fill_value)
+    array.attrs['_ARRAY_DIMENSIONS'] = list(dims)
+    return array
+
+
+def create_array(group, name, data, n_times, chunks):
+    """Creates an array in the zarr group for the DataArray data, with a
+    leading time dimension of length n_times. chunks is a dictionary of
+    the chunk length of dimensions, which default to 1 for time and the
+    whole length of other dimensions."""
+    shape = (n_times,) + data.shape
+    chunks = (chunks.get('time', 1),) + tuple(
+        chunks.get(dim, max(length, 1))
+        for dim, length in zip(data.dims, data.shape))
+    array = create_zarr_array(
+        group, name, shape, data.dtype, chunks, ('time',) + data.dims)
+    array.attrs.update(get_json_attrs(data.attrs))
+    return array
+
+
+def ensure_array_is_compatible(array, name, data, ignore_dims=None):
+    """Raises InvalidStateError if the dims or attributes of the DataArray
+    data do not match those of the zarr array, apart from its leading time
+    dimension and any dimensions in ignore_dims which are not in data."""
+    if ignore_dims is None:
+        ignore_dims = {}
+    array_dims = [
+        dim for dim in get_array_dims(array)[1:]
+        if dim in data.dims or dim not in ignore_dims]
+    if sorted(array_dims) != sorted(data.dims):
+        raise InvalidStateError(
+            'Dimensions of {} in the store are {} but in the state are '
+            '{}'.format(name, array_dims, list(data.dims)))
+    for key, value in get_json_attrs(data.attrs).items():
+        if key not in array.attrs:
+            raise InvalidStateError(
+                'State has attr {} for quantity {} but this is not '
+                'present in the store'.format(key, name))
+        elif value != array.attrs[key]:
+            raise InvalidStateError(
+                'State has attr {} with value {} for quantity {} but '
+                'the value in the store is {}'.format(
+                    key, value, name, array.attrs[key]))
@@ -2,8 +2,9 @@ import abc
 
 import numpy as np
 
-from .dataarray import DataArray
 from .exceptions import InvalidStateError
+from .quantity_array import QuantityArray
+from .units import get_conversion_factors, units_are_same
 
 
 class StateBackend(object):
@@ -45,6 +46,53 @@ class StateBackend(object):
         """
         pass
 
+    def get_signature(self, state_value):
+        """
+        Returns a hashable description of the state value (for example its
+        dims, shape, units and dtype) such that values with equal signatures
+        can be converted using the same plan from
+        :py:meth:`~sympl.StateBackend.get_array_plan`. Returns None if
+        the backend does not support conversion plans, which is the default.
+        """
+        return None
+
+    def get_array_plan(self, state_value, name, target_units, target_dims, dim_lengths):
+        """
+        Precompute the work done by :py:meth:`~sympl.StateBackend.get_array`
+        for state values with the same signature as state_value.
+
+        Args:
+            state_value: The value from the state dictionary.
+            name (str): The name of the quantity.
+            target_units (str): The desired units.
+            target_dims (tuple): The desired dimensions.
+            dim_lengths (dict): Dictionary of dimension lengths for wildcard handling.
+
+        Returns:
+            plan: A callable taking a state value with the same signature as
+                state_value and returning the array get_array would return,
+                with a "shape" attribute giving the shape of that array. None
+                is returned if the backend does not support conversion plans,
+                which is the default.
+        """
+        return None
+
+    def replace_data(self, quantity, data):
+        """
+        Replace the data of a quantity previously returned by
+        :py:meth:`~sympl.StateBackend.create_quantity` with an array of the
+        same shape, modifying the quantity in place.
+
+        Args:
+            quantity: A quantity created by this backend.
+            data: The new raw data array.
+
+        Returns:
+            quantity: The modified quantity, or None if the backend does not
+                support replacing data, which is the default.
+        """
+        return None
+
     @abc.abstractmethod
     def get_dims(self, state_value):
         """
@@ -79,14 +127,51 @@ class DataArrayBackend(StateBackend):
         return self._get_numpy_array(quantity, target_dims, dim_lengths)
 
     def create_quantity(self, data, name, units, dims, reference_state=None):
+        from .dataarray import DataArray
         return DataArray(data, dims=dims, attrs={"units": units})
 
+    def replace_data(self, quantity, data):
+        quantity.data = data
+        return quantity
+
     def get_dims(self, state_value):
         return state_value.dims
 
     def get_shape(self, state_value):
         return state_value.shape
 
+    def get_signature(self, state_value):
+        return (
+            state_value.dims,
+            state_value.shape,
+            state_value.attrs.get("units"),
+            state_value.dtype,
+        )
+
+    def get_array_plan(self, state_value, name, target_units, target_dims, dim_lengths):
+        self._ensure_quantity_has_units(state_value, name)
+        units = state_value.attrs["units"]
+        plan = ArrayPlan()
+        if not units_are_same(units, target_units):
+            from pint.errors import DimensionalityError
+            try:
+                plan.scale, plan.offset = get_conversion_factors(units, target_units)
+            except DimensionalityError:
+                raise InvalidStateError(
+                    "Could not convert quantity {} from units {} to units {}".format(
+                        name, units, target_units
+                    )
+                )
+        (
+            plan.new_shape,
+            plan.axes,
+            plan.out_shape,
+            plan.shape,
+        ) = self._get_array_layout(
+            list(state_value.dims), state_value.shape, target_dims, dim_lengths
+        )
+        return plan
+
     def _ensure_quantity_has_units(self, quantity, quantity_name):
         if "units" not in quantity.attrs:
             raise InvalidStateError(
@@ -100,19 +185,42 @@ class DataArrayBackend(StateBackend):
         data_array.
         """
         values = data_array.values
-        if len(values.shape) == 0 and len(out_dims) == 0:
-            return values  # special case, 0-dimensional scalar array
+        new_shape, axes, out_shape, _ = self._get_array_layout(
+            list(data_array.dims), values.shape, out_dims, dim_lengths
+        )
+        return apply_array_layout(values, new_shape, axes, out_shape)
+
+    def _get_array_layout(self, current_dims, shape, out_dims, dim_lengths):
+        """
+        Determines how an array with the given dims and shape must be
+        reshaped, transposed and broadcast to have the desired out_dims.
+
+        Returns
+        -------
+        new_shape : tuple or None
+            Shape to reshape the array to before transposing, adding length 1
+            axes for missing dimensions.
+        axes : list or None
+            Axes to transpose the array to after reshaping.
+        out_shape : list or None
+            Shape to broadcast the array to after transposing.
+        final_shape : tuple
+            Shape of the resulting array.
+        """
+        shape = tuple(shape)
+        if len(shape) == 0 and len(out_dims) == 0:
+            return None, None, None, shape  # special case, 0-dimensional scalar array
 
-        current_dims = list(data_array.dims)
         if current_dims == out_dims:
-            return values
+            return None, None, None, shape
 
+        new_shape = None
         missing_dims = [dim for dim in out_dims if dim not in current_dims]
         if missing_dims:
             # expand_dims in xarray adds the dimension at axis 0 by default.
             # Doing this sequentially means they are stacked at the front in reverse order.
-            new_shape = (1,) * len(missing_dims) + values.shape
-            values = values.reshape(new_shape)
+            new_shape = (1,) * len(missing_dims) + shape
+            shape = new_shape
             current_dims = missing_dims[::-1] + current_dims
 
         # Determine extra dims that are not in out_dims, and append them to target order
@@ -121,7 +229,7 @@ class DataArrayBackend(StateBackend):
         target_dims = list(out_dims) + extra_dims
 
         if current_dims == target_dims:
-            numpy_array = values
+            axes = None
         else:
             # Calculate transpose axes
             dim_to_axis = {dim: i for i, dim in enumerate(current_dims)}
@@ -134,24 +242,94 @@ class DataArrayBackend(StateBackend):
                         target_dims, current_dims
                     )
                 )
-            numpy_array = values.transpose(axes)
+            shape = tuple(shape[i] for i in axes)
 
-        if not missing_dims:
-            out_array = numpy_array
-        else:
+        out_shape = None
+        if missing_dims:
             # expand out missing dims which are currently length 1.
             # Construct out_shape carefully to handle extra dimensions from numpy_array
             base_out_shape = [dim_lengths.get(name, 1) for name in out_dims]
             # Append shapes of extra dimensions from numpy_array
-            extra_shape = list(numpy_array.shape[len(out_dims) :])
-            out_shape = base_out_shape + extra_shape
-
-            if out_shape == list(numpy_array.shape):
-                out_array = numpy_array
-            else:
-                out_array = np.empty(out_shape, dtype=numpy_array.dtype)
-                out_array[:] = numpy_array
-        return out_array
+            extra_shape = list(shape[len(out_dims) :])
+            if base_out_shape + extra_shape != list(shape):
+                out_shape = base_out_shape + extra_shape
+                shape = tuple(out_shape)
+        return new_shape, axes, out_shape, shape
+
+
+class NumpyBackend(DataArrayBackend):
+    """
+    Backend which wraps component outputs in lightweight
+    :py:class:`~sympl.QuantityArray` objects instead of DataArrays, which
+    avoids the cost of creating DataArrays on every call. Inputs may be
+    either QuantityArray or DataArray objects. QuantityArray values are
+    converted to DataArrays by Sympl's monitors when they are stored.
+    """
+
+    def create_quantity(self, data, name, units, dims, reference_state=None):
+        return QuantityArray(data, dims, {"units": units})
+
+    def replace_data(self, quantity, data):
+        quantity.values = data
+        return quantity
+
+
+def apply_array_layout(values, new_shape, axes, out_shape):
+    """
+    Reshapes, transposes and broadcasts values as determined by
+    DataArrayBackend._get_array_layout.
+    """
+    if new_shape is not None:
+        values = values.reshape(new_shape)
+    if axes is not None:
+        values = values.transpose(axes)
+    if out_shape is not None:
+        out_array = np.empty(out_shape, dtype=values.dtype)
+        out_array[:] = values
+        values = out_array
+    return values
+
+
+class ArrayPlan(object):
+    """
+    A precomputed conversion from a DataArray with a known signature to the
+    numpy array requested from DataArrayBackend.get_array, as returned by
+    DataArrayBackend.get_array_plan.
+
+    Attributes
+    ----------
+    scale : float or None
+        Multiplicative unit conversion factor, or None if no unit conversion
+        is needed.
+    offset : float
+        Additive unit conversion term.
+    new_shape : tuple or None
+        Shape to reshape to before transposing.
+    axes : list or None
+        Axes to transpose to.
+    out_shape : list or None
+        Shape to broadcast to after transposing.
+    shape : tuple
+        Shape of the resulting array.
+    """
+
+    __slots__ = ("scale", "offset", "new_shape", "axes", "out_shape", "shape")
+
+    def __init__(self):
+        self.scale = None
+        self.offset = 0.0
+        self.new_shape = None
+        self.axes = None
+        self.out_shape = None
+        self.shape = None
+
+    def __call__(self, state_value):
+        values = state_value.values
+        if self.scale is not None:
+            values = values * self.scale
+            if self.offset != 0.0:
+                values += self.offset
+        return apply_array_layout(values, self.new_shape, self.axes, self.out_shape)
 
 
 _current_backend = DataArrayBackend()
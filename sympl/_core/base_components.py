@@ -1,6 +1,8 @@
 import abc
-from .get_np_arrays import get_numpy_arrays_with_properties
-from .restore_dataarray import restore_data_arrays_with_properties
+from .get_np_arrays import ArrayPlanCache
+from .restore_dataarray import (
+    restore_data_arrays_with_properties, RestorePlanCache, get_alias_or_name)
+from .init_np_arrays import initialize_numpy_arrays_with_properties, ArrayPool
 from .time import timedelta
 from .exceptions import (
     InvalidPropertyDictError, ComponentExtraOutputError,
@@ -8,6 +10,8 @@ from .exceptions import (
 from six import add_metaclass
 from .units import units_are_compatible
 from .tracers import TracerPacker
+from .ensemble import add_ensemble_dim, call_ensemble_members
+from .chunking import call_in_column_chunks
 try:
     from inspect import getfullargspec as getargspec
 except ImportError:
@@ -107,6 +111,57 @@ def check_overlapping_aliases(properties, properties_name):
                 )
 
 
+def call_array_call(
+        component, raw_state, args, input_properties, output_properties,
+        **out_kwargs):
+    """
+    Calls the array_call method of a component with the given raw state,
+    further positional arguments and preallocated outputs. If the component
+    sets column_chunk_size and does not use tracers, it is called on blocks
+    of columns (see call_in_column_chunks).
+    """
+    if (component.column_chunk_size is None or
+            getattr(component, 'uses_tracers', False)):
+        return component.array_call(raw_state, *args, **out_kwargs)
+    return call_in_column_chunks(
+        component.array_call, raw_state, args, input_properties,
+        output_properties, component.column_chunk_size,
+        max_workers=component.column_chunk_workers, **out_kwargs)
+
+
+def get_preallocated_outputs(
+        component, output_properties, input_properties, raw_state,
+        ignore_names=(), include_tracers=False):
+    """
+    Returns arrays from the output pool of a component for the quantities
+    in output_properties, with shapes determined from its raw input state
+    and input_properties, keyed by the names (or aliases) used by its
+    array_call.
+    If include_tracers is True and the component uses tracers, a "tracers"
+    array is included.
+    """
+    if len(ignore_names) > 0:
+        output_properties = {
+            name: properties for name, properties in output_properties.items()
+            if name not in ignore_names}
+    if include_tracers and component.uses_tracers:
+        tracer_dims = component.tracer_dims
+        prepend_tracers = getattr(component, 'prepend_tracers', None) or ()
+    else:
+        tracer_dims = None
+        prepend_tracers = ()
+    arrays = initialize_numpy_arrays_with_properties(
+        output_properties, raw_state, input_properties,
+        tracer_dims=tracer_dims, prepend_tracers=prepend_tracers,
+        pool=component._output_pool)
+    return_dict = {}
+    for name, array in arrays.items():
+        if name in output_properties:
+            name = get_alias_or_name(name, output_properties, input_properties)
+        return_dict[name] = array
+    return return_dict
+
+
 class InputChecker(object):
 
     def __init__(self, component):
@@ -408,6 +463,11 @@ class OutputChecker(object):
 @add_metaclass(ComponentMeta)
 class Stepper(object):
     """
+    Class attributes which control how array_call is called
+    (reuse_output_containers, preallocate_outputs, supports_ensemble,
+    column_chunk_size and column_chunk_workers) are described in the
+    "Writing Components" section of the documentation.
+
     Attributes
     ----------
     input_properties : dict
@@ -443,6 +503,11 @@ class Stepper(object):
     time_unit_timedelta = timedelta(seconds=1)
     uses_tracers = False
     tracer_dims = None
+    reuse_output_containers = False
+    preallocate_outputs = False
+    supports_ensemble = False
+    column_chunk_size = None
+    column_chunk_workers = None
 
     @abc.abstractproperty
     def input_properties(self):
@@ -498,12 +563,21 @@ class Stepper(object):
         self._tendencies_in_diagnostics = tendencies_in_diagnostics
         self.name = name or self.__class__.__name__
         super(Stepper, self).__init__()
+        self._input_plan_cache = ArrayPlanCache()
+        self._output_pool = ArrayPool()
+        self._diagnostic_restore_cache = RestorePlanCache(
+            reuse_containers=self.reuse_output_containers)
+        self._output_restore_cache = RestorePlanCache(
+            reuse_containers=self.reuse_output_containers)
         self._input_checker = InputChecker(self)
         self._diagnostic_checker = DiagnosticChecker(self)
         self._output_checker = OutputChecker(self)
         if tendencies_in_diagnostics:
+            self._added_diagnostic_names = self._insert_tendency_properties()
             self._diagnostic_checker.set_ignored_diagnostics(
-                self._insert_tendency_properties())
+                self._added_diagnostic_names)
+        else:
+            self._added_diagnostic_names = []
         self.__initialized = True
         if self.uses_tracers:
             if self.tracer_dims is None:
@@ -610,11 +684,41 @@ class Stepper(object):
         """
         self._check_self_is_initialized()
         self._input_checker.check_inputs(state)
-        raw_state = get_numpy_arrays_with_properties(state, self.input_properties)
+        input_properties = self.input_properties
+        diagnostic_properties = self.diagnostic_properties
+        output_properties = self.output_properties
+        signature = self._input_plan_cache.get_signature(
+            state, input_properties)
+        if self._input_plan_cache.get_ensemble_size(
+                state, input_properties, signature) is not None:
+            if not self.supports_ensemble or self.uses_tracers:
+                return call_ensemble_members(self, state, timestep)
+            input_properties = add_ensemble_dim(input_properties)
+            diagnostic_properties = add_ensemble_dim(diagnostic_properties)
+            output_properties = add_ensemble_dim(output_properties)
+            signature = None
+        raw_state = self._input_plan_cache.get_numpy_arrays(
+            state, input_properties, signature=signature)
         if self.uses_tracers:
             raw_state['tracers'] = self._tracer_packer.pack(state)
         raw_state['time'] = state['time']
-        raw_diagnostics, raw_new_state = self.array_call(raw_state, timestep)
+        if self.preallocate_outputs:
+            self._output_pool.reset(exclude=raw_state.values())
+            raw_diagnostics, raw_new_state = call_array_call(
+                self, raw_state, (timestep,), input_properties,
+                {'out_diagnostics': diagnostic_properties,
+                 'out_new_state': output_properties},
+                out_diagnostics=get_preallocated_outputs(
+                    self, diagnostic_properties, input_properties, raw_state,
+                    ignore_names=self._added_diagnostic_names),
+                out_new_state=get_preallocated_outputs(
+                    self, output_properties, input_properties, raw_state,
+                    include_tracers=True))
+        else:
+            raw_diagnostics, raw_new_state = call_array_call(
+                self, raw_state, (timestep,), input_properties,
+                {'out_diagnostics': diagnostic_properties,
+                 'out_new_state': output_properties})
         if self.uses_tracers:
             new_state = self._tracer_packer.unpack(
                 raw_new_state.pop('tracers'), state)
@@ -626,11 +730,13 @@ class Stepper(object):
             self._insert_tendencies_to_diagnostics(
                 raw_state, raw_new_state, timestep, raw_diagnostics)
         diagnostics = restore_data_arrays_with_properties(
-            raw_diagnostics, self.diagnostic_properties,
-            state, self.input_properties)
+            raw_diagnostics, diagnostic_properties,
+            state, input_properties,
+            plan_cache=self._diagnostic_restore_cache)
         new_state.update(restore_data_arrays_with_properties(
-            raw_new_state, self.output_properties,
-            state, self.input_properties))
+            raw_new_state, output_properties,
+            state, input_properties,
+            plan_cache=self._output_restore_cache))
         return diagnostics, new_state
 
     def _insert_tendencies_to_diagnostics(
@@ -647,6 +753,11 @@ class Stepper(object):
         Gets diagnostics from the current model state and steps the state
         forward in time according to the timestep.
 
+        If preallocate_outputs is True, this method is also given the
+        keyword arguments out_diagnostics and out_new_state, dictionaries
+        of numpy arrays with the shapes of its outputs which it may write
+        into and return. Their contents are left over from previous calls.
+
         Args
         ----
         state : dict
@@ -671,6 +782,11 @@ class Stepper(object):
 @add_metaclass(ComponentMeta)
 class TendencyComponent(object):
     """
+    Class attributes which control how array_call is called
+    (reuse_output_containers, preallocate_outputs, supports_ensemble,
+    column_chunk_size, column_chunk_workers and halo_width) are described
+    in the "Writing Components" section of the documentation.
+
     Attributes
     ----------
     input_properties : dict
@@ -709,6 +825,12 @@ class TendencyComponent(object):
     name = None
     uses_tracers = False
     tracer_tendency_time_unit = 's^-1'
+    reuse_output_containers = False
+    preallocate_outputs = False
+    supports_ensemble = False
+    column_chunk_size = None
+    column_chunk_workers = None
+    halo_width = 0
 
     def __str__(self):
         return (
@@ -750,6 +872,12 @@ class TendencyComponent(object):
         """
         self._tendencies_in_diagnostics = tendencies_in_diagnostics
         self.name = name or self.__class__.__name__
+        self._input_plan_cache = ArrayPlanCache()
+        self._output_pool = ArrayPool()
+        self._tendency_restore_cache = RestorePlanCache(
+            reuse_containers=self.reuse_output_containers)
+        self._diagnostic_restore_cache = RestorePlanCache(
+            reuse_containers=self.reuse_output_containers)
         self._input_checker = InputChecker(self)
         self._tendency_checker = TendencyChecker(self)
         self._diagnostic_checker = DiagnosticChecker(self)
@@ -836,11 +964,41 @@ class TendencyComponent(object):
         """
         self._check_self_is_initialized()
         self._input_checker.check_inputs(state)
-        raw_state = get_numpy_arrays_with_properties(state, self.input_properties)
+        input_properties = self.input_properties
+        tendency_properties = self.tendency_properties
+        diagnostic_properties = self.diagnostic_properties
+        signature = self._input_plan_cache.get_signature(
+            state, input_properties)
+        if self._input_plan_cache.get_ensemble_size(
+                state, input_properties, signature) is not None:
+            if not self.supports_ensemble or self.uses_tracers:
+                return call_ensemble_members(self, state)
+            input_properties = add_ensemble_dim(input_properties)
+            diagnostic_properties = add_ensemble_dim(diagnostic_properties)
+            tendency_properties = add_ensemble_dim(tendency_properties)
+            signature = None
+        raw_state = self._input_plan_cache.get_numpy_arrays(
+            state, input_properties, signature=signature)
         if self.uses_tracers:
             raw_state['tracers'] = self._tracer_packer.pack(state)
         raw_state['time'] = state['time']
-        raw_tendencies, raw_diagnostics = self.array_call(raw_state)
+        if self.preallocate_outputs:
+            self._output_pool.reset(exclude=raw_state.values())
+            raw_tendencies, raw_diagnostics = call_array_call(
+                self, raw_state, (), input_properties,
+                {'out_tendencies': tendency_properties,
+                 'out_diagnostics': diagnostic_properties},
+                out_tendencies=get_preallocated_outputs(
+                    self, tendency_properties, input_properties, raw_state,
+                    include_tracers=True),
+                out_diagnostics=get_preallocated_outputs(
+                    self, diagnostic_properties, input_properties, raw_state,
+                    ignore_names=self._added_diagnostic_names))
+        else:
+            raw_tendencies, raw_diagnostics = call_array_call(
+                self, raw_state, (), input_properties,
+                {'out_tendencies': tendency_properties,
+                 'out_diagnostics': diagnostic_properties})
         if self.uses_tracers:
             out_tendencies = self._tracer_packer.unpack(
                 raw_tendencies.pop('tracers'), state,
@@ -850,12 +1008,14 @@ class TendencyComponent(object):
         self._tendency_checker.check_tendencies(raw_tendencies)
         self._diagnostic_checker.check_diagnostics(raw_diagnostics)
         out_tendencies.update(restore_data_arrays_with_properties(
-            raw_tendencies, self.tendency_properties,
-            state, self.input_properties))
+            raw_tendencies, tendency_properties,
+            state, input_properties,
+            plan_cache=self._tendency_restore_cache))
         diagnostics = restore_data_arrays_with_properties(
-            raw_diagnostics, self.diagnostic_properties,
-            state, self.input_properties,
-            ignore_names=self._added_diagnostic_names)
+            raw_diagnostics, diagnostic_properties,
+            state, input_properties,
+            ignore_names=self._added_diagnostic_names,
+            plan_cache=self._diagnostic_restore_cache)
         if self.tendencies_in_diagnostics:
             self._insert_tendencies_to_diagnostics(out_tendencies, diagnostics)
         return out_tendencies, diagnostics
@@ -870,6 +1030,11 @@ class TendencyComponent(object):
         """
         Gets tendencies and diagnostics from the passed model state.
 
+        If preallocate_outputs is True, this method is also given the
+        keyword arguments out_tendencies and out_diagnostics, dictionaries
+        of numpy arrays with the shapes of its outputs which it may write
+        into and return. Their contents are left over from previous calls.
+
         Args
         ----
         state : dict
@@ -896,6 +1061,11 @@ class TendencyComponent(object):
 @add_metaclass(ComponentMeta)
 class ImplicitTendencyComponent(object):
     """
+    Class attributes which control how array_call is called
+    (reuse_output_containers, preallocate_outputs, supports_ensemble,
+    column_chunk_size, column_chunk_workers and halo_width) are described
+    in the "Writing Components" section of the documentation.
+
     Attributes
     ----------
     input_properties : dict
@@ -934,6 +1104,12 @@ class ImplicitTendencyComponent(object):
     name = None
     uses_tracers = False
     tracer_tendency_time_unit = 's^-1'
+    reuse_output_containers = False
+    preallocate_outputs = False
+    supports_ensemble = False
+    column_chunk_size = None
+    column_chunk_workers = None
+    halo_width = 0
 
     def __str__(self):
         return (
@@ -975,6 +1151,12 @@ class ImplicitTendencyComponent(object):
         self._tendencies_in_diagnostics = tendencies_in_diagnostics
         self.name = name or self.__class__.__name__
         self._added_diagnostic_names = []
+        self._input_plan_cache = ArrayPlanCache()
+        self._output_pool = ArrayPool()
+        self._tendency_restore_cache = RestorePlanCache(
+            reuse_containers=self.reuse_output_containers)
+        self._diagnostic_restore_cache = RestorePlanCache(
+            reuse_containers=self.reuse_output_containers)
         self._input_checker = InputChecker(self)
         self._diagnostic_checker = DiagnosticChecker(self)
         self._tendency_checker = TendencyChecker(self)
@@ -1061,11 +1243,41 @@ class ImplicitTendencyComponent(object):
         """
         self._check_self_is_initialized()
         self._input_checker.check_inputs(state)
-        raw_state = get_numpy_arrays_with_properties(state, self.input_properties)
+        input_properties = self.input_properties
+        tendency_properties = self.tendency_properties
+        diagnostic_properties = self.diagnostic_properties
+        signature = self._input_plan_cache.get_signature(
+            state, input_properties)
+        if self._input_plan_cache.get_ensemble_size(
+                state, input_properties, signature) is not None:
+            if not self.supports_ensemble or self.uses_tracers:
+                return call_ensemble_members(self, state, timestep)
+            input_properties = add_ensemble_dim(input_properties)
+            diagnostic_properties = add_ensemble_dim(diagnostic_properties)
+            tendency_properties = add_ensemble_dim(tendency_properties)
+            signature = None
+        raw_state = self._input_plan_cache.get_numpy_arrays(
+            state, input_properties, signature=signature)
         if self.uses_tracers:
             raw_state['tracers'] = self._tracer_packer.pack(state)
         raw_state['time'] = state['time']
-        raw_tendencies, raw_diagnostics = self.array_call(raw_state, timestep)
+        if self.preallocate_outputs:
+            self._output_pool.reset(exclude=raw_state.values())
+            raw_tendencies, raw_diagnostics = call_array_call(
+                self, raw_state, (timestep,), input_properties,
+                {'out_tendencies': tendency_properties,
+                 'out_diagnostics': diagnostic_properties},
+                out_tendencies=get_preallocated_outputs(
+                    self, tendency_properties, input_properties, raw_state,
+                    include_tracers=True),
+                out_diagnostics=get_preallocated_outputs(
+                    self, diagnostic_properties, input_properties, raw_state,
+                    ignore_names=self._added_diagnostic_names))
+        else:
+            raw_tendencies, raw_diagnostics = call_array_call(
+                self, raw_state, (timestep,), input_properties,
+                {'out_tendencies': tendency_properties,
+                 'out_diagnostics': diagnostic_properties})
         if self.uses_tracers:
             out_tendencies = self._tracer_packer.unpack(
                 raw_tendencies.pop('tracers'), state,
@@ -1075,12 +1287,14 @@ class ImplicitTendencyComponent(object):
         self._tendency_checker.check_tendencies(raw_tendencies)
         self._diagnostic_checker.check_diagnostics(raw_diagnostics)
         out_tendencies.update(restore_data_arrays_with_properties(
-            raw_tendencies, self.tendency_properties,
-            state, self.input_properties))
+            raw_tendencies, tendency_properties,
+            state, input_properties,
+            plan_cache=self._tendency_restore_cache))
         diagnostics = restore_data_arrays_with_properties(
-            raw_diagnostics, self.diagnostic_properties,
-            state, self.input_properties,
-            ignore_names=self._added_diagnostic_names)
+            raw_diagnostics, diagnostic_properties,
+            state, input_properties,
+            ignore_names=self._added_diagnostic_names,
+            plan_cache=self._diagnostic_restore_cache)
         if self.tendencies_in_diagnostics:
             self._insert_tendencies_to_diagnostics(out_tendencies, diagnostics)
         self._last_update_time = state['time']
@@ -1096,6 +1310,11 @@ class ImplicitTendencyComponent(object):
         """
         Gets tendencies and diagnostics from the passed model state.
 
+        If preallocate_outputs is True, this method is also given the
+        keyword arguments out_tendencies and out_diagnostics, dictionaries
+        of numpy arrays with the shapes of its outputs which it may write
+        into and return. Their contents are left over from previous calls.
+
         Args
         ----
         state : dict
@@ -1123,6 +1342,11 @@ class ImplicitTendencyComponent(object):
 @add_metaclass(ComponentMeta)
 class DiagnosticComponent(object):
     """
+    Class attributes which control how array_call is called
+    (reuse_output_containers, preallocate_outputs, supports_ensemble,
+    column_chunk_size, column_chunk_workers and halo_width) are described
+    in the "Writing Components" section of the documentation.
+
     Attributes
     ----------
     input_properties : dict
@@ -1135,6 +1359,13 @@ class DiagnosticComponent(object):
         'units'.
     """
 
+    reuse_output_containers = False
+    preallocate_outputs = False
+    supports_ensemble = False
+    column_chunk_size = None
+    column_chunk_workers = None
+    halo_width = 0
+
     @abc.abstractproperty
     def input_properties(self):
         return {}
@@ -1169,6 +1400,10 @@ class DiagnosticComponent(object):
         """
         Initializes the Stepper object.
         """
+        self._input_plan_cache = ArrayPlanCache()
+        self._output_pool = ArrayPool()
+        self._diagnostic_restore_cache = RestorePlanCache(
+            reuse_containers=self.reuse_output_containers)
         self._input_checker = InputChecker(self)
         self._diagnostic_checker = DiagnosticChecker(self)
         self.__initialized = True
@@ -1214,13 +1449,36 @@ class DiagnosticComponent(object):
         """
         self._check_self_is_initialized()
         self._input_checker.check_inputs(state)
-        raw_state = get_numpy_arrays_with_properties(state, self.input_properties)
+        input_properties = self.input_properties
+        diagnostic_properties = self.diagnostic_properties
+        signature = self._input_plan_cache.get_signature(
+            state, input_properties)
+        if self._input_plan_cache.get_ensemble_size(
+                state, input_properties, signature) is not None:
+            if not self.supports_ensemble:
+                return call_ensemble_members(self, state)
+            input_properties = add_ensemble_dim(input_properties)
+            diagnostic_properties = add_ensemble_dim(diagnostic_properties)
+            signature = None
+        raw_state = self._input_plan_cache.get_numpy_arrays(
+            state, input_properties, signature=signature)
         raw_state['time'] = state['time']
-        raw_diagnostics = self.array_call(raw_state)
+        if self.preallocate_outputs:
+            self._output_pool.reset(exclude=raw_state.values())
+            raw_diagnostics = call_array_call(
+                self, raw_state, (), input_properties,
+                {'out_diagnostics': diagnostic_properties},
+                out_diagnostics=get_preallocated_outputs(
+                    self, diagnostic_properties, input_properties, raw_state))
+        else:
+            raw_diagnostics = call_array_call(
+                self, raw_state, (), input_properties,
+                {'out_diagnostics': diagnostic_properties})
         self._diagnostic_checker.check_diagnostics(raw_diagnostics)
         diagnostics = restore_data_arrays_with_properties(
-            raw_diagnostics, self.diagnostic_properties,
-            state, self.input_properties)
+            raw_diagnostics, diagnostic_properties,
+            state, input_properties,
+            plan_cache=self._diagnostic_restore_cache)
         return diagnostics
 
     @abc.abstractmethod
@@ -1228,6 +1486,11 @@ class DiagnosticComponent(object):
         """
         Gets diagnostics from the passed model state.
 
+        If preallocate_outputs is True, this method is also given the
+        keyword argument out_diagnostics, a dictionary of numpy arrays with
+        the shapes of its outputs which it may write into and return. Their
+        contents are left over from previous calls.
+
         Args
         ----
         state : dict
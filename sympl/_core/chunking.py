@@ -0,0 +1,157 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from .exceptions import InvalidPropertyDictError
+from .restore_dataarray import get_alias_or_name
+
+# Thread pools used to call array_call on column chunks, by process id and
+# number of workers, so that a forked process does not reuse the pools of
+# its parent (whose threads it does not have).
+_thread_pools = {}
+
+
+def get_thread_pool(max_workers):
+    key = (os.getpid(), max_workers)
+    if key not in _thread_pools:
+        _thread_pools[key] = ThreadPoolExecutor(max_workers=max_workers)
+    return _thread_pools[key]
+
+
+def get_wildcard_axes(properties, input_properties):
+    """
+    Returns a dictionary whose keys are the names (or aliases) used by
+    array_call for the quantities in properties, and values are the index of
+    the flattened wildcard axis in their arrays, or None if their dims do
+    not contain a wildcard.
+    """
+    return_dict = {}
+    for name, quantity_properties in properties.items():
+        dims = quantity_properties.get('dims', None)
+        if dims is None and name in input_properties:
+            dims = input_properties[name].get('dims', None)
+        raw_name = get_alias_or_name(name, properties, input_properties)
+        if dims is not None and '*' in dims:
+            return_dict[raw_name] = list(dims).index('*')
+        else:
+            return_dict[raw_name] = None
+    return return_dict
+
+
+def select_columns(arrays, axes, index):
+    """
+    Returns a dictionary of views of the given arrays, selecting index along
+    the axis given for each in axes. Values without an axis are included
+    as they are.
+    """
+    return_dict = {}
+    for name, value in arrays.items():
+        axis = axes.get(name, None)
+        if axis is None:
+            return_dict[name] = value
+        else:
+            return_dict[name] = value[(slice(None),) * axis + (index,)]
+    return return_dict
+
+
+def call_in_column_chunks(
+        array_call, raw_state, args, input_properties, output_properties,
+        chunk_size, max_workers=None, **out_kwargs):
+    """
+    Calls array_call on blocks of at most chunk_size columns along the
+    flattened wildcard axis of raw_state, and returns its outputs for all
+    columns.
+
+    Args
+    ----
+    array_call : callable
+        The array_call method of a component.
+    raw_state : dict
+        The numpy array state to be passed to array_call.
+    args : tuple
+        Further positional arguments for array_call, such as the timestep.
+    input_properties : dict
+        The input properties used to create raw_state.
+    output_properties : dict
+        A dictionary whose keys are the names of the keyword arguments
+        array_call takes to write each of its outputs in place (such as
+        'out_tendencies' or 'out_diagnostics'), in the order the outputs
+        are returned, and values are the properties of those outputs.
+    chunk_size : int
+        The maximum number of columns in each block.
+    max_workers : int, optional
+        If greater than 1, blocks are computed concurrently on a thread pool
+        with this many threads. Default is to compute them one at a time.
+    **out_kwargs
+        Dictionaries of preallocated output arrays for the whole domain,
+        passed with the keys of output_properties. Each call of array_call
+        is given the views of these arrays for its block, so that outputs
+        written in place need not be copied.
+
+    Returns
+    -------
+    outputs : dict or tuple of dict
+        The outputs of array_call for all columns, as a single dictionary if
+        output_properties has one entry and otherwise as a tuple.
+
+    Raises
+    ------
+    InvalidPropertyDictError
+        If an output of array_call does not have a wildcard in its dims.
+    """
+    input_axes = get_wildcard_axes(input_properties, input_properties)
+    n_columns = None
+    for name, axis in input_axes.items():
+        if axis is not None:
+            n_columns = raw_state[name].shape[axis]
+            break
+    if n_columns is None or n_columns <= chunk_size:
+        return array_call(raw_state, *args, **out_kwargs)
+    is_dict = len(output_properties) == 1
+    output_axes = {
+        key: get_wildcard_axes(properties, input_properties)
+        for key, properties in output_properties.items()}
+    indices = [
+        slice(start, start + chunk_size)
+        for start in range(0, n_columns, chunk_size)]
+
+    def call_chunk(index):
+        chunk_out_kwargs = {
+            key: select_columns(arrays, output_axes[key], index)
+            for key, arrays in out_kwargs.items()}
+        outputs = array_call(
+            select_columns(raw_state, input_axes, index), *args,
+            **chunk_out_kwargs)
+        if is_dict:
+            outputs = (outputs,)
+        return dict(zip(output_properties.keys(), outputs)), chunk_out_kwargs
+
+    if max_workers is not None and max_workers > 1:
+        chunk_results = list(get_thread_pool(max_workers).map(call_chunk, indices))
+    else:
+        chunk_results = [call_chunk(index) for index in indices]
+    combined = []
+    for key, axes in output_axes.items():
+        return_dict = {}
+        for name, value in chunk_results[0][0][key].items():
+            if name not in axes:
+                return_dict[name] = value  # unexpected, caught by checkers
+                continue
+            elif axes[name] is None:
+                raise InvalidPropertyDictError(
+                    'Output {} does not have a wildcard in its dims, so it '
+                    'cannot be computed in column chunks'.format(name))
+            chunks = [outputs[key][name] for outputs, _ in chunk_results]
+            if name in out_kwargs.get(key, {}):
+                # scatter into the preallocated output, unless written there
+                for chunk, (_, chunk_out_kwargs) in zip(chunks, chunk_results):
+                    target = chunk_out_kwargs[key][name]
+                    if chunk is not target:
+                        target[...] = chunk
+                return_dict[name] = out_kwargs[key][name]
+            else:
+                return_dict[name] = np.concatenate(chunks, axis=axes[name])
+        combined.append(return_dict)
+    if is_dict:
+        return combined[0]
+    else:
+        return tuple(combined)
@@ -1,5 +1,5 @@
 from .exceptions import InvalidPropertyDictError
-from .tracers import get_tracer_input_properties
+from .tracers import get_tracer_input_properties, get_tracer_generation
 from .units import units_are_compatible
 
 
@@ -106,3 +106,51 @@ def combine_properties(property_list, input_properties=None):
                         'Incompatibility between dims of quantity {}: {}'.format(
                             name, err.args[0]))
     return return_dict
+
+
+class PropertiesCache(object):
+    """
+    Stores properties dictionaries which are combined from the properties of
+    a list of components, so they are only computed once. Cached values are
+    discarded when the tracer registry or the list of components changes,
+    or when clear() is called.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._components = None
+        self._tracer_generation = None
+
+    def clear(self):
+        """Discard all cached properties dictionaries."""
+        self._values.clear()
+
+    def get(self, name, components, compute):
+        """
+        Args
+        ----
+        name : str
+            The name of the cached properties dictionary.
+        components : iterable
+            The components the properties dictionary is combined from.
+        compute : callable
+            Function taking no arguments which computes the properties
+            dictionary if it is not cached.
+
+        Returns
+        -------
+        properties : dict
+            The cached properties dictionary.
+        """
+        generation = get_tracer_generation()
+        if (components is not self._components or
+                generation != self._tracer_generation):
+            self._values.clear()
+            self._components = components
+            self._tracer_generation = generation
+        try:
+            return self._values[name]
+        except KeyError:
+            value = compute()
+            self._values[name] = value
+            return value
@@ -1,7 +1,9 @@
+from concurrent.futures import Executor, ThreadPoolExecutor
 from .base_components import TendencyComponent, DiagnosticComponent, Monitor, ImplicitTendencyComponent
 from .util import (
     update_dict_by_adding_another, ensure_no_shared_keys)
-from .combine_properties import combine_component_properties
+from .combine_properties import combine_component_properties, PropertiesCache
+from .shared_memory import SharedMemoryExecutor
 from .exceptions import InvalidPropertyDictError
 
 
@@ -9,7 +11,10 @@ class InputPropertiesCompositeMixin(object):
 
     @property
     def input_properties(self):
-        return combine_component_properties(self.component_list, 'input_properties')
+        return self._properties_cache.get(
+            'input_properties', self.component_list,
+            lambda: combine_component_properties(
+                self.component_list, 'input_properties'))
 
     def __init__(self, *args):
         self.input_properties
@@ -26,6 +31,11 @@ class DiagnosticPropertiesCompositeMixin(object):
 
     @property
     def diagnostic_properties(self):
+        return self._properties_cache.get(
+            'diagnostic_properties', self.component_list,
+            self._combine_diagnostic_properties)
+
+    def _combine_diagnostic_properties(self):
         return_dict = {}
         for component in self.component_list:
             ensure_no_shared_keys(component.diagnostic_properties, return_dict)
@@ -55,9 +65,13 @@ class ComponentComposite(object):
     ----------
     component_list: list
         The components being composited by this object.
+    executor: concurrent.futures.Executor, SharedMemoryExecutor or None
+        The executor used to call the composited components concurrently,
+        or None if they are called sequentially.
     """
 
     component_class = None
+    allow_process_executor = True
 
     def __str__(self):
         return '{}(\n{}\n)'.format(
@@ -69,12 +83,28 @@ class ComponentComposite(object):
             self.__class__,
             ',\n'.join(repr(component) for component in self.component_list))
 
-    def __init__(self, *args):
+    def __init__(self, *args, **kwargs):
         """
         Args
         ----
         *args
             The components that should be wrapped by this object.
+        executor : str or concurrent.futures.Executor, optional
+            How to call the composited components. By default they are
+            called one after another. If 'thread', they are called
+            concurrently on a thread pool owned by this object, which
+            speeds up components that release the GIL (for example in
+            numpy, numba or compiled extension code). If 'process', they
+            are called in worker processes which receive the state through
+            shared memory (see SharedMemoryExecutor), which also speeds up
+            components that hold the GIL. An Executor instance
+            can also be given, in which case it is used but not shut down
+            by this object. Outputs are always combined in the order of
+            the components, so results do not depend on the executor.
+        max_workers : int, optional
+            The number of worker threads or processes when executor is
+            'thread' or 'process'. Default is one per component (up to the
+            number of CPUs for processes).
 
         Raises
         ------
@@ -85,11 +115,114 @@ class ComponentComposite(object):
             output quantity, and their dimensions or units are incompatible
             with one another.
         """
+        executor = kwargs.pop('executor', None)
+        max_workers = kwargs.pop('max_workers', None)
+        if len(kwargs) > 0:
+            raise TypeError(
+                '{}() got unexpected keyword arguments {}'.format(
+                    self.__class__.__name__, list(kwargs.keys())))
         if self.component_class is not None:
             ensure_components_have_class(args, self.component_class)
+        self._properties_cache = PropertiesCache()
         self.component_list = args
+        self._executor_option = executor
+        self._max_workers = max_workers
+        self._owned_executor = None
+        if executor == 'process' and not self.allow_process_executor:
+            raise ValueError(
+                "executor='process' is not supported by {}".format(
+                    self.__class__.__name__))
+        elif executor not in (None, 'thread', 'process') and not isinstance(
+                executor, Executor):
+            raise ValueError(
+                "executor must be None, 'thread', 'process', or an instance "
+                "of concurrent.futures.Executor, got {}".format(executor))
         super(ComponentComposite, self).__init__()
 
+    @property
+    def executor(self):
+        if self._executor_option == 'thread':
+            if self._owned_executor is None:
+                if self._max_workers is None:
+                    max_workers = max(len(self.component_list), 1)
+                else:
+                    max_workers = self._max_workers
+                self._owned_executor = ThreadPoolExecutor(
+                    max_workers=max_workers)
+            return self._owned_executor
+        elif self._executor_option == 'process':
+            if (self._owned_executor is not None and
+                    self._owned_executor.components is not self.component_list):
+                self.shutdown()  # workers have an outdated component list
+            if self._owned_executor is None:
+                self._owned_executor = SharedMemoryExecutor(
+                    self.component_list, max_workers=self._max_workers)
+            return self._owned_executor
+        else:
+            return self._executor_option
+
+    def shutdown(self):
+        """
+        Shut down any executor created by this object, stopping its worker
+        threads or processes. A new one is created if the composite is
+        called again.
+        """
+        if self._owned_executor is not None:
+            self._owned_executor.shutdown()
+            self._owned_executor = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_owned_executor'] = None
+        return state
+
+    def _call_components(self, method_name, *args):
+        """
+        Call the given method of each composited component with the given
+        arguments, and return the results in the order of component_list.
+        """
+        executor = self.executor
+        if executor is None:
+            return [
+                call_component(component, method_name, *args)
+                for component in self.component_list]
+        elif isinstance(executor, SharedMemoryExecutor):
+            return executor.call_components(method_name, *args)
+        futures = [
+            executor.submit(call_component, component, method_name, *args)
+            for component in self.component_list]
+        return [future.result() for future in futures]
+
+    def clear_properties_cache(self):
+        """
+        Discard the cached combined properties dictionaries of this object
+        and of any composited components, so they are recomputed from the
+        component properties on next access. This is only needed if the
+        properties dictionaries of a component are modified after this
+        object is created. Caches are cleared automatically when a tracer
+        is registered or component_list is replaced.
+        """
+        self._properties_cache.clear()
+        for component in self.component_list:
+            if hasattr(component, 'clear_properties_cache'):
+                component.clear_properties_cache()
+
+
+def call_component(component, method_name, *args):
+    """
+    Call the given method of a component. Only the first argument (the state)
+    is passed to the __call__ method of a TendencyComponent, so that
+    composites can mix TendencyComponent and ImplicitTendencyComponent
+    objects. ImplicitTendencyComponent is checked first, since wrappers of
+    an ImplicitTendencyComponent (such as ScalingWrapper) are instances of
+    both.
+    """
+    if (method_name == '__call__' and
+            not isinstance(component, ImplicitTendencyComponent) and
+            isinstance(component, TendencyComponent)):
+        args = args[:1]
+    return getattr(component, method_name)(*args)
+
 
 def ensure_components_have_class(components, component_class):
     for component in components:
@@ -107,15 +240,26 @@ class TendencyComponentComposite(
 
     @property
     def tendency_properties(self):
-        return combine_component_properties(
-            self.component_list, 'tendency_properties', self.input_properties)
+        return self._properties_cache.get(
+            'tendency_properties', self.component_list,
+            lambda: combine_component_properties(
+                self.component_list, 'tendency_properties',
+                self.input_properties))
 
-    def __init__(self, *args):
+    def __init__(self, *args, **kwargs):
         """
         Args
         ----
         *args
             The components that should be wrapped by this object.
+        executor : str or concurrent.futures.Executor, optional
+            How to call the composited components. By default they are
+            called one after another. If 'thread' or 'process', they are
+            called concurrently on a thread or process pool owned by this
+            object. See ComponentComposite for details.
+        max_workers : int, optional
+            The number of worker threads or processes when executor is
+            'thread' or 'process'.
 
         Raises
         ------
@@ -126,7 +270,7 @@ class TendencyComponentComposite(
             output quantity, and their dimensions or units are incompatible
             with one another.
         """
-        super(TendencyComponentComposite, self).__init__(*args)
+        super(TendencyComponentComposite, self).__init__(*args, **kwargs)
         self.input_properties
         self.tendency_properties
         self.diagnostic_properties
@@ -160,8 +304,7 @@ class TendencyComponentComposite(
         """
         return_tendencies = {}
         return_diagnostics = {}
-        for prognostic in self.component_list:
-            tendencies, diagnostics = prognostic(state)
+        for tendencies, diagnostics in self._call_components('__call__', state):
             update_dict_by_adding_another(return_tendencies, tendencies)
             return_diagnostics.update(diagnostics)
         return return_tendencies, return_diagnostics
@@ -178,15 +321,26 @@ class ImplicitTendencyComponentComposite(
 
     @property
     def tendency_properties(self):
-        return combine_component_properties(
-            self.component_list, 'tendency_properties', self.input_properties)
+        return self._properties_cache.get(
+            'tendency_properties', self.component_list,
+            lambda: combine_component_properties(
+                self.component_list, 'tendency_properties',
+                self.input_properties))
 
-    def __init__(self, *args):
+    def __init__(self, *args, **kwargs):
         """
         Args
         ----
         *args
             The components that should be wrapped by this object.
+        executor : str or concurrent.futures.Executor, optional
+            How to call the composited components. By default they are
+            called one after another. If 'thread' or 'process', they are
+            called concurrently on a thread or process pool owned by this
+            object. See ComponentComposite for details.
+        max_workers : int, optional
+            The number of worker threads or processes when executor is
+            'thread' or 'process'.
 
         Raises
         ------
@@ -197,7 +351,7 @@ class ImplicitTendencyComponentComposite(
             output quantity, and their dimensions or units are incompatible
             with one another.
         """
-        super(ImplicitTendencyComponentComposite, self).__init__(*args)
+        super(ImplicitTendencyComponentComposite, self).__init__(*args, **kwargs)
         self.input_properties
         self.tendency_properties
         self.diagnostic_properties
@@ -231,11 +385,8 @@ class ImplicitTendencyComponentComposite(
         """
         return_tendencies = {}
         return_diagnostics = {}
-        for prognostic in self.component_list:
-            if isinstance(prognostic, ImplicitTendencyComponent):
-                tendencies, diagnostics = prognostic(state, timestep)
-            elif isinstance(prognostic, TendencyComponent):
-                tendencies, diagnostics = prognostic(state)
+        for tendencies, diagnostics in self._call_components(
+                '__call__', state, timestep):
             update_dict_by_adding_another(return_tendencies, tendencies)
             return_diagnostics.update(diagnostics)
         return return_tendencies, return_diagnostics
@@ -274,8 +425,7 @@ class DiagnosticComponentComposite(
             If state is not a valid input for a DiagnosticComponent instance.
         """
         return_diagnostics = {}
-        for diagnostic_component in self.component_list:
-            diagnostics = diagnostic_component(state)
+        for diagnostics in self._call_components('__call__', state):
             # ensure two diagnostics don't compute the same quantity
             ensure_no_shared_keys(return_diagnostics, diagnostics)
             return_diagnostics.update(diagnostics)
@@ -288,6 +438,7 @@ class DiagnosticComponentComposite(
 class MonitorComposite(ComponentComposite):
 
     component_class = Monitor
+    allow_process_executor = False
 
     def store(self, state):
         """
@@ -306,5 +457,4 @@ class MonitorComposite(ComponentComposite):
         InvalidStateError
             If state is not a valid input for a Monitor instance.
         """
-        for monitor in self.component_list:
-            monitor.store(state)
+        self._call_components('store', state)
@@ -1,8 +1,17 @@
-from .dataarray import DataArray
+from .quantity_array import QuantityArray
 from .units import is_valid_unit
 
 
 class ConstantDict(dict):
+    """
+    A dictionary of constants. Values are stored as QuantityArray objects so
+    that xarray need not be imported to define or retrieve constants, and
+    are returned as DataArrays when accessed as items of the dictionary.
+    A constant is converted to a DataArray (holding a copy of its value) the
+    first time it is accessed, and that DataArray is stored in place of it,
+    so that later accesses return the same object and changes made to it in
+    place are kept.
+    """
 
     def __repr__(self):
         return self._repr()
@@ -15,10 +24,11 @@ class ConstantDict(dict):
                 return_string += category.title() + '\n'
             for name in name_list:
                 printed_names.add(name)
-                units = self[name].attrs['units']
+                quantity = self.get_quantity(name)
+                units = quantity.attrs['units']
                 units = units.replace('dimensionless', '')
                 return_string += '\t{}: {} {}\n'.format(
-                    name, self[name].values.item(), units)
+                    name, quantity.values.item(), units)
                 if sphinx:
                     return_string += '\n'
             return_string += '\n'
@@ -26,9 +36,10 @@ class ConstantDict(dict):
             return_string += 'User Defined\n'
             for name in self.keys():
                 if name not in printed_names:
-                    units = self[name].attrs['units']
+                    quantity = self.get_quantity(name)
+                    units = quantity.attrs['units']
                     return_string += '\t{}: {} {}\n'.format(
-                        name, self[name].values.item(), units)
+                        name, quantity.values.item(), units)
                     if sphinx:
                         return_string += '\n'
             return_string += '\n'
@@ -60,11 +71,30 @@ class ConstantDict(dict):
         return self._proxy_dict.keys()
 
     def values(self):
+        self._convert_all()
         return self._proxy_dict.values()
 
     def items(self):
+        self._convert_all()
         return self._proxy_dict.items()
 
+    def _convert_all(self):
+        for name in list(super(ConstantDict, self).keys()):
+            self._get_dataarray(name)
+
+    def _get_dataarray(self, name):
+        """
+        Returns the constant stored under name (which is not an alias) as a
+        DataArray, storing the DataArray in its place if it was converted.
+        """
+        value = super(ConstantDict, self).__getitem__(name)
+        if isinstance(value, QuantityArray):
+            value = QuantityArray(
+                value.values.copy(), dims=value.dims,
+                attrs=value.attrs).to_dataarray()
+            super(ConstantDict, self).__setitem__(name, value)
+        return value
+
     def __setitem__(self, key, value):
         if key in constant_aliases.keys():
             super(ConstantDict, self).__setitem__(get_alias(key), value)
@@ -72,6 +102,17 @@ class ConstantDict(dict):
             super(ConstantDict, self).__setitem__(key, value)
 
     def __getitem__(self, item):
+        if item in constant_aliases.keys():
+            return self._get_dataarray(get_alias(item))
+        else:
+            return self._get_dataarray(item)
+
+    def get_quantity(self, item):
+        """
+        Returns a constant as it is stored, without converting it to a
+        DataArray. This is a QuantityArray, or a DataArray if the constant
+        has already been accessed as an item.
+        """
         if item in constant_aliases.keys():
             return super(ConstantDict, self).__getitem__(get_alias(item))
         else:
@@ -94,38 +135,38 @@ default_constant_aliases = {
 }
 
 default_constants = ConstantDict({
-    'stefan_boltzmann_constant': DataArray(5.670367e-8, attrs={'units': 'W m^-2 K^-4'}),
-    'gravitational_acceleration': DataArray(9.80665, attrs={'units': 'm s^-2'}),
-    'heat_capacity_of_dry_air_at_constant_pressure': DataArray(1004.64, attrs={'units': 'J kg^-1 K^-1'}),
-    'heat_capacity_of_water_vapor_at_constant_pressure': DataArray(1846.0, attrs={'units': 'J kg^-1 K^-1'}),
-    'specific_enthalpy_of_water_vapor': DataArray(2500.0, attrs={'units': 'J kg^-1'}),
-    'heat_capacity_of_liquid_water': DataArray(4185.5, attrs={'units': 'J kg^-1 K^-1'}),
-    'freezing_temperature_of_liquid_water': DataArray(273.0, attrs={'units': 'K'}),
-    'thermal_conductivity_of_liquid_water': DataArray(0.57, attrs={'units': 'W m^-1 K^-1'}),
-    'heat_capacity_of_solid_water_as_ice': DataArray(2108., attrs={'units': 'J kg^-1 K^-1'}),
-    'thermal_conductivity_of_solid_water_as_ice': DataArray(2.22, attrs={'units': 'W m^-1 K^-1'}),
-    'heat_capacity_of_solid_water_as_snow': DataArray(2108., attrs={'units': 'J kg^-1 K^-1'}),
-    'thermal_conductivity_of_solid_water_as_snow': DataArray(0.2, attrs={'units': 'W m^-1 K^-1'}),
-    'reference_air_pressure': DataArray(1.0132e5, attrs={'units': 'Pa'}),
-    'reference_air_temperature': DataArray(300., attrs={'units': 'degK'}),
-    'thermal_conductivity_of_dry_air': DataArray(0.026, attrs={'units': 'W m^-1 K^-1'}),
-    'gas_constant_of_dry_air': DataArray(287., attrs={'units': 'J kg^-1 K^-1'}),
-    'gas_constant_of_water_vapor': DataArray(461.5, attrs={'units': 'J kg^-1 K^-1'}),
-    'planetary_rotation_rate': DataArray(7.292e-5, attrs={'units': 's^-1'}),
-    'planetary_radius': DataArray(6.371e6, attrs={'units': 'm'}),
-    'latent_heat_of_vaporization_of_water': DataArray(2.5e6, attrs={'units': 'J kg^-1'}),
-    'latent_heat_of_fusion_of_water': DataArray(333550.0, attrs={'units': 'J kg^-1'}),
-    'density_of_liquid_water': DataArray(1e3, attrs={'units': 'kg m^-3'}),
-    'density_of_solid_water_as_ice': DataArray(916.7, attrs={'units': 'kg m^-3'}),
-    'density_of_solid_water_as_snow': DataArray(100.0, attrs={'units': 'kg m^-3'}),
-    'solar_constant': DataArray(1367., attrs={'units': 'W m^-2'}),
-    'planck_constant': DataArray(6.62607004e-34, attrs={'units': 'J s'}),
-    'speed_of_light': DataArray(299792458., attrs={'units': 'm s^-1'}),
-    'seconds_per_day': DataArray(86400., attrs={'units': 'dimensionless'}),
-    'avogadro_constant': DataArray(6.022140857e23, attrs={'units': 'mole^-1'}),
-    'boltzmann_constant': DataArray(1.38064852e-23, attrs={'units': 'J K^-1'}),
-    'loschmidt_constant': DataArray(2.6516467e25, attrs={'units': 'm^-3'}),
-    'universal_gas_constant': DataArray(8.3144598, attrs={'units': 'J mole^-1 K^-1'}),
+    'stefan_boltzmann_constant': QuantityArray(5.670367e-8, attrs={'units': 'W m^-2 K^-4'}),
+    'gravitational_acceleration': QuantityArray(9.80665, attrs={'units': 'm s^-2'}),
+    'heat_capacity_of_dry_air_at_constant_pressure': QuantityArray(1004.64, attrs={'units': 'J kg^-1 K^-1'}),
+    'heat_capacity_of_water_vapor_at_constant_pressure': QuantityArray(1846.0, attrs={'units': 'J kg^-1 K^-1'}),
+    'specific_enthalpy_of_water_vapor': QuantityArray(2500.0, attrs={'units': 'J kg^-1'}),
+    'heat_capacity_of_liquid_water': QuantityArray(4185.5, attrs={'units': 'J kg^-1 K^-1'}),
+    'freezing_temperature_of_liquid_water': QuantityArray(273.0, attrs={'units': 'K'}),
+    'thermal_conductivity_of_liquid_water': QuantityArray(0.57, attrs={'units': 'W m^-1 K^-1'}),
+    'heat_capacity_of_solid_water_as_ice': QuantityArray(2108., attrs={'units': 'J kg^-1 K^-1'}),
+    'thermal_conductivity_of_solid_water_as_ice': QuantityArray(2.22, attrs={'units': 'W m^-1 K^-1'}),
+    'heat_capacity_of_solid_water_as_snow': QuantityArray(2108., attrs={'units': 'J kg^-1 K^-1'}),
+    'thermal_conductivity_of_solid_water_as_snow': QuantityArray(0.2, attrs={'units': 'W m^-1 K^-1'}),
+    'reference_air_pressure': QuantityArray(1.0132e5, attrs={'units': 'Pa'}),
+    'reference_air_temperature': QuantityArray(300., attrs={'units': 'degK'}),
+    'thermal_conductivity_of_dry_air': QuantityArray(0.026, attrs={'units': 'W m^-1 K^-1'}),
+    'gas_constant_of_dry_air': QuantityArray(287., attrs={'units': 'J kg^-1 K^-1'}),
+    'gas_constant_of_water_vapor': QuantityArray(461.5, attrs={'units': 'J kg^-1 K^-1'}),
+    'planetary_rotation_rate': QuantityArray(7.292e-5, attrs={'units': 's^-1'}),
+    'planetary_radius': QuantityArray(6.371e6, attrs={'units': 'm'}),
+    'latent_heat_of_vaporization_of_water': QuantityArray(2.5e6, attrs={'units': 'J kg^-1'}),
+    'latent_heat_of_fusion_of_water': QuantityArray(333550.0, attrs={'units': 'J kg^-1'}),
+    'density_of_liquid_water': QuantityArray(1e3, attrs={'units': 'kg m^-3'}),
+    'density_of_solid_water_as_ice': QuantityArray(916.7, attrs={'units': 'kg m^-3'}),
+    'density_of_solid_water_as_snow': QuantityArray(100.0, attrs={'units': 'kg m^-3'}),
+    'solar_constant': QuantityArray(1367., attrs={'units': 'W m^-2'}),
+    'planck_constant': QuantityArray(6.62607004e-34, attrs={'units': 'J s'}),
+    'speed_of_light': QuantityArray(299792458., attrs={'units': 'm s^-1'}),
+    'seconds_per_day': QuantityArray(86400., attrs={'units': 'dimensionless'}),
+    'avogadro_constant': QuantityArray(6.022140857e23, attrs={'units': 'mole^-1'}),
+    'boltzmann_constant': QuantityArray(1.38064852e-23, attrs={'units': 'J K^-1'}),
+    'loschmidt_constant': QuantityArray(2.6516467e25, attrs={'units': 'm^-3'}),
+    'universal_gas_constant': QuantityArray(8.3144598, attrs={'units': 'J mole^-1 K^-1'}),
 })
 
 constant_names_by_category = {
@@ -255,7 +296,7 @@ def set_constant(name, value, units):
         The units of the value given.
     """
     if is_valid_unit(units):
-        constants[get_alias(name)] = DataArray(value, attrs={'units': units})
+        constants[get_alias(name)] = QuantityArray(value, attrs={'units': units})
     else:
         raise ValueError('{} is not a valid unit.'.format(units))
 
@@ -276,7 +317,7 @@ def get_constant(name, units):
     value : float
         The value of the constant in the requested units.
     """
-    return constants[get_alias(name)].to_units(units).values.item()
+    return constants.get_quantity(get_alias(name)).to_units(units).values.item()
 
 
 def get_constants_string():
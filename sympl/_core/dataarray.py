@@ -1,5 +1,4 @@
 import xarray as xr
-from pint.errors import DimensionalityError
 from .units import data_array_to_units as to_units_function
 
 
@@ -46,6 +45,7 @@ class DataArray(xr.DataArray):
             A DataArray containing the data from this object in the
             desired units, if possible.
         """
+        from pint.errors import DimensionalityError
         if 'units' not in self.attrs:
             raise KeyError('"units" not present in attrs')
         try:
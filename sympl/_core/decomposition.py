@@ -0,0 +1,216 @@
+import numpy as np
+from .exceptions import InvalidPropertyDictError, InvalidStateError
+from .quantity_array import is_quantity
+from .shared_memory import SharedMemoryExecutor, get_metadata, wrap_array
+from .wildcard import get_wildcard_matches_and_dim_lengths
+
+
+class DomainDecompositionWrapper(object):
+    """
+    Wraps a component so that it is called separately on subdomains of the
+    model state in worker processes, and its outputs are combined into
+    outputs for the whole domain.
+
+    The state is split along one dimension into subdomains of nearly equal
+    size. By default this is the first dimension matched by the wildcard in
+    the input properties of the component, so that column physics with
+    dims such as ['*', 'mid_levels'] is split between columns. Each call
+    copies the state once into shared memory, from which every worker reads
+    its subdomain without further copying.
+
+    Components which compute the output at a point from the inputs at
+    neighbouring points, such as finite difference operators, should set
+    halo_width to the number of neighbouring points needed on each side.
+    Each subdomain is then given that many points from its neighbours (or
+    as many as exist at the edges of the domain), which are removed from
+    its outputs, so that the combined outputs are the same as those for the
+    whole domain.
+
+    Each worker receives its own copy of the component, so internal state
+    kept by the component is not shared between workers or with the
+    component in this process.
+
+    Example
+    -------
+    This is how the wrapper should be used on a fictional TendencyComponent class
+    called MyConvection.
+    >>> convection = DomainDecompositionWrapper(MyConvection(), n_subdomains=4)
+    """
+
+    def __init__(
+            self, component, n_subdomains, dim=None, max_workers=None,
+            mp_context=None):
+        """
+        Initialize the DomainDecompositionWrapper object.
+
+        Args
+        ----
+        component : TendencyComponent, DiagnosticComponent, ImplicitTendencyComponent
+            The component to be wrapped.
+        n_subdomains : int
+            The number of subdomains to split the state into.
+        dim : str, optional
+            The name of the dimension to split the state along. Default is
+            the first dimension matched by the wildcard in the input
+            properties of the component.
+        max_workers : int, optional
+            The number of worker processes. Subdomains are assigned to
+            workers in turn. Default is one worker per subdomain, up to the
+            number of CPUs.
+        mp_context : multiprocessing context, optional
+            The context used to start the worker processes.
+        """
+        self.component = component
+        self.n_subdomains = n_subdomains
+        self.dim = dim
+        self._max_workers = max_workers
+        self._mp_context = mp_context
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = SharedMemoryExecutor(
+                [self.component] * self.n_subdomains,
+                max_workers=self._max_workers, mp_context=self._mp_context)
+        return self._executor
+
+    def shutdown(self):
+        """
+        Stop the worker processes and free their shared memory. New
+        workers are started if the wrapper is called again.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_executor'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def __call__(self, state, timestep=None):
+        """
+        Call the underlying component on each subdomain of the state, and
+        return its combined outputs.
+
+        Args
+        ----
+        state : dict
+            A model state dictionary.
+        timestep : timedelta, optional
+            A time step. If the underlying component does not use a timestep,
+            this will be discarded. If it does, this argument is required.
+
+        Returns
+        -------
+        *args
+            The return values of the underlying component.
+
+        Raises
+        ------
+        InvalidPropertyDictError
+            If dim was not given and the input properties of the component
+            do not contain a wildcard.
+        InvalidStateError
+            If the dimension being split is shorter than the number of
+            subdomains.
+        """
+        dim, length = self._get_dim_and_length(state)
+        if length < self.n_subdomains:
+            raise InvalidStateError(
+                'Cannot split dimension {} of length {} into {} '
+                'subdomains'.format(dim, length, self.n_subdomains))
+        selections = get_subdomain_selections(
+            dim, length, self.n_subdomains,
+            getattr(self.component, 'halo_width', 0))
+        if timestep is None:
+            args = ()
+        else:
+            args = (timestep,)
+        outputs = self.executor.call_components(
+            '__call__', state, *args, selections=selections)
+        return combine_subdomain_outputs(outputs, dim)
+
+    def _get_dim_and_length(self, state):
+        wildcard_names, dim_lengths = get_wildcard_matches_and_dim_lengths(
+            state, self.component.input_properties)
+        if self.dim is not None:
+            dim = self.dim
+        elif wildcard_names:
+            dim = wildcard_names[0]
+        else:
+            raise InvalidPropertyDictError(
+                'Cannot determine which dimension to split, since the input '
+                'properties of {} have no wildcard matches. Pass dim to '
+                'DomainDecompositionWrapper.'.format(self.component))
+        if dim not in dim_lengths:
+            raise InvalidStateError(
+                'No inputs of {} have dimension {}'.format(self.component, dim))
+        return dim, dim_lengths[dim]
+
+    def __getattr__(self, item):
+        if item == 'component':
+            raise AttributeError(item)
+        return getattr(self.component, item)
+
+
+def get_subdomain_selections(dim, length, n_subdomains, halo_width=0):
+    """
+    Returns a (dim, input_slice, output_slice) tuple for each subdomain when
+    a dimension of the given length is split into n_subdomains. input_slice
+    selects the points of the subdomain with halo_width neighbouring points
+    on each side, where they exist, and output_slice selects the points of
+    the subdomain from those.
+    """
+    bounds = [i * length // n_subdomains for i in range(n_subdomains + 1)]
+    selections = []
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        halo_start = max(start - halo_width, 0)
+        halo_stop = min(stop + halo_width, length)
+        selections.append((
+            dim,
+            slice(halo_start, halo_stop),
+            slice(start - halo_start, stop - halo_start)))
+    return selections
+
+
+def combine_subdomain_outputs(subdomain_outputs, dim):
+    """
+    Combines the outputs of a component called on each subdomain into
+    outputs for the whole domain, by concatenating quantities along dim.
+    Values which are not quantities are taken from the first subdomain.
+    """
+    first_outputs = subdomain_outputs[0]
+    is_tuple = isinstance(first_outputs, tuple)
+    if not is_tuple:
+        subdomain_outputs = [(outputs,) for outputs in subdomain_outputs]
+    combined = []
+    for i_dict, output in enumerate(subdomain_outputs[0]):
+        combined_output = {}
+        for name, value in output.items():
+            if not is_quantity(value):
+                combined_output[name] = value
+                continue
+            if dim not in value.dims:
+                raise InvalidStateError(
+                    'Output {} does not have dimension {}, and cannot be '
+                    'combined from subdomains'.format(name, dim))
+            data = np.concatenate(
+                [outputs[i_dict][name].values for outputs in subdomain_outputs],
+                axis=list(value.dims).index(dim))
+            array_class, dims, attrs, coords = get_metadata(value)
+            if coords is not None:
+                coords = {
+                    coord_name: coord for coord_name, coord in coords.items()
+                    if dim not in coord.dims}
+            combined_output[name] = wrap_array(
+                data, (array_class, dims, attrs, coords))
+        combined.append(combined_output)
+    if is_tuple:
+        return tuple(combined)
+    else:
+        return combined[0]
@@ -0,0 +1,266 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from .backend import get_backend
+from .quantity_array import is_quantity
+from .units import prepare_unit_cache
+
+# Name of the leading dimension used to hold ensemble members in a state.
+ensemble_dim = 'ensemble'
+
+
+def get_ensemble_size(state, input_properties):
+    """
+    Returns the number of ensemble members in the quantities of state
+    used as inputs, or None if they do not have an ensemble dimension or if
+    the input properties refer to the ensemble dimension explicitly.
+    """
+    backend = get_backend()
+    ensemble_size = None
+    for name, properties in input_properties.items():
+        if ensemble_dim in properties['dims']:
+            return None
+        if ensemble_size is None:
+            dims = backend.get_dims(state[name])
+            if ensemble_dim in dims:
+                ensemble_size = backend.get_shape(
+                    state[name])[list(dims).index(ensemble_dim)]
+    return ensemble_size
+
+
+def add_ensemble_dim(properties):
+    """
+    Returns a copy of a properties dictionary in which the ensemble dimension
+    is prepended to the dims of each quantity that specifies dims.
+    """
+    return_dict = {}
+    for name, quantity_properties in properties.items():
+        if 'dims' in quantity_properties:
+            quantity_properties = quantity_properties.copy()
+            quantity_properties['dims'] = (
+                [ensemble_dim] + list(quantity_properties['dims']))
+        return_dict[name] = quantity_properties
+    return return_dict
+
+
+def get_ensemble_member(state, index):
+    """
+    Returns the state of one ensemble member, selecting the given index
+    along the ensemble dimension of each quantity which has one. The
+    returned quantities are views of the quantities in state.
+
+    Args
+    ----
+    state : dict
+        A model state whose quantities may have an "ensemble" dimension.
+    index : int
+        The index of the ensemble member.
+
+    Returns
+    -------
+    member_state : dict
+        The model state of the ensemble member.
+    """
+    member_state = {}
+    for name, value in state.items():
+        if is_quantity(value) and ensemble_dim in value.dims:
+            value = value.isel({ensemble_dim: index})
+        member_state[name] = value
+    return member_state
+
+
+def stack_ensemble_members(member_states):
+    """
+    Combines the model states of ensemble members into one state, in which
+    each quantity has a leading "ensemble" dimension. Values which are not
+    quantities, such as "time", are taken from the first member.
+
+    Args
+    ----
+    member_states : list of dict
+        The model states of each ensemble member, whose quantities have the
+        same dims and shapes in each member.
+
+    Returns
+    -------
+    state : dict
+        The model state of the ensemble.
+    """
+    backend = get_backend()
+    state = {}
+    for name, value in member_states[0].items():
+        if not is_quantity(value):
+            state[name] = value
+            continue
+        data = np.stack([
+            np.asarray(member_state[name].values)
+            for member_state in member_states])
+        state[name] = backend.create_quantity(
+            data, name=name, units=value.attrs['units'],
+            dims=(ensemble_dim,) + tuple(value.dims))
+        state[name].attrs.update(value.attrs)
+    return state
+
+
+def call_ensemble_members(component, state, *args):
+    """
+    Calls a component separately on each member of an ensemble state, and
+    returns its outputs stacked along the ensemble dimension.
+    """
+    ensemble_size = get_ensemble_size(state, component.input_properties)
+    member_outputs = []
+    for i in range(ensemble_size):
+        outputs = component(get_ensemble_member(state, i), *args)
+        if not isinstance(outputs, tuple):
+            outputs = (outputs,)
+        member_outputs.append(outputs)
+    stacked = tuple(
+        stack_ensemble_members([outputs[i] for outputs in member_outputs])
+        for i in range(len(member_outputs[0])))
+    if len(stacked) == 1:
+        return stacked[0]
+    else:
+        return stacked
+
+
+class EnsembleMemberResult(object):
+    """
+    Summary of the run of one ensemble member by an
+    :py:class:`~sympl.EnsembleRunner`.
+
+    Attributes
+    ----------
+    index : int
+        The index of the member.
+    n_steps : int
+        The number of timesteps taken.
+    elapsed_seconds : float
+        The wall clock time taken to run the member, excluding the time
+        taken to create its components.
+    steps_per_second : float
+        The number of timesteps taken per second of wall clock time.
+    final_state : dict or None
+        The state of the member after its last timestep, if it was requested,
+        and None otherwise.
+    """
+
+    def __init__(self, index, n_steps, elapsed_seconds, final_state=None):
+        self.index = index
+        self.n_steps = n_steps
+        self.elapsed_seconds = elapsed_seconds
+        if elapsed_seconds > 0:
+            self.steps_per_second = n_steps / elapsed_seconds
+        else:
+            self.steps_per_second = float('inf')
+        self.final_state = final_state
+
+    def __repr__(self):
+        return (
+            'EnsembleMemberResult(index={}, n_steps={}, elapsed_seconds={:.3f}, '
+            'steps_per_second={:.2f})'.format(
+                self.index, self.n_steps, self.elapsed_seconds,
+                self.steps_per_second))
+
+
+class EnsembleRunner(object):
+    """
+    Runs the members of an ensemble in separate worker processes.
+
+    Each worker builds its own model by calling a factory function with the
+    index of its member, so components which cannot be vectorized across
+    members, or which keep internal state, can be used unmodified. Output is
+    written by the monitors of each member from within its worker, so the
+    model state is not sent back to this process unless it is requested.
+
+    The factory must return a (stepper, diagnostic_components, monitors)
+    tuple. On each timestep, each diagnostic component is called on the
+    state and its diagnostics are added to the state, the stepper is called,
+    its diagnostics are added to the state, the state is stored by each
+    monitor, and the state is replaced by the new state from the stepper.
+    Once all timesteps are taken, monitors with a write() method, such as
+    :py:class:`~sympl.NetCDFMonitor`, have it called.
+
+    The factory and the initial states are pickled to be sent to the
+    workers, so the factory should be a function defined at the top level
+    of a module. Global configuration (constants, registered tracers, the
+    state backend) is only inherited by the workers if they are started with
+    the "fork" method.
+    """
+
+    def __init__(self, factory, max_workers=None, mp_context=None):
+        """
+        Args
+        ----
+        factory : callable
+            A function taking the index of an ensemble member and returning
+            a (stepper, diagnostic_components, monitors) tuple for that
+            member.
+        max_workers : int, optional
+            The number of worker processes. Default is the number of CPUs.
+        mp_context : multiprocessing context, optional
+            The context used to start the worker processes.
+        """
+        self.factory = factory
+        self.max_workers = max_workers
+        self.mp_context = mp_context
+
+    def run(self, initial_states, timestep, n_steps, return_final_states=False):
+        """
+        Run each ensemble member for a number of timesteps.
+
+        Args
+        ----
+        initial_states : list of dict
+            The initial state of each member. An ensemble state can be split
+            into such a list with :py:func:`~sympl.get_ensemble_member`.
+        timestep : timedelta
+            The timestep to use.
+        n_steps : int
+            The number of timesteps to take.
+        return_final_states : bool, optional
+            If True, the final state of each member is sent back from its
+            worker and included in its result. Default is False.
+
+        Returns
+        -------
+        results : list of EnsembleMemberResult
+            The result for each member, in the order of initial_states.
+        """
+        prepare_unit_cache()
+        with ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=self.mp_context) as executor:
+            futures = [
+                executor.submit(
+                    run_ensemble_member, self.factory, index, state, timestep,
+                    n_steps, return_final_states)
+                for index, state in enumerate(initial_states)]
+            return [future.result() for future in futures]
+
+
+def run_ensemble_member(
+        factory, index, state, timestep, n_steps, return_final_state=False):
+    """
+    Runs one ensemble member as described in
+    :py:class:`~sympl.EnsembleRunner`, and returns its
+    :py:class:`~sympl.EnsembleMemberResult`.
+    """
+    stepper, diagnostic_components, monitors = factory(index)
+    state = dict(state)
+    start_time = time.perf_counter()
+    for _ in range(n_steps):
+        for component in diagnostic_components:
+            state.update(component(state))
+        diagnostics, next_state = stepper(state, timestep)
+        state.update(diagnostics)
+        for monitor in monitors:
+            monitor.store(state)
+        next_state['time'] = state['time'] + timestep
+        state = next_state
+    for monitor in monitors:
+        if hasattr(monitor, 'write'):
+            monitor.write()
+    elapsed_seconds = time.perf_counter() - start_time
+    if not return_final_state:
+        state = None
+    return EnsembleMemberResult(index, n_steps, elapsed_seconds, state)
@@ -1,11 +1,41 @@
+from collections import OrderedDict
+
 import numpy as np
 
 from .backend import get_backend
+from .ensemble import get_ensemble_size
 from .exceptions import InvalidStateError
-from .wildcard import flatten_wildcard_dims, get_wildcard_matches_and_dim_lengths
+from .wildcard import (
+    flatten_wildcard_dims,
+    get_flattened_wildcard_shape,
+    get_wildcard_matches_and_dim_lengths,
+)
+
 
+def get_numpy_arrays_with_properties(state, property_dictionary, plan_cache=None):
+    """
+    Parameters
+    ----------
+    state : dict
+        A state dictionary.
+    property_dictionary : dict
+        A dictionary whose keys are quantity names and values are dictionaries
+        with properties for those quantities. The properties "dims" and
+        "units" must be present for each quantity.
+    plan_cache : ArrayPlanCache, optional
+        If given, conversion plans are retrieved from and stored in this
+        cache, so that states with the same dims, shapes, units and dtypes
+        as a previous state can be converted without recomputing them.
 
-def get_numpy_arrays_with_properties(state, property_dictionary):
+    Returns
+    -------
+    out_dict : dict
+        A dictionary whose keys are quantity names (or their aliases) and
+        values are numpy arrays with the dimensions and units specified in
+        property_dictionary.
+    """
+    if plan_cache is not None:
+        return plan_cache.get_numpy_arrays(state, property_dictionary)
     out_dict = {}
     backend = get_backend()
     wildcard_names, dim_lengths = get_wildcard_matches_and_dim_lengths(
@@ -36,6 +66,162 @@ def get_numpy_arrays_with_properties(state, property_dictionary):
     return out_dict
 
 
+def get_state_signature(state, property_dictionary, backend):
+    """
+    Returns a hashable key describing the parts of the state and property
+    dictionary which determine how arrays are retrieved from the state, or
+    None if the backend does not support conversion plans.
+    """
+    key = []
+    for name, properties in property_dictionary.items():
+        signature = backend.get_signature(state[name])
+        if signature is None:
+            return None
+        dims = properties.get("dims")
+        if dims is not None:
+            dims = tuple(dims)
+        key.append(
+            (
+                name,
+                dims,
+                properties.get("units"),
+                properties.get("alias"),
+                signature,
+            )
+        )
+    return tuple(key)
+
+
+class ArrayPlanCache(object):
+    """
+    Caches conversion plans used by get_numpy_arrays_with_properties, so that
+    wildcard matching, unit conversion factors and axis permutations only need
+    to be computed once for each signature of incoming state.
+
+    Attributes
+    ----------
+    hits : int
+        Number of calls which used a cached plan.
+    misses : int
+        Number of calls which needed to compute a new plan.
+    """
+
+    def __init__(self, max_plans=8):
+        """
+        Args
+        ----
+        max_plans : int, optional
+            Maximum number of plans to keep. The least recently used plan is
+            discarded when this number is exceeded. Default is 8.
+        """
+        self._plans = OrderedDict()
+        self._ensemble_sizes = OrderedDict()
+        self._max_plans = max_plans
+        self._backend = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._plans)
+
+    def clear(self):
+        """Discard all cached plans."""
+        self._plans.clear()
+        self._ensemble_sizes.clear()
+
+    def get_signature(self, state, property_dictionary):
+        """
+        Returns the key under which plans for the given state are cached,
+        or None if the current backend does not support conversion plans.
+        It can be passed to the other methods of this object to avoid
+        computing it again for the same state and property dictionary.
+        """
+        backend = get_backend()
+        if backend is not self._backend:
+            self.clear()
+            self._backend = backend
+        return get_state_signature(state, property_dictionary, backend)
+
+    def get_ensemble_size(self, state, input_properties, signature=None):
+        """
+        Equivalent to get_ensemble_size(state, input_properties), computed
+        only once for each state signature.
+        """
+        if signature is None:
+            signature = self.get_signature(state, input_properties)
+        if signature is None:
+            return get_ensemble_size(state, input_properties)
+        if signature in self._ensemble_sizes:
+            self._ensemble_sizes.move_to_end(signature)
+        else:
+            self._ensemble_sizes[signature] = get_ensemble_size(
+                state, input_properties)
+            if len(self._ensemble_sizes) > self._max_plans:
+                self._ensemble_sizes.popitem(last=False)
+        return self._ensemble_sizes[signature]
+
+    def get_numpy_arrays(self, state, property_dictionary, signature=None):
+        """
+        Equivalent to get_numpy_arrays_with_properties(state, property_dictionary),
+        using a cached plan if one exists for this state signature. If
+        signature is given, it must be the result of get_signature for the
+        same arguments.
+        """
+        key = signature
+        if key is None:
+            key = self.get_signature(state, property_dictionary)
+        if key is None:
+            return get_numpy_arrays_with_properties(state, property_dictionary)
+        plan = self._plans.get(key)
+        if plan is None:
+            self.misses += 1
+            plan = self._get_plan(state, property_dictionary, self._backend)
+            if plan is None:
+                return get_numpy_arrays_with_properties(state, property_dictionary)
+            self._plans[key] = plan
+            if len(self._plans) > self._max_plans:
+                self._plans.popitem(last=False)
+        else:
+            self.hits += 1
+            self._plans.move_to_end(key)
+        out_dict = {}
+        for name, out_name, array_plan, flat_shape in plan:
+            out_array = array_plan(state[name])
+            if flat_shape is not None:
+                out_array = out_array.reshape(flat_shape)
+            out_dict[out_name] = out_array
+        return out_dict
+
+    def _get_plan(self, state, property_dictionary, backend):
+        wildcard_names, dim_lengths = get_wildcard_matches_and_dim_lengths(
+            state, property_dictionary
+        )
+        plan = []
+        for name, properties in property_dictionary.items():
+            out_dims = []
+            out_dims.extend(properties["dims"])
+            has_wildcard = "*" in out_dims
+            if has_wildcard:
+                i_wildcard = out_dims.index("*")
+                out_dims[i_wildcard:i_wildcard + 1] = wildcard_names
+            array_plan = backend.get_array_plan(
+                state[name], name, properties["units"], out_dims, dim_lengths
+            )
+            if array_plan is None:
+                return None
+            if has_wildcard:
+                flat_shape = tuple(
+                    get_flattened_wildcard_shape(
+                        array_plan.shape, i_wildcard, i_wildcard + len(wildcard_names)
+                    )
+                )
+            else:
+                flat_shape = None
+            out_name = properties.get("alias", name)
+            plan.append((name, out_name, array_plan, flat_shape))
+        return tuple(plan)
+
+
 def get_numpy_array(data_array, out_dims, dim_lengths):
     """
     Gets a numpy array from the data_array with the desired out_dims, and a
@@ -6,7 +6,7 @@ from .restore_dataarray import extract_output_dims_properties
 
 def initialize_numpy_arrays_with_properties(
         output_properties, raw_input_state, input_properties, tracer_dims=None,
-        prepend_tracers=()):
+        prepend_tracers=(), pool=None):
     """
     Parameters
     ----------
@@ -22,6 +22,16 @@ def initialize_numpy_arrays_with_properties(
         with input properties for those quantities. The property "dims" must be
         present, indicating the dimensions that the quantity was transformed to
         when taken as input to a component.
+    tracer_dims : iterable of str, optional
+        If given, a "tracers" array with these dims is included in the
+        output, and tracers are not given arrays of their own.
+    prepend_tracers : iterable of tuple, optional
+        (name, units) pairs of tracers packed before the registered tracers.
+    pool : ArrayPool, optional
+        If given, arrays are taken from this pool instead of being newly
+        allocated. Arrays taken from a pool are only zero the first time
+        they are used, and otherwise contain the values they were last
+        given.
 
     Returns
     -------
@@ -49,16 +59,77 @@ def initialize_numpy_arrays_with_properties(
             for dim in out_dims:
                 out_shape.append(dim_lengths[dim])
             dtype = output_properties[name].get('dtype', np.float64)
-            out_dict[name] = np.zeros(out_shape, dtype=dtype)
+            out_dict[name] = get_array(out_shape, dtype, pool)
     if tracer_dims is not None:
         out_shape = []
         dim_lengths['tracer'] = len(tracer_names)
         for dim in tracer_dims:
             out_shape.append(dim_lengths[dim])
-        out_dict['tracers'] = np.zeros(out_shape, dtype=np.float64)
+        out_dict['tracers'] = get_array(out_shape, np.float64, pool)
     return out_dict
 
 
+def get_array(shape, dtype, pool=None):
+    if pool is None:
+        return np.zeros(shape, dtype=dtype)
+    else:
+        return pool.get(shape, dtype)
+
+
+class ArrayPool(object):
+    """
+    Holds numpy arrays so they can be reused between calls of a component,
+    keyed by their shape and dtype.
+
+    Before each call, :py:meth:`reset` makes all arrays available again. Each
+    array is then given out at most once by :py:meth:`get` until the next
+    reset, and arrays sharing memory with the arrays passed to reset are
+    never given out, so that outputs written into arrays from the pool
+    cannot overwrite the inputs of the same call.
+    """
+
+    def __init__(self):
+        self._arrays = {}
+        self._taken = set()
+        self._exclude = []
+
+    def __len__(self):
+        return sum(len(arrays) for arrays in self._arrays.values())
+
+    def clear(self):
+        """Discard all arrays held by the pool."""
+        self._arrays.clear()
+        self._taken = set()
+
+    def reset(self, exclude=()):
+        """
+        Make all arrays in the pool available again, except those which
+        may share memory with a numpy array in exclude.
+        """
+        self._taken = set()
+        self._exclude = [
+            value for value in exclude if isinstance(value, np.ndarray)]
+
+    def get(self, shape, dtype=np.float64):
+        """
+        Return an available array with the given shape and dtype,
+        allocating a new zero array if there is none.
+        """
+        shape = tuple(shape)
+        dtype = np.dtype(dtype)
+        arrays = self._arrays.setdefault((shape, dtype), [])
+        for array in arrays:
+            if id(array) not in self._taken and not any(
+                    np.may_share_memory(array, value)
+                    for value in self._exclude):
+                break
+        else:
+            array = np.zeros(shape, dtype=dtype)
+            arrays.append(array)
+        self._taken.add(id(array))
+        return array
+
+
 def get_dim_lengths_from_raw_input(raw_input, input_properties):
     dim_lengths = {}
     for name, properties in input_properties.items():
@@ -0,0 +1,286 @@
+import operator
+import sys
+import numpy as np
+from .units import data_array_to_units
+
+
+class QuantityArray(object):
+    """
+    A lightweight container for a numpy array with named dimensions and
+    units, used in place of DataArray by :py:class:`~sympl.NumpyBackend`.
+
+    QuantityArray supports the parts of the DataArray interface used by
+    Sympl (values, dims, attrs, shape, dtype, to_units, transpose and copy),
+    and arithmetic which aligns dimensions by name. It has no coordinates.
+    Creating one costs about as much as creating a Python object, which is
+    much less than creating a DataArray. Use :py:meth:`to_dataarray` to
+    convert it to a DataArray, for example to use it with xarray.
+
+    Attributes
+    ----------
+    values : ndarray
+        The data of this quantity.
+    dims : tuple of str
+        The names of the dimensions of values.
+    attrs : dict
+        Attributes of this quantity, including its "units".
+    """
+
+    __slots__ = ('values', 'dims', 'attrs')
+    # make numpy defer to our reflected operators, e.g. ndarray * QuantityArray
+    __array_ufunc__ = None
+
+    def __init__(self, values, dims=(), attrs=None):
+        """
+        Args
+        ----
+        values : array-like
+            The data of the quantity.
+        dims : iterable of str, optional
+            The names of the dimensions of values. Default is no dimensions.
+        attrs : dict, optional
+            Attributes of the quantity, such as "units".
+
+        Raises
+        ------
+        ValueError
+            If the number of dims does not match the number of dimensions
+            of values.
+        """
+        values = np.asarray(values)
+        dims = tuple(dims)
+        if len(dims) != values.ndim:
+            raise ValueError(
+                'Received {} dims {} for array with {} dimensions'.format(
+                    len(dims), dims, values.ndim))
+        self.values = values
+        self.dims = dims
+        if attrs is None:
+            self.attrs = {}
+        else:
+            self.attrs = attrs
+
+    @classmethod
+    def from_dataarray(cls, data_array):
+        """Create a QuantityArray sharing the data of a DataArray."""
+        return cls(data_array.values, data_array.dims, dict(data_array.attrs))
+
+    def to_dataarray(self):
+        """Return a DataArray sharing the data of this object."""
+        from .dataarray import DataArray
+        return DataArray(self.values, dims=self.dims, attrs=dict(self.attrs))
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def dtype(self):
+        return self.values.dtype
+
+    @property
+    def ndim(self):
+        return self.values.ndim
+
+    @property
+    def size(self):
+        return self.values.size
+
+    def __len__(self):
+        return len(self.values)
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None:
+            return self.values
+        return self.values.astype(dtype)
+
+    def __repr__(self):
+        return 'QuantityArray({!r}, dims={}, attrs={})'.format(
+            self.values, self.dims, self.attrs)
+
+    def to_units(self, units):
+        """
+        Convert the units of this quantity, if necessary. No conversion is
+        performed if the units are the same as the units of this quantity,
+        in which case this object is returned.
+
+        Args
+        ----
+        units : str
+            The desired units.
+
+        Raises
+        ------
+        ValueError
+            If the units are invalid for this object.
+        KeyError
+            If this object does not have units information in its attrs.
+
+        Returns
+        -------
+        converted_quantity : QuantityArray
+            A QuantityArray containing the data from this object in the
+            desired units, if possible.
+        """
+        if 'units' not in self.attrs:
+            raise KeyError('"units" not present in attrs')
+        return data_array_to_units(self, units)
+
+    def copy(self, deep=True, data=None):
+        """
+        Return a copy of this object with a copy of its attrs. If deep is
+        True the data is also copied. If data is given, it is used as the
+        data of the copy.
+        """
+        if data is None:
+            data = self.values.copy() if deep else self.values
+        return QuantityArray(data, self.dims, dict(self.attrs))
+
+    def transpose(self, *dims):
+        """Return a view of this quantity with its dimensions reordered."""
+        if len(dims) == 0:
+            dims = self.dims[::-1]
+        axes = [self.dims.index(dim) for dim in dims]
+        return QuantityArray(
+            self.values.transpose(axes), dims, dict(self.attrs))
+
+    def isel(self, indexers):
+        """
+        Return a view of this quantity indexed along the named dimensions,
+        given as a dict mapping dimension names to integers or slices.
+        Dimensions indexed by an integer are removed.
+        """
+        key = tuple(indexers.get(dim, slice(None)) for dim in self.dims)
+        dims = tuple(
+            dim for dim in self.dims
+            if not isinstance(indexers.get(dim, slice(None)), int))
+        return QuantityArray(self.values[key], dims, dict(self.attrs))
+
+    def __getitem__(self, key):
+        return self.values[key]
+
+    def __setitem__(self, key, value):
+        self.values[key] = np.asarray(value)
+
+    def _align(self, other):
+        """
+        Returns the values of this object and of other as arrays which
+        broadcast against one another, and the dims of their result.
+        """
+        if is_xarray_dataarray(other):
+            other = QuantityArray.from_dataarray(other)
+        if not isinstance(other, QuantityArray):
+            return self.values, other, self.dims
+        elif other.dims == self.dims:
+            return self.values, other.values, self.dims
+        extra_dims = tuple(dim for dim in other.dims if dim not in self.dims)
+        out_dims = self.dims + extra_dims
+        self_values = self.values.reshape(self.shape + (1,) * len(extra_dims))
+        other_values = other.values.transpose(
+            [other.dims.index(dim) for dim in out_dims if dim in other.dims])
+        other_values = other_values.reshape([
+            other.shape[other.dims.index(dim)] if dim in other.dims else 1
+            for dim in out_dims])
+        return self_values, other_values, out_dims
+
+    def _binary_op(self, other, op, reflexive=False, keep_attrs=False):
+        self_values, other_values, out_dims = self._align(other)
+        if reflexive:
+            values = op(other_values, self_values)
+        else:
+            values = op(self_values, other_values)
+        if keep_attrs:
+            attrs = dict(self.attrs)
+        else:
+            attrs = {}
+        return QuantityArray(values, out_dims, attrs)
+
+    def _inplace_op(self, other, op):
+        self_values, other_values, out_dims = self._align(other)
+        if out_dims != self.dims:
+            raise ValueError(
+                'Cannot perform in-place operation which adds dimensions '
+                '{} to quantity with dims {}'.format(
+                    out_dims[len(self.dims):], self.dims))
+        op(self.values, other_values, out=self.values)
+        return self
+
+    # As for DataArray, the attributes of the left operand are kept when
+    # adding and subtracting, but not for other operations.
+    def __add__(self, other):
+        return self._binary_op(other, operator.add, keep_attrs=True)
+
+    def __radd__(self, other):
+        return self._binary_op(other, operator.add, reflexive=True)
+
+    def __sub__(self, other):
+        return self._binary_op(other, operator.sub, keep_attrs=True)
+
+    def __rsub__(self, other):
+        return self._binary_op(other, operator.sub, reflexive=True)
+
+    def __mul__(self, other):
+        return self._binary_op(other, operator.mul)
+
+    def __rmul__(self, other):
+        return self._binary_op(other, operator.mul, reflexive=True)
+
+    def __truediv__(self, other):
+        return self._binary_op(other, operator.truediv)
+
+    def __rtruediv__(self, other):
+        return self._binary_op(other, operator.truediv, reflexive=True)
+
+    def __pow__(self, other):
+        return self._binary_op(other, operator.pow)
+
+    def __neg__(self):
+        return QuantityArray(-self.values, self.dims, dict(self.attrs))
+
+    def __iadd__(self, other):
+        return self._inplace_op(other, np.add)
+
+    def __isub__(self, other):
+        return self._inplace_op(other, np.subtract)
+
+    def __imul__(self, other):
+        return self._inplace_op(other, np.multiply)
+
+    def __itruediv__(self, other):
+        return self._inplace_op(other, np.true_divide)
+
+
+def is_xarray_dataarray(value):
+    """
+    Returns True if value is an xarray DataArray, without importing xarray
+    (if it has not been imported, value cannot be a DataArray).
+    """
+    xarray = sys.modules.get('xarray', None)
+    return xarray is not None and isinstance(value, xarray.DataArray)
+
+
+def is_dataarray(value):
+    """
+    Returns True if value is a sympl DataArray, without importing xarray.
+    """
+    dataarray = sys.modules.get(__package__ + '.dataarray', None)
+    return dataarray is not None and isinstance(value, dataarray.DataArray)
+
+
+def is_quantity(value):
+    """
+    Returns True if value is a DataArray or QuantityArray, and False
+    otherwise.
+    """
+    return isinstance(value, QuantityArray) or is_xarray_dataarray(value)
+
+
+def to_dataarray(value):
+    """
+    Returns value as a DataArray if it is a QuantityArray, and otherwise
+    returns value unchanged.
+    """
+    if isinstance(value, QuantityArray):
+        return value.to_dataarray()
+    else:
+        return value
@@ -1,8 +1,10 @@
+from collections import OrderedDict
+
 import numpy as np
 
 from .backend import get_backend
-from .dataarray import DataArray
 from .exceptions import InvalidPropertyDictError
+from .get_np_arrays import get_state_signature
 from .wildcard import (
     expand_array_wildcard_dims,
     fill_dims_wildcard,
@@ -10,12 +12,6 @@ from .wildcard import (
 )
 
 
-def ensure_values_are_arrays(array_dict):
-    for name, value in array_dict.items():
-        if not isinstance(value, np.ndarray):
-            array_dict[name] = np.asarray(value)
-
-
 def get_alias_or_name(name, output_properties, input_properties):
     if "alias" in output_properties[name].keys():
         raw_name = output_properties[name]["alias"]
@@ -51,6 +47,7 @@ def restore_data_arrays_with_properties(
     input_properties,
     ignore_names=None,
     ignore_missing=False,
+    plan_cache=None,
 ):
     """
     Parameters
@@ -78,6 +75,10 @@ def restore_data_arrays_with_properties(
     ignore_missing : bool, optional
         If True, ignore any values in output_properties not present in
         raw_arrays rather than raising an exception. Default is False.
+    plan_cache : RestorePlanCache, optional
+        If given, restore plans are retrieved from and stored in this cache,
+        so that output dims, wildcard expansions and aliases are only
+        determined once for a given layout of input state and output arrays.
 
     Returns
     -------
@@ -93,7 +94,49 @@ def restore_data_arrays_with_properties(
         property, but the arrays for the two properties have incompatible
         shapes.
     """
-    raw_arrays = raw_arrays.copy()
+    if plan_cache is not None:
+        return plan_cache.restore_data_arrays(
+            raw_arrays, output_properties, input_state, input_properties,
+            ignore_names=ignore_names, ignore_missing=ignore_missing)
+    plan = get_restore_plan(
+        raw_arrays, output_properties, input_state, input_properties,
+        ignore_names, ignore_missing)
+    backend = get_backend()
+    out_dict = {}
+    for name, raw_name, out_dims, target_shape, units in plan:
+        out_array = np.asarray(raw_arrays[raw_name])
+        if target_shape is not None:
+            out_array = out_array.reshape(target_shape)
+        out_dict[name] = backend.create_quantity(
+            out_array,
+            name=name,
+            dims=out_dims,
+            units=units,
+            reference_state=input_state,
+        )
+    return out_dict
+
+
+def get_restore_plan(
+    raw_arrays,
+    output_properties,
+    input_state,
+    input_properties,
+    ignore_names=None,
+    ignore_missing=False,
+):
+    """
+    Determines how each raw array is restored by
+    restore_data_arrays_with_properties.
+
+    Returns
+    -------
+    plan : tuple
+        A tuple with an entry (name, raw_name, out_dims, target_shape, units)
+        for each output, where raw_name is the key of its array in raw_arrays
+        and target_shape is the shape the array must be reshaped to in order
+        to expand wildcard dimensions, or None if no reshape is needed.
+    """
     if ignore_names is None:
         ignore_names = []
     if ignore_missing:
@@ -105,37 +148,178 @@ def restore_data_arrays_with_properties(
     wildcard_names, dim_lengths = get_wildcard_matches_and_dim_lengths(
         input_state, input_properties
     )
-    ensure_values_are_arrays(raw_arrays)
     dims_from_out_properties = extract_output_dims_properties(
         output_properties, input_properties, ignore_names
     )
-    out_dict = {}
+    plan = []
     for name, out_dims in dims_from_out_properties.items():
         if name in ignore_names:
             continue
         raw_name = get_alias_or_name(name, output_properties, input_properties)
+        raw_array = np.asarray(raw_arrays[raw_name])
         if "*" in out_dims:
-            for dim_name, length in zip(out_dims, raw_arrays[raw_name].shape):
+            for dim_name, length in zip(out_dims, raw_array.shape):
                 if dim_name not in dim_lengths and dim_name != "*":
                     dim_lengths[dim_name] = length
             out_dims_without_wildcard, target_shape = fill_dims_wildcard(
                 out_dims, dim_lengths, wildcard_names
             )
-            out_array = expand_array_wildcard_dims(
-                raw_arrays[raw_name], target_shape, name, out_dims
-            )
+            # raises an informative error if the array cannot be restored
+            expand_array_wildcard_dims(raw_array, target_shape, name, out_dims)
+            target_shape = tuple(target_shape)
         else:
-            check_array_shape(out_dims, raw_arrays[raw_name], name, dim_lengths)
+            check_array_shape(out_dims, raw_array, name, dim_lengths)
             out_dims_without_wildcard = out_dims
-            out_array = raw_arrays[raw_name]
-        out_dict[name] = get_backend().create_quantity(
-            out_array,
-            name=name,
-            dims=out_dims_without_wildcard,
-            units=output_properties[name]["units"],
-            reference_state=input_state,
+            target_shape = None
+        plan.append(
+            (
+                name,
+                raw_name,
+                tuple(out_dims_without_wildcard),
+                target_shape,
+                output_properties[name]["units"],
+            )
         )
-    return out_dict
+    return tuple(plan)
+
+
+def get_output_signature(raw_arrays, output_properties, input_properties):
+    """
+    Returns a hashable key describing the output properties and the shapes of
+    the raw arrays they refer to.
+    """
+    key = []
+    for name, properties in output_properties.items():
+        raw_name = get_alias_or_name(name, output_properties, input_properties)
+        if raw_name in raw_arrays:
+            shape = np.shape(raw_arrays[raw_name])
+        else:
+            shape = None
+        dims = properties.get("dims")
+        if dims is not None:
+            dims = tuple(dims)
+        key.append((name, raw_name, dims, properties.get("units"), shape))
+    return tuple(key)
+
+
+class RestorePlanCache(object):
+    """
+    Caches restore plans used by restore_data_arrays_with_properties, so that
+    wildcard matching, output dims and aliases only need to be determined
+    once for each signature of input state and output arrays. Restoring
+    outputs with a cached plan takes a number of dictionary operations
+    proportional to the number of outputs.
+
+    If reuse_containers is True, the quantities returned by the previous
+    call with the same plan are reused by replacing their data, instead of
+    creating new quantities. In that case quantities returned by one call
+    are modified by the next call, and must be copied if they are to be
+    kept. Quantities which are also values of the input state are never
+    reused.
+
+    Attributes
+    ----------
+    hits : int
+        Number of calls which used a cached plan.
+    misses : int
+        Number of calls which needed to compute a new plan.
+    """
+
+    def __init__(self, max_plans=8, reuse_containers=False):
+        """
+        Args
+        ----
+        max_plans : int, optional
+            Maximum number of plans to keep. The least recently used plan is
+            discarded when this number is exceeded. Default is 8.
+        reuse_containers : bool, optional
+            If True, reuse the quantities returned by the previous call with
+            the same plan by replacing their data. Default is False.
+        """
+        self._plans = OrderedDict()
+        self._max_plans = max_plans
+        self._backend = None
+        self.reuse_containers = reuse_containers
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._plans)
+
+    def clear(self):
+        """Discard all cached plans and reusable quantities."""
+        self._plans.clear()
+
+    def restore_data_arrays(
+        self,
+        raw_arrays,
+        output_properties,
+        input_state,
+        input_properties,
+        ignore_names=None,
+        ignore_missing=False,
+    ):
+        """
+        Equivalent to restore_data_arrays_with_properties called with the
+        same arguments, using a cached plan if one exists.
+        """
+        backend = get_backend()
+        if backend is not self._backend:
+            self._plans.clear()
+            self._backend = backend
+        input_key = get_state_signature(input_state, input_properties, backend)
+        if input_key is None:
+            return restore_data_arrays_with_properties(
+                raw_arrays, output_properties, input_state, input_properties,
+                ignore_names=ignore_names, ignore_missing=ignore_missing)
+        if ignore_names is not None:
+            ignore_names = frozenset(ignore_names)
+        key = (
+            input_key,
+            get_output_signature(raw_arrays, output_properties, input_properties),
+            ignore_names,
+            ignore_missing,
+        )
+        entry = self._plans.get(key)
+        if entry is None:
+            self.misses += 1
+            plan = get_restore_plan(
+                raw_arrays, output_properties, input_state, input_properties,
+                ignore_names, ignore_missing)
+            entry = (plan, {})
+            self._plans[key] = entry
+            if len(self._plans) > self._max_plans:
+                self._plans.popitem(last=False)
+        else:
+            self.hits += 1
+            self._plans.move_to_end(key)
+        plan, containers = entry
+        if self.reuse_containers and len(containers) > 0:
+            input_ids = set(id(value) for value in input_state.values())
+        else:
+            input_ids = ()
+        out_dict = {}
+        for name, raw_name, out_dims, target_shape, units in plan:
+            out_array = np.asarray(raw_arrays[raw_name])
+            if target_shape is not None:
+                out_array = out_array.reshape(target_shape)
+            quantity = containers.get(name)
+            if quantity is not None and id(quantity) not in input_ids:
+                quantity = backend.replace_data(quantity, out_array)
+            else:
+                quantity = None
+            if quantity is None:
+                quantity = backend.create_quantity(
+                    out_array,
+                    name=name,
+                    dims=out_dims,
+                    units=units,
+                    reference_state=input_state,
+                )
+            if self.reuse_containers:
+                containers[name] = quantity
+            out_dict[name] = quantity
+        return out_dict
 
 
 def extract_output_dims_properties(output_properties, input_properties, ignore_names):
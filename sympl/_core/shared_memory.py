@@ -0,0 +1,423 @@
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import os
+import numpy as np
+from .init_np_arrays import ArrayPool
+from .quantity_array import QuantityArray, is_quantity
+from .units import prepare_unit_cache
+
+# Set in each worker process by _initialize_worker. Maps component index to
+# the (unpickled) component that worker is responsible for calling.
+_worker_components = None
+# Shared memory blocks attached by a worker process, by block name.
+_worker_blocks = {}
+# Names of the blocks used in the last call of each component in a worker.
+_worker_block_names = {}
+
+
+class SharedArray(object):
+    """
+    A numpy array backed by a block of shared memory which is owned by the
+    process that created it.
+    """
+
+    def __init__(self, shape, dtype):
+        dtype = np.dtype(dtype)
+        nbytes = max(int(np.prod(shape)) * dtype.itemsize, 1)
+        self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+        self.descriptor = (self.shm.name, tuple(shape), dtype.str)
+
+    def matches(self, value):
+        return self.array.shape == value.shape and self.array.dtype == value.dtype
+
+    def release(self):
+        self.array = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+class SharedOutputPool(ArrayPool):
+    """
+    The output pool of a component with preallocate_outputs = True in a
+    worker process. It gives out the shared memory arrays passed to
+    use_arrays before allocating arrays of its own, so that the component
+    writes its outputs directly into shared memory, and records the shape
+    and dtype of each array requested during a call.
+    """
+
+    def __init__(self):
+        super(SharedOutputPool, self).__init__()
+        self._shared_arrays = []
+        self.requests = []
+
+    def use_arrays(self, arrays):
+        """Give out the given arrays in later calls. Arrays allocated by
+        the pool itself are discarded."""
+        self._shared_arrays = list(arrays)
+        if len(self._shared_arrays) > 0:
+            self.clear()
+
+    def reset(self, exclude=()):
+        super(SharedOutputPool, self).reset(exclude=exclude)
+        self.requests = []
+
+    def get(self, shape, dtype=np.float64):
+        shape = tuple(shape)
+        dtype = np.dtype(dtype)
+        self.requests.append((shape, dtype.str))
+        for array in self._shared_arrays:
+            if (array.shape == shape and array.dtype == dtype and
+                    id(array) not in self._taken and not any(
+                        np.may_share_memory(array, value)
+                        for value in self._exclude)):
+                self._taken.add(id(array))
+                return array
+        return super(SharedOutputPool, self).get(shape, dtype)
+
+
+def is_shareable(value):
+    return is_quantity(value) and value.dtype != object
+
+
+def get_metadata(value):
+    """
+    Returns what is needed besides the data to recreate a DataArray or
+    QuantityArray with wrap_array.
+    """
+    if isinstance(value, QuantityArray):
+        return (QuantityArray, value.dims, value.attrs, None)
+    else:
+        from .dataarray import DataArray
+        return (DataArray, value.dims, value.attrs, {
+            name: coord.variable for name, coord in value.coords.items()})
+
+
+def wrap_array(array, metadata):
+    array_class, dims, attrs, coords = metadata
+    if array_class is QuantityArray:
+        return QuantityArray(array, dims, attrs)
+    else:
+        from .dataarray import DataArray
+        return DataArray(array, dims=dims, attrs=attrs, coords=coords)
+
+
+class SharedMemoryExecutor(object):
+    """
+    Calls components in worker processes, passing their state through
+    shared memory.
+
+    Each component is pickled once, when the worker processes are started,
+    and is always called in the same worker process so that any internal
+    state it keeps stays consistent. On each call the arrays in the model
+    state are copied into blocks of shared memory which are reused between
+    calls, and only the names, shapes and dtypes of those blocks are sent to
+    the workers, which read them without copying.
+
+    That copy is made for every shareable quantity in the state on every
+    call, whether or not a component uses it, as the executor cannot know
+    which quantities a component (or the tracers it packs) will read. It
+    costs one memcpy per array, which for large states can be a
+    significant part of a call: with a state of six 32 MB quantities and
+    two components which each read one of them, a call took about 76 ms
+    with this executor, of which 27 ms was spent copying the state, and
+    about 22 ms with the thread executor. This executor pays off when the
+    components do enough work to outweigh the copy and are limited by the
+    global interpreter lock; otherwise use the thread executor.
+
+    Outputs are returned through shared memory buffers which are allocated
+    by this process once their shapes are known, and reused between calls.
+    Components which set preallocate_outputs = True are given these buffers
+    as the out_tendencies, out_diagnostics or out_new_state arrays of their
+    array_call, so that they write their outputs directly into shared
+    memory. The outputs of other components are copied into the buffers by
+    the worker. In both cases this process copies each output out of its
+    buffer once, so that outputs are not overwritten by later calls.
+
+    Global configuration (constants, registered tracers, the state backend)
+    is inherited by the workers when they are started, and later changes
+    are not seen by them. Likewise, changes made to the components in this
+    process are not seen by the workers until shutdown() is called and the
+    workers are restarted.
+    """
+
+    def __init__(self, components, max_workers=None, mp_context=None):
+        """
+        Args
+        ----
+        components : iterable of components
+            The components which can be called by this executor.
+        max_workers : int, optional
+            The number of worker processes. Components are assigned to
+            workers in turn. Default is one worker per component, up to
+            the number of CPUs.
+        mp_context : multiprocessing context, optional
+            The context used to start the worker processes.
+        """
+        self.components = components
+        n_components = len(components)
+        if max_workers is None:
+            max_workers = min(n_components, os.cpu_count() or 1)
+        max_workers = max(min(max_workers, n_components), 1)
+        self._assignment = [i % max_workers for i in range(n_components)]
+        prepare_unit_cache()
+        self._pools = []
+        for i_worker in range(max_workers):
+            worker_components = {
+                i: component for i, component in enumerate(components)
+                if self._assignment[i] == i_worker}
+            self._pools.append(ProcessPoolExecutor(
+                max_workers=1, mp_context=mp_context,
+                initializer=_initialize_worker,
+                initargs=(worker_components,)))
+        self._input_arrays = {}
+        self._output_arrays = [{} for _ in range(n_components)]
+        self._finalizer = weakref.finalize(
+            self, _release_all,
+            self._pools, self._input_arrays, self._output_arrays)
+
+    def shutdown(self):
+        """Stop the worker processes and free all shared memory."""
+        self._finalizer()
+
+    def call_components(self, method_name, state, *args, **kwargs):
+        """
+        Call each component with the given state and any additional
+        arguments, and return their outputs in component order.
+
+        If the keyword argument selections is given, it contains a
+        (dim, input_slice, output_slice) tuple for each component. That
+        component is then given only input_slice of each quantity along dim,
+        which is taken from the shared state without copying, and only
+        output_slice of its outputs along dim is returned.
+        """
+        selections = kwargs.pop('selections', None)
+        if len(kwargs) > 0:
+            raise TypeError(
+                'call_components() got unexpected keyword arguments '
+                '{}'.format(list(kwargs.keys())))
+        if method_name != '__call__':
+            raise ValueError(
+                'SharedMemoryExecutor can only call components, not '
+                'their {} method'.format(method_name))
+        state_descriptors = self._share_state(state)
+        futures = []
+        for i, output_arrays in enumerate(self._output_arrays):
+            output_descriptors = {
+                key: shared.descriptor for key, shared in output_arrays.items()}
+            if selections is None:
+                selection = None
+            else:
+                selection = selections[i]
+            futures.append(self._pools[self._assignment[i]].submit(
+                _call_worker_component, i, state_descriptors,
+                output_descriptors, args, selection))
+        return [
+            self._restore_outputs(i, future.result())
+            for i, future in enumerate(futures)]
+
+    def _share_state(self, state):
+        descriptors = {}
+        for name, value in state.items():
+            if is_shareable(value):
+                shared = self._input_arrays.get(name, None)
+                if shared is None or not shared.matches(value):
+                    if shared is not None:
+                        shared.release()
+                    shared = SharedArray(value.shape, value.dtype)
+                    self._input_arrays[name] = shared
+                np.copyto(shared.array, value.values)
+                descriptors[name] = (
+                    'shared', shared.descriptor, get_metadata(value))
+            else:
+                descriptors[name] = ('value', value)
+        for name in set(self._input_arrays.keys()).difference(descriptors.keys()):
+            self._input_arrays.pop(name).release()
+        return descriptors
+
+    def _restore_outputs(self, index, result):
+        is_tuple, output_descriptors, pool_requests = result
+        output_arrays = self._output_arrays[index]
+        outputs = []
+        for i_dict, descriptors in enumerate(output_descriptors):
+            output = {}
+            for name, descriptor in descriptors.items():
+                if descriptor[0] == 'shared':
+                    key, view, metadata = descriptor[1:]
+                    output[name] = wrap_array(
+                        get_view(output_arrays[key], *view).copy(), metadata)
+                else:
+                    value = descriptor[1]
+                    output[name] = value
+                    key = (i_dict, name)
+                    if pool_requests is None and is_shareable(value):
+                        # allocate a buffer the worker can write to next time
+                        if key in output_arrays:
+                            output_arrays.pop(key).release()
+                        output_arrays[key] = SharedArray(
+                            value.shape, value.dtype)
+            outputs.append(output)
+        if pool_requests is not None:
+            self._update_pool_arrays(output_arrays, pool_requests)
+        if is_tuple:
+            return tuple(outputs)
+        else:
+            return outputs[0]
+
+    def _update_pool_arrays(self, output_arrays, pool_requests):
+        """Allocate the buffers given to the output pool of a component in
+        its worker, if they do not match the arrays it requested."""
+        pool_keys = sorted(key for key in output_arrays if key[0] == 'pool')
+        current = [
+            (output_arrays[key].array.shape, output_arrays[key].array.dtype.str)
+            for key in pool_keys]
+        if current != pool_requests:
+            for key in pool_keys:
+                output_arrays.pop(key).release()
+            for i, (shape, dtype) in enumerate(pool_requests):
+                output_arrays[('pool', i)] = SharedArray(shape, dtype)
+
+
+def get_view(shared, offset, shape, dtype, strides):
+    """Returns a view of the memory of a SharedArray."""
+    return np.ndarray(
+        shape, dtype=np.dtype(dtype), buffer=shared.shm.buf, offset=offset,
+        strides=strides)
+
+
+def get_view_descriptor(array, base):
+    """Returns the (offset, shape, dtype, strides) of an array which lies
+    within the memory of the array base, for use with get_view."""
+    offset = (
+        array.__array_interface__['data'][0] -
+        base.__array_interface__['data'][0])
+    return (offset, array.shape, array.dtype.str, array.strides)
+
+
+def _release_all(pools, input_arrays, output_arrays):
+    for pool in pools:
+        pool.shutdown()
+    for shared in input_arrays.values():
+        shared.release()
+    input_arrays.clear()
+    for component_arrays in output_arrays:
+        for shared in component_arrays.values():
+            shared.release()
+        component_arrays.clear()
+
+
+def _initialize_worker(components):
+    global _worker_components
+    _worker_components = components
+    for component in components.values():
+        if (getattr(component, 'preallocate_outputs', False) and
+                type(getattr(component, '_output_pool', None)) is ArrayPool):
+            component._output_pool = SharedOutputPool()
+
+
+def _attach_block(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # track was added in Python 3.13
+        return shared_memory.SharedMemory(name=name)
+
+
+def _get_worker_array(descriptor):
+    name, shape, dtype = descriptor
+    if name not in _worker_blocks:
+        shm = _attach_block(name)
+        _worker_blocks[name] = (
+            shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf))
+    return _worker_blocks[name][1]
+
+
+def _release_unused_worker_blocks(index, used_names):
+    _worker_block_names[index] = used_names
+    used_names = set().union(*_worker_block_names.values())
+    for name in set(_worker_blocks.keys()).difference(used_names):
+        shm, _ = _worker_blocks.pop(name)
+        try:
+            shm.close()
+        except BufferError:
+            pass  # still referenced by a component, closed when collected
+
+
+def _select(value, dim, index):
+    if is_quantity(value) and dim in value.dims:
+        return value.isel({dim: index})
+    else:
+        return value
+
+
+def _call_worker_component(
+        index, state_descriptors, output_descriptors, args, selection=None):
+    # circular import
+    from .composite import call_component
+    used_names = set()
+    state = {}
+    for name, descriptor in state_descriptors.items():
+        if descriptor[0] == 'shared':
+            array_descriptor, metadata = descriptor[1:]
+            used_names.add(array_descriptor[0])
+            array = _get_worker_array(array_descriptor).view()
+            array.flags.writeable = False  # shared by all components
+            state[name] = wrap_array(array, metadata)
+        else:
+            state[name] = descriptor[1]
+        if selection is not None:
+            state[name] = _select(state[name], selection[0], selection[1])
+    component = _worker_components[index]
+    pool = getattr(component, '_output_pool', None)
+    if not isinstance(pool, SharedOutputPool):
+        pool = None
+    output_buffers = {}
+    for key, array_descriptor in output_descriptors.items():
+        used_names.add(array_descriptor[0])
+        output_buffers[key] = _get_worker_array(array_descriptor)
+    if pool is not None:
+        pool.use_arrays(
+            output_buffers[key] for key in sorted(
+                key for key in output_buffers if key[0] == 'pool'))
+    outputs = call_component(component, '__call__', state, *args)
+    is_tuple = isinstance(outputs, tuple)
+    if not is_tuple:
+        outputs = (outputs,)
+    return_descriptors = []
+    for i_dict, output in enumerate(outputs):
+        descriptors = {}
+        for name, value in output.items():
+            if selection is not None:
+                value = _select(value, selection[0], selection[2])
+            descriptors[name] = _get_output_descriptor(
+                value, (i_dict, name), output_buffers, pool is not None)
+        return_descriptors.append(descriptors)
+    _release_unused_worker_blocks(index, used_names)
+    if pool is None:
+        return is_tuple, return_descriptors, None
+    return is_tuple, return_descriptors, pool.requests
+
+
+def _get_output_descriptor(value, key, output_buffers, uses_pool):
+    """Returns how an output is sent back to the parent process: as the
+    view of a shared buffer it was written into by the component (if its
+    output pool gives out shared buffers), or was copied into (if not), or
+    otherwise as the value itself."""
+    if not is_shareable(value):
+        return ('value', value)
+    array = value.values
+    if uses_pool:
+        for buffer_key, buffer in output_buffers.items():
+            if buffer_key[0] == 'pool' and np.may_share_memory(array, buffer):
+                return (
+                    'shared', buffer_key, get_view_descriptor(array, buffer),
+                    get_metadata(value))
+        return ('value', value)
+    buffer = output_buffers.get(key, None)
+    if (buffer is not None and buffer.shape == value.shape and
+            buffer.dtype == value.dtype):
+        np.copyto(buffer, array)
+        return (
+            'shared', key, get_view_descriptor(buffer, buffer),
+            get_metadata(value))
+    return ('value', value)
@@ -1,3 +1,7 @@
+import numpy as np
+from .quantity_array import is_quantity
+
+
 def copy_untouched_quantities(old_state, new_state):
     for key in old_state.keys():
         if key not in new_state:
@@ -26,3 +30,89 @@ def multiply(scalar, state):
             if hasattr(out_state[key], 'attrs'):
                 out_state[key].attrs = state[key].attrs
     return out_state
+
+
+def axpby(a, x, b, y, out=None):
+    """
+    Compute the linear combination a*x + b*y of two states on their numpy
+    arrays, allocating at most one temporary array for each quantity besides
+    its output.
+
+    Args
+    ----
+    a : float
+        Coefficient of the first state.
+    x : dict
+        A model state. The dimensions, coordinates and attributes of the
+        returned quantities are taken from this state.
+    b : float
+        Coefficient of the second state.
+    y : dict
+        A model state with the same quantities as x, in the same units.
+        Quantities may have their dimensions in a different order, but must
+        broadcast to the shape of the quantities in x.
+    out : dict, optional
+        A model state whose arrays the result is written into. These arrays
+        may be the arrays of x or y, and may have their dimensions in a
+        different order from x. If not given, new arrays are allocated.
+
+    Returns
+    -------
+    result : dict
+        The combined state. This is out if out is given. 'time' is taken from
+        x, if present.
+    """
+    if out is None:
+        out_state = {}
+    else:
+        out_state = out
+    if 'time' in x.keys():
+        out_state['time'] = x['time']
+    for key in x.keys():
+        if key == 'time':
+            continue
+        x_value, y_value = x[key], y[key]
+        if not (is_quantity(x_value) or isinstance(x_value, np.ndarray)):
+            out_state[key] = a * x_value + b * y_value
+            continue
+        x_array = get_array(x_value)
+        y_array = get_array(transpose_like(y_value, x_value))
+        if out is None:
+            out_array = np.empty_like(
+                x_array, dtype=np.result_type(x_array, y_array, a, b))
+            out_state[key] = wrap_array(x_value, out_array)
+        else:
+            out_array = get_array(transpose_like(out[key], x_value))
+        linear_combination(a, x_array, b, y_array, out_array)
+    return out_state
+
+
+def linear_combination(a, x, b, y, out):
+    """Compute a*x + b*y into out, which may be the same array as x or y."""
+    # a*x is computed before out is written, in case out is x
+    ax = np.multiply(x, a)
+    np.multiply(y, b, out=out)
+    np.add(ax, out, out=out)
+
+
+def transpose_like(value, like):
+    """Returns value with its dimensions in the order of those of like, if
+    both are quantities."""
+    if is_quantity(value) and is_quantity(like) and value.dims != like.dims:
+        return value.transpose(*like.dims)
+    else:
+        return value
+
+
+def get_array(value):
+    if is_quantity(value):
+        return value.values
+    else:
+        return value
+
+
+def wrap_array(like, array):
+    if is_quantity(like):
+        return like.copy(deep=False, data=array)
+    else:
+        return array
@@ -1,7 +1,8 @@
 import abc
 from .composite import ImplicitTendencyComponentComposite
 from .time import timedelta
-from .combine_properties import combine_properties, combine_component_properties
+from .combine_properties import (
+    combine_properties, combine_component_properties, PropertiesCache)
 from .units import clean_units
 from .state import copy_untouched_quantities
 from .base_components import ImplicitTendencyComponent, Stepper
@@ -54,17 +55,26 @@ class TendencyStepper(Stepper):
 
     @property
     def input_properties(self):
-        input_properties = combine_component_properties(
-            self.prognostic_list, 'input_properties')
-        return combine_properties([input_properties, self.output_properties])
+        return self._properties_cache.get(
+            'input_properties', self.prognostic_list,
+            lambda: combine_properties([
+                self._tendencycomponent_input_properties,
+                self.output_properties]))
 
     @property
     def _tendencycomponent_input_properties(self):
-        return combine_component_properties(
-            self.prognostic_list, 'input_properties')
+        return self._properties_cache.get(
+            '_tendencycomponent_input_properties', self.prognostic_list,
+            lambda: combine_component_properties(
+                self.prognostic_list, 'input_properties'))
 
     @property
     def diagnostic_properties(self):
+        return self._properties_cache.get(
+            'diagnostic_properties', self.prognostic_list,
+            self._combine_diagnostic_properties)
+
+    def _combine_diagnostic_properties(self):
         return_value = {}
         for prognostic in self.prognostic_list:
             return_value.update(prognostic.diagnostic_properties)
@@ -84,20 +94,36 @@ class TendencyStepper(Stepper):
 
     @property
     def output_properties(self):
-        output_properties = self._tendency_properties
-        for name, properties in output_properties.items():
-            properties['units'] += ' {}'.format(self.time_unit_name)
-            properties['units'] = clean_units(properties['units'])
+        return self._properties_cache.get(
+            'output_properties', self.prognostic_list,
+            self._combine_output_properties)
+
+    def _combine_output_properties(self):
+        output_properties = {}
+        for name, properties in self._tendency_properties.items():
+            output_properties[name] = properties.copy()
+            output_properties[name]['units'] = clean_units(
+                '{} {}'.format(properties['units'], self.time_unit_name))
         return output_properties
 
     @property
     def _tendency_properties(self):
-        return_dict = {}
-        return_dict.update(combine_component_properties(
-            self.prognostic_list, 'tendency_properties',
-            input_properties=self._tendencycomponent_input_properties
-        ))
-        return return_dict
+        return self._properties_cache.get(
+            '_tendency_properties', self.prognostic_list,
+            lambda: combine_component_properties(
+                self.prognostic_list, 'tendency_properties',
+                input_properties=self._tendencycomponent_input_properties))
+
+    def clear_properties_cache(self):
+        """
+        Discard the cached properties dictionaries of this object and of its
+        prognostic composite, so they are recomputed from the component
+        properties on next access. This is only needed if the properties
+        dictionaries of a component are modified after this object is
+        created. Caches are cleared automatically when a tracer is registered.
+        """
+        self._properties_cache.clear()
+        self.prognostic.clear_properties_cache()
 
     def __str__(self):
         return (
@@ -148,6 +174,7 @@ class TendencyStepper(Stepper):
                 'Using an ImplicitTendencyComponent in sympl TendencyStepper objects may '
                 'lead to scientifically invalid results. Make sure the component '
                 'follows the same numerical assumptions as the TendencyStepper used.')
+        self._properties_cache = PropertiesCache()
         self.prognostic = ImplicitTendencyComponentComposite(*args)
         super(TendencyStepper, self).__init__(**kwargs)
         for name in self.prognostic.tendency_properties.keys():
@@ -169,6 +196,12 @@ class TendencyStepper(Stepper):
     def _get_tendency_name(self, quantity_name):
         return '{}_tendency_from_{}'.format(quantity_name, self.name)
 
+    def _insert_tendency_properties(self):
+        # diagnostic_properties already includes the tendency diagnostics,
+        # so only their names are needed by the base class
+        return [
+            self._get_tendency_name(name) for name in self.output_properties.keys()]
+
     def __call__(self, state, timestep):
         """
         Retrieves any diagnostics and returns a new state corresponding
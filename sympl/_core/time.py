@@ -1,13 +1,24 @@
 from datetime import datetime as real_datetime, timedelta
+from functools import lru_cache
 from .exceptions import DependencyError
-try:
-    import cftime as ct
+
+
+@lru_cache(maxsize=None)
+def get_cftime():
+    """
+    Returns the cftime module, or None if it is not installed or does not
+    have the required datetime types. cftime is imported when it is first
+    needed rather than when Sympl is imported, since importing it is slow.
+    """
+    try:
+        import cftime as ct
+    except ImportError:
+        return None
     if not all(hasattr(ct, attr) for attr in [
             'DatetimeNoLeap', 'DatetimeProlepticGregorian', 'DatetimeAllLeap',
             'Datetime360Day', 'DatetimeJulian', 'DatetimeGregorian']):
-        ct = None
-except ImportError:
-    ct = None
+        return None
+    return ct
 
 
 def datetime(
@@ -51,7 +62,8 @@ def datetime(
         return real_datetime(tzinfo=tzinfo, **kwargs)
     elif tzinfo is not None:
         raise ValueError('netcdftime does not support timezone-aware datetimes')
-    elif ct is None:
+    ct = get_cftime()
+    if ct is None:
         raise DependencyError(
             "Calendars other than 'proleptic_gregorian' require the netcdftime "
             "package, which is not installed.")
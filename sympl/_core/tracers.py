@@ -1,12 +1,13 @@
 from .exceptions import InvalidPropertyDictError
 import numpy as np
 from .units import units_are_same
-from .get_np_arrays import get_numpy_arrays_with_properties
+from .get_np_arrays import get_numpy_arrays_with_properties, ArrayPlanCache
 from .restore_dataarray import restore_data_arrays_with_properties
 
 _tracer_unit_dict = {}
 _tracer_names = []
 _packers = set()
+_tracer_generation = 0
 
 
 def reset_tracers():
@@ -15,6 +16,23 @@ def reset_tracers():
         _tracer_unit_dict.popitem()
     while len(_tracer_names) > 0:
         _tracer_names.pop()
+    _increment_tracer_generation()
+
+
+def _increment_tracer_generation():
+    global _tracer_generation
+    _tracer_generation += 1
+
+
+def get_tracer_generation():
+    """
+    Returns
+    -------
+    generation : int
+        A number which changes whenever the tracer registry is modified,
+        allowing anything derived from registered tracers to be cached.
+    """
+    return _tracer_generation
 
 
 def reset_packers():
@@ -40,6 +58,7 @@ def register_tracer(name, units):
         )
     _tracer_unit_dict[name] = units
     _tracer_names.append(name)
+    _increment_tracer_generation()
     for packer in _packers:
         packer.ensure_tracer_not_in_outputs(name, units)
 
@@ -107,6 +126,7 @@ class TracerPacker(object):
         self._prepend_tracers = prepend_tracers or ()
         self._tracer_dims = tuple(tracer_dims)
         self._tracer_quantity_dims = get_quantity_dims(tracer_dims)
+        self._plan_cache = ArrayPlanCache()
         if hasattr(component, 'tendency_properties') or hasattr(component, 'output_properties'):
             self.component = component
         else:
@@ -189,7 +209,8 @@ class TracerPacker(object):
         """
         tracer_properties = get_tracer_input_properties(
             self._prepend_tracers, self._tracer_quantity_dims)
-        raw_state = get_numpy_arrays_with_properties(state, tracer_properties)
+        raw_state = get_numpy_arrays_with_properties(
+            state, tracer_properties, plan_cache=self._plan_cache)
         if len(self.tracer_names) == 0:
             shape = [0 for dim in self._tracer_dims]
         else:
@@ -1,24 +1,109 @@
 # -*- coding: utf-8 -*-
-import pint
+import os
+import pickle
+import warnings
+from functools import lru_cache
 
+import numpy as np
 
-class UnitRegistry(pint.UnitRegistry):
+# Unit strings used by a model are few and repeated every timestep, so the
+# results of parsing them with pint are memoized by the functions below.
+# Each cache can be inspected with its cache_info() method.
+UNIT_CACHE_SIZE = 1024
 
-    def __call__(self, input_string, **kwargs):
-        return super(UnitRegistry, self).__call__(
-            input_string.replace(
-                u'%', 'percent').replace(
-                u'°', 'degree'
-            ),
-            **kwargs)
+# Environment variable giving the folder in which pint caches its parsed unit
+# definitions. If it is not set or is empty, definitions are not cached.
+UNIT_CACHE_FOLDER_VARIABLE = 'SYMPL_UNIT_CACHE_FOLDER'
 
 
-unit_registry = UnitRegistry()
-unit_registry.define('degrees_north = degree_north = degree_N = degrees_N = degreeN = degreesN')
-unit_registry.define('degrees_east = degree_east = degree_E = degrees_E = degreeE = degreesE')
-unit_registry.define('percent = 0.01*count = %')
+def get_unit_cache_folder():
+    """
+    Returns the folder given to pint to cache parsed unit definitions, or
+    None if they should not be cached.
+    """
+    folder = os.environ.get(UNIT_CACHE_FOLDER_VARIABLE, '')
+    if folder == '':
+        return None
+    return folder
+
+
+@lru_cache(maxsize=None)
+def get_unit_registry():
+    """
+    Returns the pint unit registry used by Sympl. Importing pint and
+    building the registry takes a substantial fraction of a second, so this
+    is done when units are first used rather than when Sympl is imported.
+    The registry is also available as sympl._core.units.unit_registry.
+
+    If the SYMPL_UNIT_CACHE_FOLDER environment variable names a folder,
+    pint's parsed unit definitions are cached on disk in it, so that only
+    the first process to build the registry parses them, and later processes
+    (including worker processes started with the "spawn" method) load the
+    cached result. If the cache cannot be used, a warning is issued and the
+    definitions are parsed as usual. Since pint does not
+    write its cache atomically, worker processes should be started after
+    calling prepare_unit_cache(), as Sympl's process pools do.
+    """
+    import pint
+
+    class UnitRegistry(pint.UnitRegistry):
+
+        def __call__(self, input_string, **kwargs):
+            return super(UnitRegistry, self).__call__(
+                input_string.replace(
+                    u'%', 'percent').replace(
+                    u'°', 'degree'
+                ),
+                **kwargs)
+
+    cache_folder = get_unit_cache_folder()
+    unit_registry = None
+    if cache_folder is not None:
+        try:
+            unit_registry = UnitRegistry(cache_folder=cache_folder)
+        except (OSError, EOFError, pickle.UnpicklingError, TypeError) as err:
+            # the cache folder cannot be created, a cache file is incomplete
+            # because another process is writing it, or (TypeError) this
+            # version of pint does not support caching
+            warnings.warn(
+                'Could not use the unit cache folder {} ({}: {}), so unit '
+                'definitions will be parsed without it.'.format(
+                    cache_folder, err.__class__.__name__, err))
+    if unit_registry is None:
+        unit_registry = UnitRegistry()
+    unit_registry.define('degrees_north = degree_north = degree_N = degrees_N = degreeN = degreesN')
+    unit_registry.define('degrees_east = degree_east = degree_E = degrees_E = degreeE = degreesE')
+    unit_registry.define('percent = 0.01*count = %')
+    return unit_registry
+
+
+def prepare_unit_cache():
+    """
+    Builds the unit registry in this process if pint's parsed unit
+    definitions are cached on disk (see get_unit_registry), so that worker processes started
+    afterwards load a complete cache file rather than all writing and
+    reading it at once.
+    """
+    if get_unit_cache_folder() is not None:
+        get_unit_registry()
+
+
+def __getattr__(name):
+    if name == 'unit_registry':
+        return get_unit_registry()
+    raise AttributeError(
+        'module {} has no attribute {}'.format(__name__, name))
+
+
+def clear_unit_caches():
+    """Discard all memoized unit comparisons and conversion factors."""
+    for function in (
+            units_are_compatible, units_are_same, clean_units,
+            get_conversion_factors):
+        function.cache_clear()
 
 
+@lru_cache(maxsize=UNIT_CACHE_SIZE)
 def units_are_compatible(unit1, unit2):
     """
     Determine whether a unit can be converted to another unit.
@@ -33,13 +118,16 @@ def units_are_compatible(unit1, unit2):
     units_are_compatible : bool
         True if the first unit can be converted to the second unit.
     """
+    unit_registry = get_unit_registry()
+    from pint.errors import DimensionalityError
     try:
         unit_registry(unit1).to(unit2)
         return True
-    except pint.errors.DimensionalityError:
+    except DimensionalityError:
         return False
 
 
+@lru_cache(maxsize=UNIT_CACHE_SIZE)
 def units_are_same(unit1, unit2):
     """
     Compare two unit strings for equality.
@@ -54,11 +142,13 @@ def units_are_same(unit1, unit2):
     units_are_same : bool
         True if the two input unit strings represent the same unit.
     """
+    unit_registry = get_unit_registry()
     return unit_registry(unit1) == unit_registry(unit2)
 
 
+@lru_cache(maxsize=UNIT_CACHE_SIZE)
 def clean_units(unit_string):
-    return str(unit_registry(unit_string).to_base_units().units)
+    return str(get_unit_registry()(unit_string).to_base_units().units)
 
 
 def is_valid_unit(unit_string):
@@ -66,9 +156,11 @@ def is_valid_unit(unit_string):
     unit_string = unit_string.replace(
         '%', 'percent').replace(
         '°', 'degree')
+    unit_registry = get_unit_registry()
+    from pint import UndefinedUnitError
     try:
         unit_registry(unit_string)
-    except pint.UndefinedUnitError:
+    except UndefinedUnitError:
         return False
     else:
         return True
@@ -78,13 +170,50 @@ def data_array_to_units(value, units):
     if not hasattr(value, 'attrs') or 'units' not in value.attrs:
         raise TypeError(
             'Cannot retrieve units from type {}'.format(type(value)))
-    elif unit_registry(value.attrs['units']) != unit_registry(units):
+    elif not units_are_same(value.attrs['units'], units):
+        scale, offset = get_conversion_factors(value.attrs['units'], units)
+        data = np.multiply(value.values, scale)
+        if offset != 0.:
+            data += offset
         attrs = value.attrs.copy()
-        value = unit_registry.Quantity(value, value.attrs['units']).to(units).magnitude
         attrs['units'] = units
+        value = value.copy(deep=False, data=data)
         value.attrs = attrs
     return value
 
 
+@lru_cache(maxsize=UNIT_CACHE_SIZE)
+def get_conversion_factors(original_units, new_units):
+    """
+    Get the affine transform which converts values from one unit to another.
+
+    Parameters
+    ----------
+    original_units : str
+    new_units : str
+
+    Returns
+    -------
+    scale : float
+    offset : float
+        Values in new_units are given by scale*value + offset, where value
+        is in original_units.
+
+    Raises
+    ------
+    DimensionalityError
+        If the units cannot be converted to one another.
+    """
+    converted = get_unit_registry().Quantity(
+        np.array([0., 1.]), original_units).to(new_units).magnitude
+    offset = float(converted[0])
+    scale = float(converted[1]) - offset
+    return scale, offset
+
+
 def from_unit_to_another(value, original_units, new_units):
-    return (unit_registry(original_units)*value).to(new_units).magnitude
+    scale, offset = get_conversion_factors(original_units, new_units)
+    value = np.multiply(value, scale)
+    if offset != 0.:
+        value += offset
+    return value
@@ -2,7 +2,7 @@ from datetime import datetime
 
 import numpy as np
 
-from .dataarray import DataArray
+from .quantity_array import QuantityArray, to_dataarray, is_dataarray
 from .exceptions import (
     SharedKeyError, InvalidStateError)
 
@@ -170,6 +170,7 @@ def restore_dimensions(array, from_dims, result_like, result_attrs=None):
                 original_coords.append(result_like.coords[name])
     if np.prod(array.shape) != np.prod(original_shape):
         raise ShapeMismatchError
+    from .dataarray import DataArray
     data_array = DataArray(
         np.reshape(array, original_shape),
         dims=original_dims,
@@ -185,6 +186,19 @@ def datetime64_to_datetime(dt64):
     return datetime.utcfromtimestamp(ts)
 
 
+def get_json_attrs(attrs):
+    """Returns a copy of attrs in which numpy values are converted to
+    Python values, so that they can be stored as JSON."""
+    return_dict = {}
+    for key, value in attrs.items():
+        if isinstance(value, np.ndarray):
+            value = value.tolist()
+        elif isinstance(value, np.generic):
+            value = value.item()
+        return_dict[key] = value
+    return return_dict
+
+
 def same_list(list1, list2):
     """Returns a boolean indicating whether the items in list1 are the same
     items present in list2 (ignoring order)."""
@@ -198,7 +212,7 @@ def update_dict_by_adding_another(dict1, dict2):
     present. If not present, create a new value in dict1 equal to the value in
     dict2. Addition is done in-place if the values are
     array-like, to avoid data copying. Units are handled if the values are
-    DataArrays with a 'units' attribute.
+    DataArrays or QuantityArrays with a 'units' attribute.
     """
     for key in dict2.keys():
         if key not in dict1:
@@ -207,14 +221,20 @@ def update_dict_by_adding_another(dict1, dict2):
             else:
                 dict1[key] = dict2[key]
         else:
-            if (isinstance(dict1[key], DataArray) and isinstance(dict2[key], DataArray)):
+            if ((isinstance(dict1[key], QuantityArray) or
+                    is_dataarray(dict1[key])) and
+                    (isinstance(dict2[key], QuantityArray) or
+                     is_dataarray(dict2[key]))):
                 if 'units' not in dict1[key].attrs or 'units' not in dict2[key].attrs:
                     raise InvalidStateError(
                         'DataArray objects must have units property defined')
+                other = dict2[key].to_units(dict1[key].attrs['units'])
+                if is_dataarray(dict1[key]):
+                    other = to_dataarray(other)
                 try:
-                    dict1[key] += dict2[key].to_units(dict1[key].attrs['units'])
+                    dict1[key] += other
                 except ValueError:  # dict1[key] is missing a dimension present in dict2[key]
-                    dict1[key] = dict1[key] + dict2[key].to_units(dict1[key].attrs['units'])
+                    dict1[key] = dict1[key] + other
             else:
                 dict1[key] += dict2[key]  # += is in-place addition operator
     return  # not returning anything emphasizes that this is in-place
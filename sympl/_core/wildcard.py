@@ -45,7 +45,15 @@ def get_wildcard_matches_and_dim_lengths(state, property_dictionary):
 
 
 def flatten_wildcard_dims(array, i_start, i_end):
-    if i_end > len(array.shape):
+    return array.reshape(get_flattened_wildcard_shape(array.shape, i_start, i_end))
+
+
+def get_flattened_wildcard_shape(shape, i_start, i_end):
+    """
+    Returns the shape an array of the given shape has once the axes from
+    i_start up to (but not including) i_end are flattened into one axis.
+    """
+    if i_end > len(shape):
         raise ValueError("i_end should be less than the number of axes in array")
     elif i_start < 0:
         raise ValueError("i_start should be greater than 0")
@@ -54,19 +62,19 @@ def flatten_wildcard_dims(array, i_start, i_end):
     elif i_start == i_end:
         # We need to insert a singleton dimension at i_start
         target_shape = []
-        target_shape.extend(array.shape)
+        target_shape.extend(shape)
         target_shape.insert(i_start, 1)
     else:
         target_shape = []
         wildcard_length = 1
-        for i, length in enumerate(array.shape):
+        for i, length in enumerate(shape):
             if i_start <= i < i_end:
                 wildcard_length *= length
             else:
                 target_shape.append(length)
             if i == i_end - 1:
                 target_shape.append(wildcard_length)
-    return array.reshape(target_shape)
+    return target_shape
 
 
 def fill_dims_wildcard(out_dims, dim_lengths, wildcard_names, expand_wildcard=True):
@@ -168,6 +168,252 @@ class BadMockStepper(Stepper):
         return {}, {}
 
 
+class PreallocatedStepper(Stepper):
+
+    input_properties = {
+        'air_temperature': {'dims': ['*', 'z'], 'units': 'degK', 'alias': 'T'},
+    }
+    diagnostic_properties = {
+        'heating': {'dims': ['*'], 'units': 'degK'},
+    }
+    output_properties = {
+        'air_temperature': {'units': 'degK'},
+    }
+    preallocate_outputs = True
+
+    def array_call(self, state, timestep, out_diagnostics, out_new_state):
+        np.add(state['T'], 1., out=out_new_state['T'])
+        np.sum(state['T'], axis=1, out=out_diagnostics['heating'])
+        return out_diagnostics, out_new_state
+
+
+class PreallocatedTendencyComponent(TendencyComponent):
+
+    input_properties = {
+        'air_temperature': {'dims': ['x', 'z'], 'units': 'degK'},
+    }
+    diagnostic_properties = {
+        'heating': {'dims': ['x'], 'units': 'degK'},
+    }
+    tendency_properties = {
+        'air_temperature': {'dims': ['x', 'z'], 'units': 'degK/s'},
+    }
+    preallocate_outputs = True
+
+    def array_call(self, state, out_tendencies, out_diagnostics):
+        out_tendencies['air_temperature'][:] = 2.
+        out_diagnostics['heating'][:] = 3.
+        return out_tendencies, out_diagnostics
+
+
+class PreallocateOutputsTests(unittest.TestCase):
+
+    def get_state(self):
+        return {
+            'time': timedelta(0),
+            'air_temperature': DataArray(
+                np.random.randn(2, 3, 4), dims=['x', 'y', 'z'],
+                attrs={'units': 'degK'}),
+        }
+
+    def test_stepper_outputs(self):
+        stepper = PreallocatedStepper()
+        state = self.get_state()
+        diagnostics, new_state = stepper(state, timedelta(seconds=1))
+        assert new_state['air_temperature'].dims == ('x', 'y', 'z')
+        assert np.allclose(
+            new_state['air_temperature'].values,
+            state['air_temperature'].values + 1.)
+        assert diagnostics['heating'].dims == ('x', 'y')
+        assert np.allclose(
+            diagnostics['heating'].values,
+            state['air_temperature'].values.sum(axis=2))
+
+    def test_stepper_does_not_write_over_input(self):
+        stepper = PreallocatedStepper()
+        state = self.get_state()
+        initial_values = state['air_temperature'].values.copy()
+        for i in range(4):
+            diagnostics, state = stepper(state, timedelta(seconds=1))
+            state['time'] = timedelta(seconds=i + 1)
+            assert np.allclose(
+                state['air_temperature'].values, initial_values + i + 1)
+        # two arrays for the new state are alternated, and one for diagnostics
+        assert len(stepper._output_pool) == 3
+
+    def test_tendency_component_reuses_arrays(self):
+        component = PreallocatedTendencyComponent(
+            tendencies_in_diagnostics=True)
+        state = self.get_state()
+        state['air_temperature'] = state['air_temperature'][:, 0, :]
+        tendencies1, diagnostics1 = component(state)
+        tendencies2, diagnostics2 = component(state)
+        assert np.shares_memory(
+            tendencies1['air_temperature'].values,
+            tendencies2['air_temperature'].values)
+        assert np.all(tendencies2['air_temperature'].values == 2.)
+        assert np.all(diagnostics2['heating'].values == 3.)
+        assert np.all(
+            diagnostics2[
+                'air_temperature_tendency_from_'
+                'PreallocatedTendencyComponent'].values == 2.)
+        assert len(component._output_pool) == 2
+
+
+class ChunkedTendencyComponent(TendencyComponent):
+
+    input_properties = {
+        'air_temperature': {'dims': ['*', 'z'], 'units': 'degK', 'alias': 'T'},
+        'air_pressure': {'dims': ['z'], 'units': 'Pa'},
+    }
+    diagnostic_properties = {
+        'heating': {'dims': ['*'], 'units': 'degK'},
+    }
+    tendency_properties = {
+        'air_temperature': {'units': 'degK/s'},
+    }
+    column_chunk_size = 4
+
+    def __init__(self, **kwargs):
+        self.chunk_shapes = []
+        super(ChunkedTendencyComponent, self).__init__(**kwargs)
+
+    def array_call(self, state):
+        self.chunk_shapes.append(state['T'].shape)
+        return (
+            {'T': state['T'] * 1e-3 + state['air_pressure'] * 1e-8},
+            {'heating': state['T'].sum(axis=1)},
+        )
+
+
+class ChunkedDiagnosticComponent(DiagnosticComponent):
+
+    input_properties = {
+        'air_temperature': {'dims': ['z', '*'], 'units': 'degK'},
+    }
+    diagnostic_properties = {
+        'doubled_temperature': {'dims': ['z', '*'], 'units': 'degK'},
+    }
+    column_chunk_size = 5
+    preallocate_outputs = True
+
+    def array_call(self, state, out_diagnostics):
+        np.multiply(
+            state['air_temperature'], 2.,
+            out=out_diagnostics['doubled_temperature'])
+        return out_diagnostics
+
+
+class ChunkedPreallocatedStepper(Stepper):
+
+    input_properties = {
+        'air_temperature': {'dims': ['*', 'z'], 'units': 'degK'},
+    }
+    diagnostic_properties = {
+        'doubled_temperature': {'dims': ['z', '*'], 'units': 'degK'},
+    }
+    output_properties = {
+        'air_temperature': {'units': 'degK'},
+    }
+    column_chunk_size = 4
+    preallocate_outputs = True
+
+    def array_call(self, state, timestep, out_diagnostics, out_new_state):
+        np.multiply(
+            state['air_temperature'].T, 2.,
+            out=out_diagnostics['doubled_temperature'])
+        np.add(
+            state['air_temperature'], 1.,
+            out=out_new_state['air_temperature'])
+        return out_diagnostics, out_new_state
+
+
+class ColumnChunkTests(unittest.TestCase):
+
+    def get_state(self):
+        return {
+            'time': timedelta(0),
+            'air_temperature': DataArray(
+                np.random.randn(3, 5, 4), dims=['x', 'y', 'z'],
+                attrs={'units': 'degK'}),
+            'air_pressure': DataArray(
+                np.random.randn(4), dims=['z'], attrs={'units': 'Pa'}),
+        }
+
+    def test_tendency_component_matches_unchunked(self):
+        state = self.get_state()
+        component = ChunkedTendencyComponent()
+        tendencies, diagnostics = component(state)
+        assert component.chunk_shapes == [(4, 4)] * 3 + [(3, 4)]
+        with mock.patch.object(
+                ChunkedTendencyComponent, 'column_chunk_size', None):
+            expected_tendencies, expected_diagnostics = component(state)
+        assert component.chunk_shapes[-1] == (15, 4)
+        assert tendencies['air_temperature'].dims == ('x', 'y', 'z')
+        assert np.allclose(
+            tendencies['air_temperature'].values,
+            expected_tendencies['air_temperature'].values)
+        assert diagnostics['heating'].dims == ('x', 'y')
+        assert np.allclose(
+            diagnostics['heating'].values, expected_diagnostics['heating'].values)
+
+    def test_thread_pool_matches_unchunked(self):
+        state = self.get_state()
+        component = ChunkedTendencyComponent()
+        with mock.patch.object(
+                ChunkedTendencyComponent, 'column_chunk_workers', 3):
+            tendencies, diagnostics = component(state)
+        assert len(component.chunk_shapes) == 4
+        expected_tendencies, expected_diagnostics = ChunkedTendencyComponent()(
+            state)
+        assert np.all(
+            tendencies['air_temperature'].values ==
+            expected_tendencies['air_temperature'].values)
+        assert np.all(
+            diagnostics['heating'].values ==
+            expected_diagnostics['heating'].values)
+
+    def test_chunks_written_into_preallocated_outputs(self):
+        state = self.get_state()
+        component = ChunkedDiagnosticComponent()
+        diagnostics = component(state)
+        assert diagnostics['doubled_temperature'].dims == ('z', 'x', 'y')
+        assert np.allclose(
+            diagnostics['doubled_temperature'].values,
+            2. * state['air_temperature'].transpose('z', 'x', 'y').values)
+
+    def test_chunked_stepper_writes_into_both_preallocated_outputs(self):
+        state = self.get_state()
+        component = ChunkedPreallocatedStepper()
+        diagnostics, new_state = component(state, timedelta(hours=1))
+        assert diagnostics['doubled_temperature'].dims == ('z', 'x', 'y')
+        assert np.allclose(
+            diagnostics['doubled_temperature'].values,
+            2. * state['air_temperature'].transpose('z', 'x', 'y').values)
+        assert new_state['air_temperature'].dims == ('x', 'y', 'z')
+        assert np.allclose(
+            new_state['air_temperature'].values,
+            state['air_temperature'].values + 1.)
+
+    def test_output_without_wildcard_raises(self):
+
+        class MeanTemperature(DiagnosticComponent):
+            input_properties = {
+                'air_temperature': {'dims': ['*', 'z'], 'units': 'degK'},
+            }
+            diagnostic_properties = {
+                'mean_temperature': {'dims': ['z'], 'units': 'degK'},
+            }
+            column_chunk_size = 2
+
+            def array_call(self, state):
+                return {
+                    'mean_temperature': state['air_temperature'].mean(axis=0)}
+
+        with self.assertRaises(InvalidPropertyDictError):
+            MeanTemperature()(self.get_state())
+
+
 class InputTestBase():
 
     def test_raises_on_input_properties_of_wrong_type(self):
@@ -442,6 +688,30 @@ class InputTestBase():
 
 class DiagnosticTestBase():
 
+    def test_reuse_output_containers(self):
+        input_properties = {'input1': {'units': 'm', 'dims': ['dim1']}}
+        diagnostic_properties = {'diag1': {'units': 'm', 'dims': ['dim1']}}
+        state = {
+            'time': timedelta(0),
+            'input1': DataArray(
+                np.ones([10]), dims=['dim1'], attrs={'units': 'm'}),
+        }
+        for reuse in (False, True):
+            with mock.patch.object(
+                    self.component_class, 'reuse_output_containers', reuse):
+                component = self.get_component(
+                    input_properties=input_properties,
+                    diagnostic_properties=diagnostic_properties,
+                    diagnostic_output={'diag1': np.zeros([10])})
+            first = self.get_diagnostics(self.call_component(component, state))
+            component.diagnostic_output = {'diag1': np.ones([10])}
+            second = self.get_diagnostics(
+                self.call_component(component, state))
+            assert (second['diag1'] is first['diag1']) == reuse
+            assert second['diag1'].dims == ('dim1',)
+            assert second['diag1'].attrs['units'] == 'm'
+            assert np.all(second['diag1'].values == 1.)
+
     def test_raises_on_diagnostic_properties_of_wrong_type(self):
         with self.assertRaises(InvalidPropertyDictError):
             self.get_component(diagnostic_properties=({},))
@@ -1,9 +1,15 @@
 import pytest
 import unittest
 import mock
+import threading
+import numpy as np
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
 from sympl import (
     TendencyComponent, DiagnosticComponent, Monitor, TendencyComponentComposite, DiagnosticComponentComposite,
-    MonitorComposite, SharedKeyError, DataArray, InvalidPropertyDictError
+    MonitorComposite, SharedKeyError, DataArray, InvalidPropertyDictError,
+    ImplicitTendencyComponent, ImplicitTendencyComponentComposite,
+    ScalingWrapper,
 )
 from sympl._core.units import units_are_compatible
 
@@ -1325,5 +1331,269 @@ def test_prognostic_composite_two_components_overlapping_diagnostic():
         raise AssertionError('Should have raised SharedKeyError')
 
 
+def test_prognostic_composite_properties_are_cached():
+    prognostic = MockTendencyComponent(
+        input_properties={'input1': {'dims': ['dim1'], 'units': 'm'}},
+        diagnostic_properties={'diag1': {'dims': ['dim1'], 'units': 'm'}},
+        tendency_properties={'input1': {'units': 'm/s'}},
+        diagnostic_output={},
+        tendency_output={},
+    )
+    composite = TendencyComponentComposite(prognostic)
+    with mock.patch(
+            'sympl._core.composite.combine_component_properties') as mock_combine:
+        for _ in range(3):
+            assert composite.input_properties == {
+                'input1': {'dims': ['dim1'], 'units': 'm'}}
+            assert composite.tendency_properties == {
+                'input1': {'dims': ['dim1'], 'units': 'm/s'}}
+            assert 'diag1' in composite.diagnostic_properties
+        assert not mock_combine.called
+
+
+def test_prognostic_composite_clear_properties_cache():
+    prognostic = MockTendencyComponent(
+        input_properties={'input1': {'dims': ['dim1'], 'units': 'm'}},
+        diagnostic_properties={},
+        tendency_properties={},
+        diagnostic_output={},
+        tendency_output={},
+    )
+    composite = TendencyComponentComposite(prognostic)
+    prognostic.input_properties['input2'] = {'dims': ['dim1'], 'units': 's'}
+    assert 'input2' not in composite.input_properties
+    composite.clear_properties_cache()
+    assert 'input2' in composite.input_properties
+
+
+def test_nested_composite_clear_properties_cache():
+    prognostic = MockTendencyComponent(
+        input_properties={'input1': {'dims': ['dim1'], 'units': 'm'}},
+        diagnostic_properties={},
+        tendency_properties={},
+        diagnostic_output={},
+        tendency_output={},
+    )
+    inner = TendencyComponentComposite(prognostic)
+    outer = TendencyComponentComposite(inner)
+    prognostic.input_properties['input2'] = {'dims': ['dim1'], 'units': 's'}
+    outer.clear_properties_cache()
+    assert 'input2' in inner.input_properties
+    assert 'input2' in outer.input_properties
+
+
+def test_prognostic_composite_replaced_component_list_updates_properties():
+    prognostic1 = MockTendencyComponent(
+        input_properties={'input1': {'dims': ['dim1'], 'units': 'm'}},
+        diagnostic_properties={},
+        tendency_properties={},
+        diagnostic_output={},
+        tendency_output={},
+    )
+    prognostic2 = MockTendencyComponent(
+        input_properties={'input2': {'dims': ['dim1'], 'units': 'm'}},
+        diagnostic_properties={},
+        tendency_properties={},
+        diagnostic_output={},
+        tendency_output={},
+    )
+    composite = TendencyComponentComposite(prognostic1)
+    assert 'input2' not in composite.input_properties
+    composite.component_list = composite.component_list + (prognostic2,)
+    assert 'input1' in composite.input_properties
+    assert 'input2' in composite.input_properties
+
+
+def test_diagnostic_composite_properties_are_cached():
+    diagnostic = MockDiagnosticComponent(
+        input_properties={'input1': {'dims': ['dim1'], 'units': 'm'}},
+        diagnostic_properties={'diag1': {'dims': ['dim1'], 'units': 'm'}},
+        diagnostic_output={},
+    )
+    composite = DiagnosticComponentComposite(diagnostic)
+    assert composite.diagnostic_properties is composite.diagnostic_properties
+    assert composite.input_properties is composite.input_properties
+
+
+class MockBarrierTendencyComponent(TendencyComponent):
+    """Blocks in array_call until all components sharing the barrier are
+    being called at the same time."""
+
+    input_properties = {}
+    diagnostic_properties = {}
+    tendency_properties = {}
+
+    def __init__(self, barrier, tendency_output):
+        self.barrier = barrier
+        self.tendency_output = tendency_output
+        self.tendency_properties = {
+            name: {'dims': ['dim1'], 'units': 'm/s'}
+            for name in tendency_output}
+        self.input_properties = {
+            name: {'dims': ['dim1'], 'units': 'm'}
+            for name in tendency_output}
+        super(MockBarrierTendencyComponent, self).__init__()
+
+    def array_call(self, state):
+        self.barrier.wait(timeout=5.)
+        return self.tendency_output, {}
+
+
+def test_prognostic_composite_thread_executor_runs_concurrently():
+    barrier = threading.Barrier(2)
+    composite = TendencyComponentComposite(
+        MockBarrierTendencyComponent(barrier, {'input1': np.ones([3])}),
+        MockBarrierTendencyComponent(barrier, {'input1': np.ones([3]) * 2.}),
+        executor='thread',
+    )
+    state = {
+        'time': timedelta(0),
+        'input1': DataArray(np.zeros([3]), dims=['dim1'], attrs={'units': 'm'}),
+    }
+    try:
+        tendencies, diagnostics = composite(state)
+    finally:
+        composite.shutdown()
+    assert np.all(tendencies['input1'].values == 3.)
+    assert tendencies['input1'].attrs['units'] == 'm/s'
+    assert diagnostics == {}
+
+
+def test_prognostic_composite_sequential_does_not_run_concurrently():
+    barrier = threading.Barrier(2)
+    composite = TendencyComponentComposite(
+        MockBarrierTendencyComponent(barrier, {'input1': np.ones([3])}),
+        MockBarrierTendencyComponent(barrier, {'input1': np.ones([3])}),
+    )
+    assert composite.executor is None
+    state = {
+        'time': timedelta(0),
+        'input1': DataArray(np.zeros([3]), dims=['dim1'], attrs={'units': 'm'}),
+    }
+    barrier.abort()
+    with pytest.raises(threading.BrokenBarrierError):
+        composite(state)
+
+
+def test_prognostic_composite_executor_matches_sequential():
+    np.random.seed(0)
+    components = [
+        MockTendencyComponent(
+            input_properties={
+                'input1': {'dims': ['dim1'], 'units': 'm'}},
+            diagnostic_properties={
+                'diag{}'.format(i): {'dims': ['dim1'], 'units': 'm'}},
+            tendency_properties={
+                'input1': {'dims': ['dim1'], 'units': 'm/s'}},
+            diagnostic_output={'diag{}'.format(i): np.random.randn(5)},
+            tendency_output={'input1': np.random.randn(5)},
+        ) for i in range(6)]
+    state = {
+        'time': timedelta(0),
+        'input1': DataArray(np.zeros([5]), dims=['dim1'], attrs={'units': 'm'}),
+    }
+    sequential = TendencyComponentComposite(*components)
+    threaded = TendencyComponentComposite(
+        *components, executor='thread', max_workers=3)
+    expected_tendencies, expected_diagnostics = sequential(state)
+    tendencies, diagnostics = threaded(state)
+    threaded.shutdown()
+    assert np.all(
+        tendencies['input1'].values == expected_tendencies['input1'].values)
+    assert list(diagnostics.keys()) == list(expected_diagnostics.keys())
+    for name in expected_diagnostics:
+        assert np.all(
+            diagnostics[name].values == expected_diagnostics[name].values)
+
+
+def test_diagnostic_composite_thread_executor():
+    composite = DiagnosticComponentComposite(
+        MockDiagnosticComponent(
+            input_properties={},
+            diagnostic_properties={'diag1': {'dims': ['dim1'], 'units': 'm'}},
+            diagnostic_output={'diag1': np.ones([3])}),
+        MockDiagnosticComponent(
+            input_properties={},
+            diagnostic_properties={'diag2': {'dims': ['dim1'], 'units': 'm'}},
+            diagnostic_output={'diag2': np.ones([3]) * 2.}),
+        executor='thread',
+    )
+    diagnostics = composite({'time': timedelta(0)})
+    composite.shutdown()
+    assert np.all(diagnostics['diag1'].values == 1.)
+    assert np.all(diagnostics['diag2'].values == 2.)
+
+
+def test_composite_given_executor_is_not_shut_down():
+    executor = ThreadPoolExecutor(max_workers=2)
+    composite = TendencyComponentComposite(
+        MockEmptyTendencyComponent(), executor=executor)
+    assert composite.executor is executor
+    composite({'time': timedelta(0)})
+    composite.shutdown()
+    assert executor.submit(lambda: 1).result() == 1
+    executor.shutdown()
+
+
+class MockTimestepImplicitTendencyComponent(ImplicitTendencyComponent):
+
+    input_properties = {}
+    diagnostic_properties = {}
+    tendency_properties = {'input1': {'dims': ['dim1'], 'units': 'm/s'}}
+
+    def array_call(self, state, timestep):
+        return {'input1': np.ones([3]) * timestep.total_seconds()}, {}
+
+
+def test_implicit_prognostic_composite_thread_executor_mixed_components():
+    composite = ImplicitTendencyComponentComposite(
+        MockTimestepImplicitTendencyComponent(),
+        MockTendencyComponent(
+            input_properties={'input1': {'dims': ['dim1'], 'units': 'm'}},
+            diagnostic_properties={},
+            tendency_properties={'input1': {'dims': ['dim1'], 'units': 'm/s'}},
+            diagnostic_output={},
+            tendency_output={'input1': np.ones([3])},
+        ),
+        executor='thread',
+    )
+    state = {
+        'time': timedelta(0),
+        'input1': DataArray(np.zeros([3]), dims=['dim1'], attrs={'units': 'm'}),
+    }
+    tendencies, _ = composite(state, timedelta(seconds=10))
+    composite.shutdown()
+    assert np.all(tendencies['input1'].values == 11.)
+
+
+@pytest.mark.parametrize('executor', [None, 'thread'])
+def test_implicit_prognostic_composite_with_wrapped_implicit_component(
+        executor):
+    composite = ImplicitTendencyComponentComposite(
+        ScalingWrapper(
+            MockTimestepImplicitTendencyComponent(),
+            tendency_scale_factors={'input1': 2.}),
+        executor=executor,
+    )
+    state = {
+        'time': timedelta(0),
+        'input1': DataArray(np.zeros([3]), dims=['dim1'], attrs={'units': 'm'}),
+    }
+    tendencies, _ = composite(state, timedelta(seconds=10))
+    composite.shutdown()
+    assert np.all(tendencies['input1'].values == 20.)
+
+
+def test_composite_unexpected_keyword_argument():
+    with pytest.raises(TypeError):
+        TendencyComponentComposite(MockEmptyTendencyComponent(), executer='thread')
+
+
+def test_composite_invalid_executor():
+    with pytest.raises(ValueError):
+        TendencyComponentComposite(
+            MockEmptyTendencyComponent(), executor='not_an_executor')
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
@@ -1,5 +1,6 @@
 from sympl import get_constant, set_constant, DataArray
-from sympl._core.constants import constants
+from sympl._core.constants import constants, ConstantDict
+from sympl._core.quantity_array import QuantityArray
 from sympl._core.units import is_valid_unit
 import pytest
 
@@ -42,5 +43,49 @@ def test_setting_wrong_units():
 
     assert 'valid unit' in str(excinfo.value)
 
+
+def test_constant_dict_returns_same_dataarray():
+    constant_dict = ConstantDict({
+        'my_constant': QuantityArray(1., attrs={'units': 'm'})})
+    value = constant_dict['my_constant']
+    assert isinstance(value, DataArray)
+    assert constant_dict['my_constant'] is value
+
+
+def test_constant_dict_keeps_in_place_changes():
+    quantity = QuantityArray(1., attrs={'units': 'm'})
+    constant_dict = ConstantDict({'my_constant': quantity})
+    constant_dict['my_constant'].values[()] = 2.
+    constant_dict['my_constant'].attrs['units'] = 'km'
+    assert constant_dict['my_constant'].values.item() == 2.
+    assert constant_dict['my_constant'].attrs['units'] == 'km'
+    # the stored quantity, which may be shared with other dictionaries,
+    # is not modified
+    assert quantity.values.item() == 1.
+    assert quantity.attrs['units'] == 'm'
+
+
+def test_constant_dict_setitem_replaces_dataarray():
+    constant_dict = ConstantDict({
+        'my_constant': QuantityArray(1., attrs={'units': 'm'})})
+    old_value = constant_dict['my_constant']
+    constant_dict['my_constant'] = QuantityArray(3., attrs={'units': 'm'})
+    new_value = constant_dict['my_constant']
+    assert new_value is not old_value
+    assert new_value.values.item() == 3.
+
+
+def test_constant_dict_values_and_items_are_views():
+    constant_dict = ConstantDict({
+        'my_constant': QuantityArray(1., attrs={'units': 'm'})})
+    values = constant_dict.values()
+    items = constant_dict.items()
+    assert not isinstance(values, list)
+    assert not isinstance(items, list)
+    assert list(values) == [constant_dict['my_constant']]
+    assert list(items) == [('my_constant', constant_dict['my_constant'])]
+    assert list(values)[0] is constant_dict['my_constant']
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
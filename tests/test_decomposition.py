@@ -0,0 +1,190 @@
+import multiprocessing
+import pytest
+import numpy as np
+from datetime import timedelta
+from sympl import (
+    TendencyComponent, DiagnosticComponent, ImplicitTendencyComponent,
+    AdamsBashforth, DataArray, DomainDecompositionWrapper,
+    InvalidPropertyDictError, InvalidStateError,
+)
+from sympl._core.decomposition import get_subdomain_selections
+
+
+class MockColumnComponent(TendencyComponent):
+
+    input_properties = {
+        'air_temperature': {'dims': ['*', 'z'], 'units': 'degK'},
+        'surface_pressure': {'dims': ['*'], 'units': 'Pa'},
+    }
+    tendency_properties = {
+        'air_temperature': {'dims': ['*', 'z'], 'units': 'degK/s'},
+    }
+    diagnostic_properties = {
+        'column_temperature': {'dims': ['*'], 'units': 'degK'},
+    }
+
+    def array_call(self, state):
+        return (
+            {'air_temperature': (
+                state['air_temperature'] * 1e-3 -
+                state['surface_pressure'][:, None] * 1e-8)},
+            {'column_temperature': state['air_temperature'].sum(axis=1)},
+        )
+
+
+class MockPreallocatedColumnComponent(MockColumnComponent):
+
+    preallocate_outputs = True
+
+    def array_call(self, state, out_tendencies, out_diagnostics):
+        tendencies, diagnostics = super(
+            MockPreallocatedColumnComponent, self).array_call(state)
+        out_tendencies['air_temperature'][...] = tendencies['air_temperature']
+        out_diagnostics['column_temperature'][...] = (
+            diagnostics['column_temperature'])
+        return out_tendencies, out_diagnostics
+
+
+class MockStencilComponent(DiagnosticComponent):
+
+    input_properties = {
+        'air_temperature': {'dims': ['x', 'y', 'z'], 'units': 'degK'},
+    }
+    diagnostic_properties = {
+        'temperature_laplacian': {'dims': ['x', 'y', 'z'], 'units': 'degK'},
+    }
+    halo_width = 2
+
+    def array_call(self, state):
+        temperature = state['air_temperature']
+        laplacian = np.zeros_like(temperature)
+        laplacian[2:-2] = (
+            temperature[:-4] + temperature[4:] - 2 * temperature[2:-2])
+        return {'temperature_laplacian': laplacian}
+
+
+class MockImplicitComponent(ImplicitTendencyComponent):
+
+    input_properties = {
+        'air_temperature': {'dims': ['*'], 'units': 'degK'},
+    }
+    tendency_properties = {
+        'air_temperature': {'dims': ['*'], 'units': 'degK/s'},
+    }
+    diagnostic_properties = {}
+
+    def array_call(self, state, timestep):
+        return {
+            'air_temperature':
+                -state['air_temperature'] / timestep.total_seconds()}, {}
+
+
+def get_state():
+    random = np.random.RandomState(0)
+    return {
+        'time': timedelta(0),
+        'air_temperature': DataArray(
+            random.randn(10, 3, 4) + 280., dims=['x', 'y', 'z'],
+            attrs={'units': 'degK'}),
+        'surface_pressure': DataArray(
+            random.randn(10, 3) + 1e5, dims=['x', 'y'],
+            attrs={'units': 'Pa'}),
+    }
+
+
+@pytest.fixture
+def mp_context():
+    return multiprocessing.get_context('fork')
+
+
+def assert_outputs_equal(outputs1, outputs2):
+    assert outputs1.keys() == outputs2.keys()
+    for name in outputs1.keys():
+        assert outputs1[name].dims == outputs2[name].dims
+        assert outputs1[name].attrs['units'] == outputs2[name].attrs['units']
+        assert np.allclose(outputs1[name].values, outputs2[name].values)
+
+
+def test_subdomain_selections():
+    selections = get_subdomain_selections('x', 10, 3, halo_width=2)
+    assert selections == [
+        ('x', slice(0, 5), slice(0, 3)),
+        ('x', slice(1, 8), slice(2, 5)),
+        ('x', slice(4, 10), slice(2, 6)),
+    ]
+
+
+@pytest.mark.parametrize(
+    'component_class', [MockColumnComponent, MockPreallocatedColumnComponent])
+def test_column_component_matches_whole_domain(mp_context, component_class):
+    state = get_state()
+    component = component_class()
+    wrapper = DomainDecompositionWrapper(
+        component, n_subdomains=3, mp_context=mp_context)
+    try:
+        for _ in range(2):
+            tendencies, diagnostics = wrapper(state)
+            expected_tendencies, expected_diagnostics = component(state)
+            assert_outputs_equal(tendencies, expected_tendencies)
+            assert_outputs_equal(diagnostics, expected_diagnostics)
+            state['air_temperature'].values[:] += 1.
+    finally:
+        wrapper.shutdown()
+
+
+def test_stencil_component_uses_halo(mp_context):
+    state = get_state()
+    component = MockStencilComponent()
+    wrapper = DomainDecompositionWrapper(
+        component, n_subdomains=3, dim='x', mp_context=mp_context)
+    try:
+        assert_outputs_equal(wrapper(state), component(state))
+    finally:
+        wrapper.shutdown()
+
+
+def test_implicit_component_in_stepper(mp_context):
+    state = get_state()
+    timestep = timedelta(seconds=10)
+    wrapper = DomainDecompositionWrapper(
+        MockImplicitComponent(), n_subdomains=2, mp_context=mp_context)
+    column_wrapper = DomainDecompositionWrapper(
+        MockColumnComponent(), n_subdomains=2, mp_context=mp_context)
+    try:
+        tendencies, _ = wrapper(state, timestep)
+        expected, _ = MockImplicitComponent()(state, timestep)
+        assert_outputs_equal(tendencies, expected)
+        _, new_state = AdamsBashforth(column_wrapper)(state, timestep)
+        _, expected_state = AdamsBashforth(MockColumnComponent())(
+            state, timestep)
+        assert np.allclose(
+            new_state['air_temperature'].values,
+            expected_state['air_temperature'].values)
+    finally:
+        wrapper.shutdown()
+        column_wrapper.shutdown()
+
+
+def test_no_wildcard_requires_dim():
+    wrapper = DomainDecompositionWrapper(MockStencilComponent(), n_subdomains=2)
+    with pytest.raises(InvalidPropertyDictError):
+        wrapper(get_state())
+
+
+def test_too_many_subdomains():
+    wrapper = DomainDecompositionWrapper(
+        MockStencilComponent(), n_subdomains=11, dim='x')
+    with pytest.raises(InvalidStateError):
+        wrapper(get_state())
+
+
+def test_wrapper_delegates_attributes():
+    component = MockColumnComponent()
+    wrapper = DomainDecompositionWrapper(component, n_subdomains=2)
+    assert wrapper.input_properties is component.input_properties
+    assert wrapper.halo_width == 0
+    assert isinstance(wrapper, TendencyComponent)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,350 @@
+import os
+import multiprocessing
+from functools import partial
+import pytest
+import numpy as np
+import xarray as xr
+from datetime import timedelta
+from sympl import (
+    TendencyComponent, DiagnosticComponent, ImplicitTendencyComponent, Stepper,
+    TendencyComponentComposite, AdamsBashforth, SSPRungeKutta, Leapfrog,
+    NetCDFMonitor, DataArray, stack_ensemble_members, get_ensemble_member,
+    EnsembleRunner,
+)
+from sympl._core.ensemble import run_ensemble_member
+
+
+class MockTendencyComponent(TendencyComponent):
+
+    input_properties = {
+        'air_temperature': {'dims': ['*', 'z'], 'units': 'degK'},
+        'specific_humidity': {'dims': ['z'], 'units': 'kg/kg'},
+    }
+    tendency_properties = {
+        'air_temperature': {'units': 'degK/s'},
+    }
+    diagnostic_properties = {
+        'column_temperature': {'dims': ['*'], 'units': 'degK'},
+    }
+
+    def __init__(self, **kwargs):
+        # copied, since tendencies_in_diagnostics modifies these
+        self.input_properties = self.input_properties.copy()
+        self.diagnostic_properties = self.diagnostic_properties.copy()
+        self.times_called = 0
+        self.shapes_given = []
+        super(MockTendencyComponent, self).__init__(**kwargs)
+
+    def array_call(self, state):
+        self.times_called += 1
+        self.shapes_given.append(state['air_temperature'].shape)
+        return (
+            {'air_temperature': (
+                state['air_temperature'] * 1e-3 +
+                state['specific_humidity'])},
+            {'column_temperature': state['air_temperature'].sum(axis=-1)},
+        )
+
+
+class MockEnsembleTendencyComponent(MockTendencyComponent):
+
+    supports_ensemble = True
+
+    def array_call(self, state):
+        self.times_called += 1
+        self.shapes_given.append(state['air_temperature'].shape)
+        return (
+            {'air_temperature': (
+                state['air_temperature'] * 1e-3 +
+                state['specific_humidity'][:, None, :])},
+            {'column_temperature': state['air_temperature'].sum(axis=-1)},
+        )
+
+
+class MockImplicitTendencyComponent(ImplicitTendencyComponent):
+
+    input_properties = {
+        'air_temperature': {'dims': ['x', 'z'], 'units': 'degK'},
+    }
+    tendency_properties = {
+        'air_temperature': {'dims': ['x', 'z'], 'units': 'degK/s'},
+    }
+    diagnostic_properties = {}
+
+    def array_call(self, state, timestep):
+        return {
+            'air_temperature': (
+                state['air_temperature'] / timestep.total_seconds())}, {}
+
+
+class MockDiagnosticComponent(DiagnosticComponent):
+
+    input_properties = {
+        'air_temperature': {'dims': ['z', 'x'], 'units': 'degC'},
+    }
+    diagnostic_properties = {
+        'maximum_temperature': {'dims': [], 'units': 'degC'},
+    }
+
+    def array_call(self, state):
+        return {'maximum_temperature': np.max(state['air_temperature'])}
+
+
+class MockStepper(Stepper):
+
+    input_properties = {
+        'air_temperature': {'dims': ['*'], 'units': 'degK'},
+    }
+    diagnostic_properties = {}
+    output_properties = {
+        'air_temperature': {'units': 'degK'},
+    }
+    supports_ensemble = True
+
+    def array_call(self, state, timestep):
+        return {}, {'air_temperature': state['air_temperature'] * 2.}
+
+
+def get_member_states(n_members=4):
+    random = np.random.RandomState(0)
+    return [
+        {
+            'time': timedelta(0),
+            'air_temperature': DataArray(
+                random.randn(3, 5) + 280., dims=['x', 'z'],
+                attrs={'units': 'degK'}),
+            'specific_humidity': DataArray(
+                random.rand(5) * 1e-3, dims=['z'],
+                attrs={'units': 'kg/kg'}),
+        }
+        for _ in range(n_members)
+    ]
+
+
+def assert_outputs_match_members(ensemble_outputs, member_outputs):
+    for i, outputs in enumerate(member_outputs):
+        for name, value in outputs.items():
+            ensemble_value = ensemble_outputs[name]
+            assert ensemble_value.dims[0] == 'ensemble'
+            assert ensemble_value.attrs['units'] == value.attrs['units']
+            assert np.allclose(
+                ensemble_value.values[i],
+                value.transpose(*ensemble_value.dims[1:]).values)
+
+
+def test_stack_and_get_ensemble_member():
+    member_states = get_member_states()
+    state = stack_ensemble_members(member_states)
+    assert state['time'] == timedelta(0)
+    assert state['air_temperature'].dims == ('ensemble', 'x', 'z')
+    assert state['air_temperature'].attrs['units'] == 'degK'
+    member = get_ensemble_member(state, 2)
+    assert member['air_temperature'].dims == ('x', 'z')
+    assert np.all(
+        member['air_temperature'].values ==
+        member_states[2]['air_temperature'].values)
+
+
+@pytest.mark.parametrize(
+    'component_class',
+    [MockTendencyComponent, MockEnsembleTendencyComponent])
+def test_tendency_component_matches_members(component_class):
+    member_states = get_member_states()
+    state = stack_ensemble_members(member_states)
+    component = component_class(
+        tendencies_in_diagnostics=True, name='component')
+    tendencies, diagnostics = component(state)
+    for i, member_state in enumerate(member_states):
+        member_tendencies, member_diagnostics = MockTendencyComponent(
+            tendencies_in_diagnostics=True, name='component')(member_state)
+        assert_outputs_match_members(
+            tendencies, [{}] * i + [member_tendencies])
+        assert_outputs_match_members(
+            diagnostics, [{}] * i + [member_diagnostics])
+
+
+def test_supports_ensemble_calls_once():
+    state = stack_ensemble_members(get_member_states(4))
+    component = MockEnsembleTendencyComponent()
+    component(state)
+    assert component.times_called == 1
+    assert component.shapes_given == [(4, 3, 5)]
+
+
+def test_without_ensemble_support_calls_each_member():
+    state = stack_ensemble_members(get_member_states(4))
+    component = MockTendencyComponent()
+    component(state)
+    assert component.times_called == 4
+    assert component.shapes_given == [(3, 5)] * 4
+
+
+def test_shared_input_is_broadcast():
+    member_states = get_member_states(3)
+    state = stack_ensemble_members(member_states)
+    state['specific_humidity'] = member_states[0]['specific_humidity']
+    for component_class in (
+            MockTendencyComponent, MockEnsembleTendencyComponent):
+        tendencies, _ = component_class()(state)
+        assert tendencies['air_temperature'].dims == ('ensemble', 'x', 'z')
+        expected, _ = MockTendencyComponent()(member_states[0])
+        assert np.allclose(
+            tendencies['air_temperature'].values[0],
+            expected['air_temperature'].values)
+
+
+def test_implicit_and_diagnostic_components():
+    member_states = get_member_states()
+    state = stack_ensemble_members(member_states)
+    timestep = timedelta(seconds=10)
+    tendencies, _ = MockImplicitTendencyComponent()(state, timestep)
+    diagnostics = MockDiagnosticComponent()(state)
+    assert diagnostics['maximum_temperature'].dims == ('ensemble',)
+    for i, member_state in enumerate(member_states):
+        member_tendencies, _ = MockImplicitTendencyComponent()(
+            member_state, timestep)
+        member_diagnostics = MockDiagnosticComponent()(member_state)
+        assert_outputs_match_members(
+            tendencies, [{}] * i + [member_tendencies])
+        assert_outputs_match_members(
+            diagnostics, [{}] * i + [member_diagnostics])
+
+
+def test_stepper_supports_ensemble():
+    state = stack_ensemble_members(get_member_states())
+    _, new_state = MockStepper()(state, timedelta(seconds=10))
+    assert new_state['air_temperature'].dims == ('ensemble', 'x', 'z')
+    assert np.all(
+        new_state['air_temperature'].values ==
+        state['air_temperature'].values * 2.)
+
+
+def test_properties_with_ensemble_dim_are_not_changed():
+
+    class EnsembleMean(DiagnosticComponent):
+        input_properties = {
+            'air_temperature': {'dims': ['ensemble', '*'], 'units': 'degK'},
+        }
+        diagnostic_properties = {
+            'ensemble_mean_temperature': {'dims': ['*'], 'units': 'degK'},
+        }
+
+        def array_call(self, state):
+            return {
+                'ensemble_mean_temperature':
+                    state['air_temperature'].mean(axis=0)}
+
+    member_states = get_member_states()
+    state = stack_ensemble_members(member_states)
+    diagnostics = EnsembleMean()(state)
+    assert diagnostics['ensemble_mean_temperature'].dims == ('x', 'z')
+    assert np.allclose(
+        diagnostics['ensemble_mean_temperature'].values,
+        np.mean([s['air_temperature'].values for s in member_states], axis=0))
+
+
+@pytest.mark.parametrize('stepper_class, kwargs', [
+    (AdamsBashforth, {}),
+    (AdamsBashforth, {'in_place': True}),
+    (SSPRungeKutta, {}),
+    (Leapfrog, {}),
+])
+@pytest.mark.parametrize(
+    'component_class',
+    [MockTendencyComponent, MockEnsembleTendencyComponent])
+def test_stepping_matches_members(stepper_class, kwargs, component_class):
+    timestep = timedelta(seconds=10)
+    member_states = get_member_states(3)
+    state = stack_ensemble_members(member_states)
+    stepper = stepper_class(
+        TendencyComponentComposite(component_class()), **kwargs)
+    for _ in range(3):
+        _, new_state = stepper(state, timestep)
+        new_state['time'] = state['time'] + timestep
+        state = new_state
+    for i, member_state in enumerate(member_states):
+        stepper = stepper_class(MockTendencyComponent(), **kwargs)
+        for _ in range(3):
+            _, new_state = stepper(member_state, timestep)
+            new_state['time'] = member_state['time'] + timestep
+            member_state = new_state
+        assert_outputs_match_members(
+            state, [{}] * i + [{
+                'air_temperature': member_state['air_temperature']}])
+
+
+def test_netcdf_monitor_writes_ensemble_dim(tmpdir):
+    filename = os.path.join(str(tmpdir), 'ensemble.nc')
+    state = stack_ensemble_members(get_member_states())
+    monitor = NetCDFMonitor(filename)
+    monitor.store(state)
+    monitor.write()
+    dataset = xr.open_dataset(filename)
+    assert dataset['air_temperature'].dims == ('time', 'ensemble', 'x', 'z')
+    assert np.all(
+        dataset['air_temperature'].values[0] ==
+        state['air_temperature'].values)
+    dataset.close()
+
+
+class MockColumnMaximum(DiagnosticComponent):
+
+    input_properties = {
+        'air_temperature': {'dims': ['x', 'z'], 'units': 'degK'},
+    }
+    diagnostic_properties = {
+        'column_maximum_temperature': {'dims': ['x'], 'units': 'degK'},
+    }
+
+    def array_call(self, state):
+        return {
+            'column_maximum_temperature': state['air_temperature'].max(axis=1)}
+
+
+def member_factory(directory, index):
+    stepper = AdamsBashforth(MockTendencyComponent())
+    monitor = NetCDFMonitor(
+        os.path.join(directory, 'member_{}.nc'.format(index)))
+    return stepper, [MockColumnMaximum()], [monitor]
+
+
+def test_ensemble_runner_writes_member_output(tmpdir):
+    timestep = timedelta(seconds=10)
+    member_states = get_member_states(3)
+    runner = EnsembleRunner(
+        partial(member_factory, str(tmpdir)), max_workers=2,
+        mp_context=multiprocessing.get_context('fork'))
+    results = runner.run(
+        member_states, timestep, 4, return_final_states=True)
+    assert [result.index for result in results] == [0, 1, 2]
+    serial_dir = tmpdir.mkdir('serial')
+    for i, result in enumerate(results):
+        assert result.n_steps == 4
+        assert result.steps_per_second > 0
+        expected = run_ensemble_member(
+            partial(member_factory, str(serial_dir)), i, member_states[i],
+            timestep, 4, return_final_state=True)
+        assert result.final_state['time'] == timedelta(seconds=40)
+        assert np.allclose(
+            result.final_state['air_temperature'].values,
+            expected.final_state['air_temperature'].values)
+        dataset = xr.open_dataset(
+            os.path.join(str(tmpdir), 'member_{}.nc'.format(i)))
+        assert len(dataset['time']) == 4
+        assert 'column_maximum_temperature' in dataset
+        assert np.all(
+            dataset['air_temperature'].values[0] ==
+            member_states[i]['air_temperature'].values)
+        dataset.close()
+
+
+def test_ensemble_runner_does_not_return_states_by_default(tmpdir):
+    runner = EnsembleRunner(
+        partial(member_factory, str(tmpdir)), max_workers=1,
+        mp_context=multiprocessing.get_context('fork'))
+    results = runner.run(get_member_states(2), timedelta(seconds=10), 2)
+    assert all(result.final_state is None for result in results)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -4,8 +4,12 @@ from sympl import (
     restore_dimensions, get_numpy_arrays_with_properties,
     restore_data_arrays_with_properties, InvalidStateError,
     InvalidPropertyDictError)
+from sympl._core.get_np_arrays import ArrayPlanCache
+from sympl._core.ensemble import get_ensemble_size
+from sympl._core.restore_dataarray import RestorePlanCache
 import numpy as np
 import unittest
+import mock
 
 try:
     from numpy.lib.array_utils import byte_bounds
@@ -1266,5 +1270,286 @@ class RestoreDataArraysWithPropertiesTests(unittest.TestCase):
         assert data_arrays['q'].shape == (2, 2, 4, 2)
 
 
+class ArrayPlanCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.plan_cache = ArrayPlanCache()
+
+    def tearDown(self):
+        self.plan_cache = None
+
+    def assert_same_as_uncached(self, state, property_dictionary):
+        expected = get_numpy_arrays_with_properties(state, property_dictionary)
+        for _ in range(2):
+            result = get_numpy_arrays_with_properties(
+                state, property_dictionary, plan_cache=self.plan_cache)
+            assert result.keys() == expected.keys()
+            for name in expected.keys():
+                assert result[name].shape == expected[name].shape
+                assert result[name].dtype == expected[name].dtype
+                assert np.allclose(result[name], expected[name])
+        return result
+
+    def test_caches_plan(self):
+        state = {
+            'air_temperature': DataArray(
+                np.random.randn(2, 3, 4),
+                dims=['x', 'y', 'z'],
+                attrs={'units': 'degK'},
+            ),
+        }
+        property_dictionary = {
+            'air_temperature': {'dims': ['x', 'y', 'z'], 'units': 'degK'},
+        }
+        self.assert_same_as_uncached(state, property_dictionary)
+        assert self.plan_cache.misses == 1
+        assert self.plan_cache.hits == 1
+        assert len(self.plan_cache) == 1
+
+    def test_no_conversion_does_not_copy(self):
+        state = {
+            'air_temperature': DataArray(
+                np.random.randn(2, 3, 4),
+                dims=['x', 'y', 'z'],
+                attrs={'units': 'degK'},
+            ),
+        }
+        property_dictionary = {
+            'air_temperature': {'dims': ['z', 'y', 'x'], 'units': 'degK'},
+        }
+        result = self.assert_same_as_uncached(state, property_dictionary)
+        assert arrays_share_same_memory_space(
+            state['air_temperature'].values, result['air_temperature'])
+
+    def test_unit_conversion_with_offset(self):
+        state = {
+            'air_temperature': DataArray(
+                np.random.randn(2, 3),
+                dims=['x', 'y'],
+                attrs={'units': 'degC'},
+            ),
+        }
+        property_dictionary = {
+            'air_temperature': {'dims': ['y', 'x'], 'units': 'degF'},
+        }
+        result = self.assert_same_as_uncached(state, property_dictionary)
+        assert np.allclose(
+            result['air_temperature'],
+            state['air_temperature'].values.T * 1.8 + 32.)
+
+    def test_wildcard_missing_dims_and_alias(self):
+        state = {
+            'air_temperature': DataArray(
+                np.random.randn(2, 3, 4),
+                dims=['x', 'y', 'z'],
+                attrs={'units': 'degK'},
+            ),
+            'surface_pressure': DataArray(
+                np.random.randn(3, 2),
+                dims=['y', 'x'],
+                attrs={'units': 'hPa'},
+            ),
+            'rain': DataArray(
+                np.random.randn(4),
+                dims=['z'],
+                attrs={'units': 'mm'},
+            ),
+        }
+        property_dictionary = {
+            'air_temperature': {'dims': ['*', 'z'], 'units': 'degK', 'alias': 'T'},
+            'surface_pressure': {'dims': ['*'], 'units': 'Pa'},
+            'rain': {'dims': ['x', 'z'], 'units': 'm'},
+        }
+        result = self.assert_same_as_uncached(state, property_dictionary)
+        assert result['T'].shape == (6, 4)
+        assert result['surface_pressure'].shape == (6,)
+        assert result['rain'].shape == (2, 4)
+
+    def test_new_signature_gets_new_plan(self):
+        property_dictionary = {
+            'air_temperature': {'dims': ['x', 'y'], 'units': 'degK'},
+        }
+        state = {
+            'air_temperature': DataArray(
+                np.random.randn(2, 3),
+                dims=['x', 'y'],
+                attrs={'units': 'degK'},
+            ),
+        }
+        self.assert_same_as_uncached(state, property_dictionary)
+        state['air_temperature'] = DataArray(
+            np.random.randn(3, 2),
+            dims=['y', 'x'],
+            attrs={'units': 'degC'},
+        )
+        self.assert_same_as_uncached(state, property_dictionary)
+        assert self.plan_cache.misses == 2
+        assert len(self.plan_cache) == 2
+
+    def test_least_recently_used_plan_is_discarded(self):
+        plan_cache = ArrayPlanCache(max_plans=2)
+        property_dictionary = {
+            'air_temperature': {'dims': ['x'], 'units': 'degK'},
+        }
+        for nx in (2, 3, 4):
+            state = {
+                'air_temperature': DataArray(
+                    np.zeros([nx]), dims=['x'], attrs={'units': 'degK'}),
+            }
+            get_numpy_arrays_with_properties(
+                state, property_dictionary, plan_cache=plan_cache)
+        assert len(plan_cache) == 2
+        assert plan_cache.misses == 3
+
+    def test_ensemble_size_computed_once_per_signature(self):
+        property_dictionary = {
+            'air_temperature': {'dims': ['x'], 'units': 'degK'},
+        }
+        with mock.patch(
+                'sympl._core.get_np_arrays.get_ensemble_size',
+                wraps=get_ensemble_size) as patched:
+            for dims, shape, expected in (
+                    (['x'], [2], None),
+                    (['x'], [2], None),
+                    (['ensemble', 'x'], [3, 2], 3),
+                    (['ensemble', 'x'], [3, 2], 3),
+                    (['ensemble', 'x'], [4, 2], 4)):
+                state = {
+                    'air_temperature': DataArray(
+                        np.zeros(shape), dims=dims, attrs={'units': 'degK'}),
+                }
+                assert self.plan_cache.get_ensemble_size(
+                    state, property_dictionary) == expected
+        assert patched.call_count == 3
+
+    def test_incompatible_units_raises(self):
+        state = {
+            'air_temperature': DataArray(
+                np.zeros([2]), dims=['x'], attrs={'units': 'degK'}),
+        }
+        property_dictionary = {
+            'air_temperature': {'dims': ['x'], 'units': 'm'},
+        }
+        with self.assertRaises(InvalidStateError):
+            get_numpy_arrays_with_properties(
+                state, property_dictionary, plan_cache=self.plan_cache)
+
+    def test_unexpected_dims_raises(self):
+        state = {
+            'air_temperature': DataArray(
+                np.zeros([2, 3]), dims=['x', 'y'], attrs={'units': 'degK'}),
+        }
+        property_dictionary = {
+            'air_temperature': {'dims': ['x'], 'units': 'degK'},
+        }
+        with self.assertRaises(InvalidStateError):
+            get_numpy_arrays_with_properties(
+                state, property_dictionary, plan_cache=self.plan_cache)
+
+
+class RestorePlanCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.plan_cache = RestorePlanCache()
+        self.input_state = {
+            'air_temperature': DataArray(
+                np.random.randn(2, 3, 4),
+                dims=['x', 'y', 'z'],
+                attrs={'units': 'degK'},
+            ),
+        }
+        self.input_properties = {
+            'air_temperature': {
+                'dims': ['*', 'z'], 'units': 'degK', 'alias': 'T'},
+        }
+
+    def tearDown(self):
+        self.plan_cache = None
+
+    def assert_same_as_uncached(self, raw_arrays, output_properties, **kwargs):
+        expected = restore_data_arrays_with_properties(
+            raw_arrays, output_properties,
+            self.input_state, self.input_properties, **kwargs)
+        for _ in range(2):
+            result = restore_data_arrays_with_properties(
+                raw_arrays, output_properties,
+                self.input_state, self.input_properties,
+                plan_cache=self.plan_cache, **kwargs)
+            assert result.keys() == expected.keys()
+            for name in expected.keys():
+                assert result[name].dims == expected[name].dims
+                assert result[name].attrs == expected[name].attrs
+                assert np.all(result[name].values == expected[name].values)
+        return result
+
+    def test_caches_plan(self):
+        raw_arrays = {'T': np.random.randn(6, 4), 'rain': np.random.randn(6)}
+        output_properties = {
+            'air_temperature': {'units': 'degK/s'},
+            'rain': {'dims': ['*'], 'units': 'mm'},
+        }
+        result = self.assert_same_as_uncached(raw_arrays, output_properties)
+        assert result['air_temperature'].dims == ('x', 'y', 'z')
+        assert result['rain'].dims == ('x', 'y')
+        assert self.plan_cache.misses == 1
+        assert self.plan_cache.hits == 1
+        assert len(self.plan_cache) == 1
+
+    def test_ignore_missing(self):
+        raw_arrays = {'rain': np.random.randn(6)}
+        output_properties = {
+            'rain': {'dims': ['*'], 'units': 'mm'},
+            'snow': {'dims': ['*'], 'units': 'mm'},
+        }
+        result = self.assert_same_as_uncached(
+            raw_arrays, output_properties, ignore_missing=True)
+        assert list(result.keys()) == ['rain']
+
+    def test_new_output_shape_gets_new_plan(self):
+        output_properties = {'rain': {'dims': ['x', 'w'], 'units': 'mm'}}
+        self.assert_same_as_uncached(
+            {'rain': np.random.randn(2, 5)}, output_properties)
+        self.assert_same_as_uncached(
+            {'rain': np.random.randn(2, 7)}, output_properties)
+        assert self.plan_cache.misses == 2
+
+    def test_invalid_shape_raises(self):
+        output_properties = {'rain': {'dims': ['*'], 'units': 'mm'}}
+        with self.assertRaises(InvalidPropertyDictError):
+            restore_data_arrays_with_properties(
+                {'rain': np.zeros([5])}, output_properties,
+                self.input_state, self.input_properties,
+                plan_cache=self.plan_cache)
+
+    def test_reuse_containers(self):
+        plan_cache = RestorePlanCache(reuse_containers=True)
+        output_properties = {'rain': {'dims': ['*'], 'units': 'mm'}}
+        first = restore_data_arrays_with_properties(
+            {'rain': np.zeros([6])}, output_properties,
+            self.input_state, self.input_properties, plan_cache=plan_cache)
+        new_values = np.ones([6])
+        second = restore_data_arrays_with_properties(
+            {'rain': new_values}, output_properties,
+            self.input_state, self.input_properties, plan_cache=plan_cache)
+        assert second['rain'] is first['rain']
+        assert second['rain'].dims == ('x', 'y')
+        assert second['rain'].attrs == {'units': 'mm'}
+        assert np.all(second['rain'].values == 1.)
+        assert np.shares_memory(second['rain'].values, new_values)
+
+    def test_does_not_reuse_containers_from_input_state(self):
+        plan_cache = RestorePlanCache(reuse_containers=True)
+        output_properties = {'air_temperature': {'units': 'degK'}}
+        first = restore_data_arrays_with_properties(
+            {'T': np.zeros([6, 4])}, output_properties,
+            self.input_state, self.input_properties, plan_cache=plan_cache)
+        self.input_state = first
+        second = restore_data_arrays_with_properties(
+            {'T': np.ones([6, 4])}, output_properties,
+            self.input_state, self.input_properties, plan_cache=plan_cache)
+        assert second['air_temperature'] is not first['air_temperature']
+        assert np.all(first['air_temperature'].values == 0.)
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
@@ -0,0 +1,133 @@
+import os
+import subprocess
+import sys
+import pytest
+import sympl
+
+heavy_modules = ('xarray', 'pandas', 'pint', 'netCDF4', 'cftime', 'matplotlib')
+
+
+def run_python(code, **environ):
+    """Run code in a new interpreter and return what it prints."""
+    env = dict(os.environ)
+    env.update(environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.path.dirname(os.path.dirname(sympl.__file__))] +
+        [path for path in [env.get('PYTHONPATH')] if path])
+    return subprocess.check_output(
+        [sys.executable, '-W', 'ignore', '-c', code], env=env,
+        universal_newlines=True).strip()
+
+
+def test_import_does_not_import_heavy_modules():
+    imported = run_python(
+        'import sys, sympl\n'
+        'print(",".join(m for m in {!r} if m in sys.modules))'.format(
+            heavy_modules))
+    assert imported == ''
+
+
+def test_constants_do_not_import_xarray():
+    imported = run_python(
+        'import sys, sympl\n'
+        'sympl.set_constant("my_constant", 2., "km")\n'
+        'assert sympl.get_constant("my_constant", "m") == 2000.\n'
+        'print("xarray" in sys.modules)')
+    assert imported == 'False'
+
+
+def test_dataarray_is_available_on_first_use():
+    output = run_python(
+        'import sys, sympl, xarray\n'
+        'from sympl import DataArray\n'
+        'print(issubclass(DataArray, xarray.DataArray), '
+        'DataArray is sympl.DataArray)')
+    assert output == 'True True'
+
+
+def test_star_import():
+    output = run_python(
+        'from sympl import *\n'
+        'print(DataArray.__name__, TendencyComponent.__name__)')
+    assert output == 'DataArray TendencyComponent'
+
+
+def test_unit_registry_attribute():
+    from sympl._core.units import unit_registry, get_unit_registry
+    assert unit_registry is get_unit_registry()
+    assert unit_registry('km').to('m').magnitude == 1000.
+
+
+registry_code = (
+    'from sympl._core.units import get_unit_registry\n'
+    'unit_registry = get_unit_registry()\n'
+    'print(unit_registry("degrees_north"), unit_registry("%"))')
+
+
+def test_unit_registry_uses_cache_folder(tmpdir):
+    cache_folder = str(tmpdir.join('units'))
+    for _ in range(2):
+        output = run_python(registry_code, SYMPL_UNIT_CACHE_FOLDER=cache_folder)
+        assert output == '1 degrees_north 1 percent'
+    assert len(os.listdir(cache_folder)) > 0
+
+
+def test_unit_registry_without_cache_folder():
+    output = run_python(
+        registry_code + '\nprint(unit_registry._diskcache is None)',
+        SYMPL_UNIT_CACHE_FOLDER='')
+    assert output == '1 degrees_north 1 percent\nTrue'
+
+
+def test_unit_cache_is_disabled_by_default(monkeypatch):
+    from sympl._core.units import get_unit_cache_folder
+    monkeypatch.delenv('SYMPL_UNIT_CACHE_FOLDER', raising=False)
+    assert get_unit_cache_folder() is None
+
+
+def test_unusable_cache_folder_warns(tmpdir, monkeypatch):
+    from sympl._core.units import get_unit_registry
+    not_a_folder = tmpdir.join('file')
+    not_a_folder.write('')
+    monkeypatch.setenv(
+        'SYMPL_UNIT_CACHE_FOLDER', os.path.join(str(not_a_folder), 'units'))
+    with pytest.warns(UserWarning, match='unit cache folder'):
+        # build a new registry rather than the one memoized for this process
+        unit_registry = get_unit_registry.__wrapped__()
+    assert unit_registry('km').to('m').magnitude == 1000.
+
+
+def test_unit_registry_with_unusable_cache_folder(tmpdir):
+    not_a_folder = tmpdir.join('file')
+    not_a_folder.write('')
+    output = run_python(
+        registry_code,
+        SYMPL_UNIT_CACHE_FOLDER=os.path.join(str(not_a_folder), 'units'))
+    assert output == '1 degrees_north 1 percent'
+
+
+def test_unit_registry_with_incomplete_cache_file(tmpdir):
+    cache_folder = str(tmpdir.join('units'))
+    run_python(registry_code, SYMPL_UNIT_CACHE_FOLDER=cache_folder)
+    for filename in os.listdir(cache_folder):
+        if filename.endswith('.pickle'):
+            # as seen while another process is writing it
+            open(os.path.join(cache_folder, filename), 'w').close()
+    output = run_python(registry_code, SYMPL_UNIT_CACHE_FOLDER=cache_folder)
+    assert output == '1 degrees_north 1 percent'
+
+
+def test_prepare_unit_cache_writes_cache(tmpdir):
+    cache_folder = str(tmpdir.join('units'))
+    output = run_python(
+        'import sys\n'
+        'from sympl._core.units import prepare_unit_cache\n'
+        'prepare_unit_cache()\n'
+        'print("pint" in sys.modules)',
+        SYMPL_UNIT_CACHE_FOLDER=cache_folder)
+    assert output == 'True'
+    assert len(os.listdir(cache_folder)) > 0
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
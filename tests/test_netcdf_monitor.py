@@ -1,6 +1,9 @@
 import pytest
+import sympl
 from sympl import NetCDFMonitor, DataArray, InvalidStateError
 import os
+import subprocess
+import sys
 from datetime import datetime, timedelta
 import numpy as np
 import xarray as xr
@@ -26,6 +29,13 @@ state = {
 }
 
 
+@pytest.fixture(autouse=True)
+def run_in_tmpdir(tmpdir, monkeypatch):
+    # tests which write to relative paths such as out.nc do so in a
+    # temporary folder rather than the working directory
+    monkeypatch.chdir(tmpdir)
+
+
 class NetCDFMonitorAliasTests(unittest.TestCase):
 
     def setUp(self):
@@ -416,5 +426,297 @@ def test_netcdf_monitor_raises_when_names_change_on_batch_write():
         if os.path.isfile('out.nc'):
             os.remove('out.nc')
 
+
+def test_netcdf_monitor_stream_matches_write(tmpdir):
+    time_list = [
+        datetime(2013, 7, 20, 0),
+        datetime(2013, 7, 20, 6),
+        datetime(2013, 7, 20, 12),
+    ]
+    filenames = [str(tmpdir.join('batch.nc')), str(tmpdir.join('stream.nc'))]
+    current_state = state.copy()
+    monitor = NetCDFMonitor(filenames[0])
+    with NetCDFMonitor(filenames[1], stream=True) as stream_monitor:
+        for i, time in enumerate(time_list):
+            current_state['time'] = time
+            current_state['air_temperature'] = state['air_temperature'] + i
+            monitor.store(current_state)
+            stream_monitor.store(current_state)
+            assert stream_monitor._dataset.dimensions['time'].size == i + 1
+    monitor.write()
+    assert stream_monitor._dataset is None
+    with xr.open_dataset(filenames[0]) as ds1, \
+            xr.open_dataset(filenames[1]) as ds2:
+        assert ds1.identical(ds2)
+        assert len(ds2['time']) == len(time_list)
+        assert np.all(
+            ds2['air_temperature'].values[2] ==
+            state['air_temperature'].values + 2)
+
+
+def test_netcdf_monitor_stream_flush_interval(tmpdir):
+    filename = str(tmpdir.join('out.nc'))
+    monitor = NetCDFMonitor(filename, stream=True, flush_interval=2)
+    current_state = state.copy()
+    for i in range(3):
+        current_state['time'] = datetime(2013, 7, 20, i)
+        monitor.store(current_state)
+        assert monitor._n_unflushed == (i + 1) % 2
+    monitor.close()
+    with xr.open_dataset(filename) as ds:
+        assert len(ds['time']) == 3
+
+
+def test_netcdf_monitor_stream_appends_after_close(tmpdir):
+    filename = str(tmpdir.join('out.nc'))
+    monitor = NetCDFMonitor(filename, stream=True)
+    current_state = state.copy()
+    for i in range(2):
+        current_state['time'] = datetime(2013, 7, 20, i)
+        monitor.store(current_state)
+        monitor.close()
+    with xr.open_dataset(filename) as ds:
+        assert len(ds['time']) == 2
+
+
+def test_netcdf_monitor_stream_raises_when_names_change(tmpdir):
+    current_state = state.copy()
+    with NetCDFMonitor(str(tmpdir.join('out.nc')), stream=True) as monitor:
+        monitor.store(current_state)
+        current_state['time'] = datetime(2013, 7, 20, 6)
+        current_state['air_density'] = current_state['air_pressure']
+        with pytest.raises(InvalidStateError):
+            monitor.store(current_state)
+
+
+def test_netcdf_monitor_stream_raises_when_attrs_change(tmpdir):
+    current_state = state.copy()
+    with NetCDFMonitor(str(tmpdir.join('out.nc')), stream=True) as monitor:
+        monitor.store(current_state)
+        current_state['time'] = datetime(2013, 7, 20, 6)
+        current_state['air_pressure'] = state['air_pressure'].copy()
+        current_state['air_pressure'].attrs['units'] = 'hPa'
+        with pytest.raises(InvalidStateError):
+            monitor.store(current_state)
+
+
+def test_netcdf_monitor_stream_raises_when_shape_changes(tmpdir):
+    filename = str(tmpdir.join('out.nc'))
+    current_state = state.copy()
+    with NetCDFMonitor(filename, stream=True) as monitor:
+        monitor.store(current_state)
+        current_state['time'] = datetime(2013, 7, 20, 6)
+        current_state['air_pressure'] = state['air_pressure'][:, :4, :]
+        with pytest.raises(InvalidStateError):
+            monitor.store(current_state)
+        current_state['time'] = datetime(2013, 7, 20, 12)
+        current_state['air_pressure'] = state['air_pressure']
+        monitor.store(current_state)
+    with xr.open_dataset(filename) as ds:
+        assert list(ds['time'].values) == [
+            np.datetime64(datetime(2013, 7, 20, 0)),
+            np.datetime64(datetime(2013, 7, 20, 12))]
+        assert np.all(
+            ds['air_pressure'].values[1] == state['air_pressure'].values)
+
+
+def test_netcdf_monitor_stream_transposes_dims(tmpdir):
+    filename = str(tmpdir.join('out.nc'))
+    current_state = state.copy()
+    with NetCDFMonitor(filename, stream=True) as monitor:
+        monitor.store(current_state)
+        current_state['time'] = datetime(2013, 7, 20, 6)
+        current_state['air_temperature'] = (
+            state['air_temperature'] + 1.).transpose(
+                'mid_levels', 'lat', 'lon')
+        monitor.store(current_state)
+    with xr.open_dataset(filename) as ds:
+        assert ds['air_temperature'].dims == (
+            'time', 'lon', 'lat', 'mid_levels')
+        assert np.all(
+            ds['air_temperature'].values[1] ==
+            state['air_temperature'].values + 1.)
+
+
+def test_netcdf_monitor_background_with_foreground_netcdf_use(tmpdir):
+    filenames = [str(tmpdir.join('background.nc')), str(tmpdir.join('fg.nc'))]
+    background = NetCDFMonitor(
+        filenames[0], write_on_store=True, write_in_background=True)
+    foreground = NetCDFMonitor(filenames[1], stream=True)
+    current_state = state.copy()
+    n_times = 20
+    for i in range(n_times):
+        current_state['time'] = datetime(2013, 7, 20, i)
+        current_state['air_temperature'] = state['air_temperature'] + i
+        background.store(current_state)
+        foreground.store(current_state)
+        foreground.flush()
+        with xr.open_dataset(filenames[1]) as ds:
+            assert np.all(
+                ds['air_temperature'].values[i] ==
+                state['air_temperature'].values + i)
+    background.close()
+    foreground.close()
+    for filename in filenames:
+        with xr.open_dataset(filename) as ds:
+            assert len(ds['time']) == n_times
+            assert np.all(
+                ds['air_temperature'].values[-1] ==
+                state['air_temperature'].values + n_times - 1)
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'write_on_store': True}, {'stream': True}])
+def test_netcdf_monitor_write_in_background(tmpdir, kwargs):
+    filename = str(tmpdir.join('out.nc'))
+    monitor = NetCDFMonitor(
+        filename, write_in_background=True, queue_size=1, **kwargs)
+    current_state = state.copy()
+    current_state['air_temperature'] = state['air_temperature'].copy()
+    for i in range(3):
+        current_state['time'] = datetime(2013, 7, 20, i)
+        monitor.store(current_state)
+        # modifying the state after storing it must not change the output
+        current_state['air_temperature'].values[:] += 1.
+    monitor.close()
+    assert monitor._writer_thread is None
+    with xr.open_dataset(filename) as ds:
+        assert len(ds['time']) == 3
+        for i in range(3):
+            assert np.allclose(
+                ds['air_temperature'].values[i],
+                state['air_temperature'].values + i)
+
+
+def test_netcdf_monitor_write_in_background_writes_queue_at_exit(tmpdir):
+    filename = str(tmpdir.join('out.nc'))
+    script = '''
+import sys
+from datetime import datetime
+import numpy as np
+from sympl import NetCDFMonitor, DataArray
+monitor = NetCDFMonitor(sys.argv[1], write_in_background=True)
+for i in range(5):
+    monitor.store({
+        'time': datetime(2013, 7, 20, i),
+        'air_temperature': DataArray(
+            np.full((10,), float(i)), dims=['x'], attrs={'units': 'degK'}),
+    })
+'''
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.path.dirname(os.path.dirname(sympl.__file__))] +
+        [path for path in [env.get('PYTHONPATH')] if path])
+    subprocess.check_call([sys.executable, '-c', script, filename], env=env)
+    with xr.open_dataset(filename) as ds:
+        assert len(ds['time']) == 5
+        assert np.all(ds['air_temperature'].values[-1] == 4.)
+
+
+def test_netcdf_monitor_write_in_background_raises_on_next_call(tmpdir):
+    monitor = NetCDFMonitor(
+        str(tmpdir.join('out.nc')), write_in_background=True, stream=True)
+    current_state = state.copy()
+    monitor.store(current_state)
+    current_state['time'] = datetime(2013, 7, 20, 6)
+    current_state['air_density'] = current_state['air_pressure']
+    monitor.store(current_state)
+    with pytest.raises(InvalidStateError):
+        monitor.flush()
+    monitor.close()
+
+
+def test_netcdf_monitor_write_in_background_write_raises(tmpdir):
+    monitor = NetCDFMonitor(
+        str(tmpdir.join('out.nc')), write_in_background=True)
+    current_state = state.copy()
+    monitor.store(current_state)
+    current_state['time'] = datetime(2013, 7, 20, 6)
+    current_state['air_density'] = current_state['air_pressure']
+    monitor.store(current_state)
+    with pytest.raises(InvalidStateError):
+        monitor.write()
+    monitor._stop_writer()
+
+
+@pytest.mark.parametrize('kwargs, n_written', [
+    ({'max_cached_states': 2}, [0, 2, 2, 4, 4]),
+    ({'max_cache_bytes': 3 * 2 * nx * ny * nz * 8}, [0, 0, 3, 3, 3]),
+])
+def test_netcdf_monitor_writes_when_cache_is_full(tmpdir, kwargs, n_written):
+    filename = str(tmpdir.join('out.nc'))
+    monitor = NetCDFMonitor(filename, **kwargs)
+    current_state = state.copy()
+    for i in range(5):
+        current_state['time'] = datetime(2013, 7, 20, i)
+        monitor.store(current_state)
+        if n_written[i] == 0:
+            assert not os.path.isfile(filename)
+        else:
+            with xr.open_dataset(filename) as ds:
+                assert len(ds['time']) == n_written[i]
+        assert len(monitor._cached_state_dict) == i + 1 - n_written[i]
+    monitor.write()
+    with xr.open_dataset(filename) as ds:
+        assert len(ds['time']) == 5
+    assert monitor._cache_bytes == 0
+
+
+def test_netcdf_monitor_writes_scalars_and_transposed_quantities(tmpdir):
+    filename = str(tmpdir.join('out.nc'))
+    monitor = NetCDFMonitor(filename)
+    current_state = state.copy()
+    for i in range(2):
+        current_state['time'] = datetime(2013, 7, 20, i)
+        current_state['global_mean'] = DataArray(
+            float(i), dims=[], attrs={'units': 'degK'})
+        monitor.store(current_state)
+        current_state['air_temperature'] = state['air_temperature'].transpose()
+    monitor.write()
+    with xr.open_dataset(filename) as ds:
+        assert np.all(ds['global_mean'].values == [0., 1.])
+        assert np.all(
+            ds['air_temperature'].values[1] == state['air_temperature'].values)
+
+
+def test_netcdf_monitor_encoding(tmpdir):
+    import netCDF4
+    filename = str(tmpdir.join('out.nc'))
+    monitor = NetCDFMonitor(
+        filename, default_encoding={'zlib': True, 'complevel': 4},
+        encoding={
+            'air_temperature': {
+                'dtype': 'float32', 'least_significant_digit': 2},
+            'air_pressure': {'chunksizes': (2, nx, 1, nz)},
+        })
+    current_state = state.copy()
+    for i in range(2):
+        current_state['time'] = datetime(2013, 7, 20, i)
+        monitor.store(current_state)
+    monitor.write()
+    with netCDF4.Dataset(filename) as dataset:
+        temperature = dataset.variables['air_temperature']
+        assert temperature.dtype == np.float32
+        assert temperature.filters()['zlib']
+        assert temperature.filters()['complevel'] == 4
+        assert temperature.chunking() == [1, nx, ny, nz]
+        assert np.allclose(
+            temperature[1], state['air_temperature'].values, atol=1e-2)
+        pressure = dataset.variables['air_pressure']
+        assert pressure.dtype == np.float64
+        assert pressure.filters()['zlib']
+        assert pressure.chunking() == [2, nx, 1, nz]
+        assert np.all(pressure[1] == state['air_pressure'].values)
+
+
+def test_netcdf_monitor_encoding_only_applies_to_named_variables(tmpdir):
+    import netCDF4
+    filename = str(tmpdir.join('out.nc'))
+    monitor = NetCDFMonitor(filename, encoding={'air_pressure': {'zlib': True}})
+    monitor.store(state)
+    monitor.write()
+    with netCDF4.Dataset(filename) as dataset:
+        assert not dataset.variables['air_temperature'].filters()['zlib']
+        assert dataset.variables['air_pressure'].filters()['zlib']
+
 if __name__ == '__main__':
     pytest.main([__file__])
@@ -0,0 +1,266 @@
+import os
+import pytest
+import numpy as np
+import xarray as xr
+from datetime import timedelta
+from sympl import (
+    QuantityArray, NumpyBackend, DataArrayBackend, DataArray, set_backend,
+    TendencyComponent, DiagnosticComponent, TendencyComponentComposite,
+    AdamsBashforth, SSPRungeKutta, Leapfrog, NetCDFMonitor, axpby,
+)
+
+
+@pytest.fixture
+def numpy_backend():
+    set_backend(NumpyBackend())
+    yield
+    set_backend(DataArrayBackend())
+
+
+def test_init_checks_dims():
+    with pytest.raises(ValueError):
+        QuantityArray(np.zeros((2, 3)), dims=['dim1'])
+
+
+def test_to_units():
+    quantity = QuantityArray(np.ones([3]) * 2., ['dim1'], {'units': 'km'})
+    converted = quantity.to_units('m')
+    assert isinstance(converted, QuantityArray)
+    assert converted.attrs['units'] == 'm'
+    assert np.all(converted.values == 2000.)
+    assert quantity.attrs['units'] == 'km'
+    assert np.all(quantity.values == 2.)
+    assert quantity.to_units('km') is quantity
+
+
+def test_to_units_without_units():
+    with pytest.raises(KeyError):
+        QuantityArray(np.ones([3]), ['dim1']).to_units('m')
+
+
+def test_transpose():
+    values = np.random.randn(2, 3)
+    quantity = QuantityArray(values, ['dim1', 'dim2'], {'units': 'm'})
+    transposed = quantity.transpose('dim2', 'dim1')
+    assert transposed.dims == ('dim2', 'dim1')
+    assert np.all(transposed.values == values.T)
+    assert np.shares_memory(transposed.values, values)
+    assert quantity.transpose().dims == ('dim2', 'dim1')
+
+
+def test_isel():
+    values = np.random.randn(2, 3, 4)
+    quantity = QuantityArray(values, ['dim1', 'dim2', 'dim3'], {'units': 'm'})
+    selected = quantity.isel({'dim2': 1, 'dim3': slice(0, 2)})
+    assert selected.dims == ('dim1', 'dim3')
+    assert selected.attrs == {'units': 'm'}
+    assert np.all(selected.values == values[:, 1, 0:2])
+    assert np.shares_memory(selected.values, values)
+
+
+def test_add_keeps_left_attrs_and_aligns_dims():
+    values1 = np.random.randn(2, 3)
+    values2 = np.random.randn(3, 2)
+    quantity1 = QuantityArray(values1, ['dim1', 'dim2'], {'units': 'm'})
+    quantity2 = QuantityArray(values2, ['dim2', 'dim1'], {'units': 'km'})
+    result = quantity1 + quantity2
+    assert result.dims == ('dim1', 'dim2')
+    assert result.attrs == {'units': 'm'}
+    assert result.attrs is not quantity1.attrs
+    assert np.all(result.values == values1 + values2.T)
+
+
+def test_multiply_drops_attrs():
+    quantity = QuantityArray(np.ones([3]), ['dim1'], {'units': 'm'})
+    for result in (quantity * 2., 2. * quantity, np.float64(2.) * quantity):
+        assert isinstance(result, QuantityArray)
+        assert result.attrs == {}
+        assert np.all(result.values == 2.)
+
+
+def test_broadcast_missing_dims():
+    quantity1 = QuantityArray(np.ones([2]), ['dim1'], {'units': 'm'})
+    quantity2 = QuantityArray(np.arange(3.), ['dim2'], {'units': 'm'})
+    result = quantity1 - quantity2
+    assert result.dims == ('dim1', 'dim2')
+    assert result.shape == (2, 3)
+    assert np.all(result.values == 1. - np.arange(3.)[None, :])
+
+
+def test_add_dataarray():
+    quantity = QuantityArray(np.ones((2, 3)), ['dim1', 'dim2'], {'units': 'm'})
+    data_array = DataArray(
+        np.arange(6.).reshape((3, 2)), dims=['dim2', 'dim1'],
+        attrs={'units': 'm'})
+    result = quantity + data_array
+    assert isinstance(result, QuantityArray)
+    assert np.all(result.values == 1. + data_array.values.T)
+
+
+def test_inplace_add():
+    values = np.ones((2, 3))
+    quantity = QuantityArray(values, ['dim1', 'dim2'], {'units': 'm'})
+    quantity += QuantityArray(np.ones((3, 2)), ['dim2', 'dim1'], {'units': 'm'})
+    assert quantity.values is values
+    assert np.all(values == 2.)
+    with pytest.raises(ValueError):
+        quantity += QuantityArray(np.ones([4]), ['dim3'], {'units': 'm'})
+
+
+def test_dataarray_round_trip():
+    values = np.random.randn(2, 3)
+    quantity = QuantityArray(values, ['dim1', 'dim2'], {'units': 'm'})
+    data_array = quantity.to_dataarray()
+    assert isinstance(data_array, DataArray)
+    assert data_array.dims == ('dim1', 'dim2')
+    assert data_array.attrs == {'units': 'm'}
+    assert np.shares_memory(data_array.values, values)
+    quantity2 = QuantityArray.from_dataarray(data_array)
+    assert quantity2.dims == quantity.dims
+    assert quantity2.values is data_array.values
+
+
+class MockTendencyComponent(TendencyComponent):
+
+    input_properties = {
+        'air_temperature': {'dims': ['*', 'z'], 'units': 'degK'},
+    }
+    diagnostic_properties = {
+        'doubled_temperature': {'dims': ['*', 'z'], 'units': 'degK'},
+    }
+    tendency_properties = {
+        'air_temperature': {'units': 'degK/day'},
+    }
+
+    def array_call(self, state):
+        return (
+            {'air_temperature': np.ones_like(state['air_temperature'])},
+            {'doubled_temperature': 2. * state['air_temperature']},
+        )
+
+
+class MockDiagnosticComponent(DiagnosticComponent):
+
+    input_properties = {
+        'air_temperature': {'dims': ['z', 'x'], 'units': 'degC'},
+    }
+    diagnostic_properties = {
+        'temperature_celsius': {'dims': ['z', 'x'], 'units': 'degC'},
+    }
+
+    def array_call(self, state):
+        return {'temperature_celsius': state['air_temperature'].copy()}
+
+
+def get_state(array_class=DataArray):
+    values = np.random.RandomState(0).randn(4, 3) + 280.
+    return {
+        'time': timedelta(0),
+        'air_temperature': array_class(
+            values, dims=('x', 'z'), attrs={'units': 'degK'}),
+    }
+
+
+@pytest.mark.parametrize('array_class', [DataArray, QuantityArray])
+def test_numpy_backend_component_outputs(numpy_backend, array_class):
+    state = get_state(array_class)
+    tendencies, diagnostics = MockTendencyComponent()(state)
+    assert isinstance(tendencies['air_temperature'], QuantityArray)
+    assert tendencies['air_temperature'].dims == ('x', 'z')
+    assert tendencies['air_temperature'].attrs['units'] == 'degK/day'
+    assert np.all(tendencies['air_temperature'].values == 1.)
+    assert np.all(
+        diagnostics['doubled_temperature'].values ==
+        2. * state['air_temperature'].values)
+    diagnostics = MockDiagnosticComponent()(state)
+    result = diagnostics['temperature_celsius']
+    assert isinstance(result, QuantityArray)
+    assert result.dims == ('z', 'x')
+    assert np.allclose(
+        result.values, state['air_temperature'].values.T - 273.15)
+
+
+def test_numpy_backend_composite(numpy_backend):
+    state = get_state(QuantityArray)
+    composite = TendencyComponentComposite(
+        MockTendencyComponent(), TimestepTendencyComponent())
+    tendencies, _ = composite(state)
+    assert isinstance(tendencies['air_temperature'], QuantityArray)
+    assert tendencies['air_temperature'].attrs['units'] == 'degK/day'
+    assert np.allclose(tendencies['air_temperature'].values, 1. + 86400.)
+
+
+class TimestepTendencyComponent(TendencyComponent):
+
+    input_properties = {
+        'air_temperature': {'dims': ['z', 'x'], 'units': 'degK'},
+    }
+    diagnostic_properties = {}
+    tendency_properties = {
+        'air_temperature': {'units': 'degK/s'},
+    }
+
+    def array_call(self, state):
+        return {'air_temperature': np.ones_like(state['air_temperature'])}, {}
+
+
+@pytest.mark.parametrize('stepper_class, kwargs', [
+    (AdamsBashforth, {}),
+    (AdamsBashforth, {'in_place': True}),
+    (SSPRungeKutta, {}),
+    (Leapfrog, {}),
+])
+def test_numpy_backend_matches_dataarray_backend(
+        numpy_backend, stepper_class, kwargs):
+    timestep = timedelta(hours=1)
+    results = []
+    for backend, array_class in (
+            (DataArrayBackend(), DataArray), (NumpyBackend(), QuantityArray)):
+        set_backend(backend)
+        stepper = stepper_class(
+            MockTendencyComponent(), TimestepTendencyComponent(),
+            tendencies_in_diagnostics=True, **kwargs)
+        state = get_state(array_class)
+        for _ in range(3):
+            diagnostics, state = stepper(state, timestep)
+            state['time'] += timestep
+        assert isinstance(state['air_temperature'], array_class)
+        results.append((diagnostics, state))
+    (diagnostics1, state1), (diagnostics2, state2) = results
+    assert np.allclose(
+        state1['air_temperature'].values, state2['air_temperature'].values)
+    for name in diagnostics1.keys():
+        assert isinstance(diagnostics2[name], QuantityArray)
+        assert np.allclose(
+            diagnostics1[name].transpose(*diagnostics2[name].dims).values,
+            diagnostics2[name].values)
+
+
+def test_axpby_quantity_array():
+    x = get_state(QuantityArray)
+    y = get_state(QuantityArray)
+    y['air_temperature'] = y['air_temperature'].transpose('z', 'x')
+    result = axpby(0.5, x, 0.5, y)
+    assert isinstance(result['air_temperature'], QuantityArray)
+    assert result['air_temperature'].dims == ('x', 'z')
+    assert np.allclose(
+        result['air_temperature'].values, x['air_temperature'].values)
+
+
+def test_netcdf_monitor_stores_quantity_array(tmpdir):
+    filename = os.path.join(str(tmpdir), 'out.nc')
+    monitor = NetCDFMonitor(filename)
+    state = get_state(QuantityArray)
+    monitor.store(state)
+    monitor.write()
+    dataset = xr.open_dataset(filename)
+    assert dataset['air_temperature'].dims == ('time', 'x', 'z')
+    assert dataset['air_temperature'].attrs['units'] == 'degK'
+    assert np.all(
+        dataset['air_temperature'].values[0] ==
+        state['air_temperature'].values)
+    dataset.close()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -1,8 +1,15 @@
 import pytest
-from sympl import RestartMonitor, DataArray, InvalidStateError
+import sympl
+from sympl import (
+    RestartMonitor, NetCDFMonitor, DataArray, InvalidStateError, QuantityArray)
+from sympl import datetime as sympl_datetime
 import os
+import subprocess
+import sys
+import time
 from datetime import datetime, timedelta
 import numpy as np
+import xarray as xr
 
 random = np.random.RandomState(0)
 
@@ -24,19 +31,15 @@ state = {
 }
 
 
-def test_restart_monitor_initializes():
-    restart_filename = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'restart.nc')
-    if os.path.isfile(restart_filename):
-        os.remove(restart_filename)
+def test_restart_monitor_initializes(tmpdir):
+    restart_filename = str(tmpdir.join('restart.nc'))
     assert not os.path.isfile(restart_filename)
     RestartMonitor(restart_filename)
     assert not os.path.isfile(restart_filename)  # should not create file on init
 
 
-def test_restart_monitor_stores_state():
-    restart_filename = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'restart.nc')
-    if os.path.isfile(restart_filename):
-        os.remove(restart_filename)
+def test_restart_monitor_stores_state(tmpdir):
+    restart_filename = str(tmpdir.join('restart.nc'))
     assert not os.path.isfile(restart_filename)
     monitor = RestartMonitor(restart_filename)
     assert not os.path.isfile(restart_filename)  # should not create file on init
@@ -52,5 +55,357 @@ def test_restart_monitor_stores_state():
             assert state[name].dims == loaded_state[name].dims
             assert state[name].attrs == loaded_state[name].attrs
 
+
+def assert_states_equal(state1, state2):
+    assert state1.keys() == state2.keys()
+    for name in state1.keys():
+        if name == 'time':
+            assert state1['time'] == state2['time']
+            assert type(state1['time']) == type(state2['time'])
+        else:
+            assert np.all(state1[name].values == state2[name].values)
+            assert state1[name].dims == state2[name].dims
+            assert state1[name].attrs == state2[name].attrs
+            assert state1[name].values.dtype == state2[name].values.dtype
+
+
+@pytest.mark.parametrize('time', [
+    datetime(2013, 7, 20, 1, 2, 3, 4),
+    timedelta(days=2, seconds=5, microseconds=6),
+])
+def test_restart_monitor_npy_round_trip(tmpdir, time):
+    filename = str(tmpdir.join('restart'))
+    current_state = state.copy()
+    current_state['time'] = time
+    current_state['surface_type'] = DataArray(
+        np.arange(nx, dtype=np.int32), dims=['lon'],
+        attrs={'units': '', 'flag_values': np.array([0, 1])})
+    monitor = RestartMonitor(filename, file_format='npy')
+    monitor.store(current_state)
+    assert os.path.isdir(filename)
+    loaded_state = RestartMonitor(filename).load()
+    current_state['surface_type'].attrs['flag_values'] = [0, 1]
+    assert_states_equal(current_state, loaded_state)
+
+
+def test_restart_monitor_npy_cftime(tmpdir):
+    pytest.importorskip('cftime')
+    filename = str(tmpdir.join('restart'))
+    current_state = state.copy()
+    current_state['time'] = sympl_datetime(2000, 2, 29, 6, calendar='360_day')
+    RestartMonitor(filename, file_format='npy').store(current_state)
+    assert_states_equal(
+        current_state, RestartMonitor(filename, file_format='npy').load())
+
+
+def test_restart_monitor_npy_load_is_memory_mapped(tmpdir):
+    filename = str(tmpdir.join('restart'))
+    monitor = RestartMonitor(filename, file_format='npy')
+    monitor.store(state)
+    loaded_state = monitor.load()
+    values = loaded_state['air_temperature'].values
+    assert isinstance(values, np.memmap) or isinstance(values.base, np.memmap)
+    # loaded arrays can be modified without modifying the restart data
+    values[:] = 0.
+    assert np.all(
+        monitor.load()['air_temperature'].values ==
+        state['air_temperature'].values)
+
+
+def test_restart_monitor_npy_replaces_existing(tmpdir):
+    filename = str(tmpdir.join('restart'))
+    monitor = RestartMonitor(filename, file_format='npy')
+    monitor.store(state)
+    current_state = {
+        'time': datetime(2013, 7, 21),
+        'air_pressure': QuantityArray(
+            np.ones((nx, nz)), dims=['lon', 'mid_levels'],
+            attrs={'units': 'Pa'}),
+    }
+    monitor.store(current_state)
+    assert sorted(os.listdir(str(tmpdir))) == ['restart']
+    loaded_state = monitor.load()
+    assert list(sorted(loaded_state.keys())) == ['air_pressure', 'time']
+    assert loaded_state['time'] == current_state['time']
+    assert np.all(loaded_state['air_pressure'].values == 1.)
+
+
+def test_restart_monitor_npy_raises_for_non_quantity(tmpdir):
+    current_state = state.copy()
+    current_state['counter'] = 5
+    with pytest.raises(TypeError):
+        RestartMonitor(
+            str(tmpdir.join('restart')), file_format='npy').store(current_state)
+    assert os.listdir(str(tmpdir)) == []
+
+
+def test_restart_monitor_invalid_format():
+    with pytest.raises(ValueError):
+        RestartMonitor('restart', file_format='hdf5')
+
+
+def test_restart_monitor_netcdf_load_lazy(tmpdir):
+    filename = str(tmpdir.join('restart.nc'))
+    monitor = RestartMonitor(filename)
+    monitor.store(state)
+    loaded_state = monitor.load(lazy=True)
+    for name in ('air_temperature', 'air_pressure'):
+        assert not loaded_state[name].variable._in_memory
+    assert np.all(
+        loaded_state['air_pressure'].values == state['air_pressure'].values)
+    assert loaded_state['air_pressure'].variable._in_memory
+    assert not loaded_state['air_temperature'].variable._in_memory
+    loaded_state['air_pressure'].values[:] = 0.
+    assert np.all(loaded_state['air_pressure'].values == 0.)
+
+
+def get_open_paths():
+    fd_folder = '/proc/self/fd'
+    paths = []
+    for fd in os.listdir(fd_folder):
+        try:
+            paths.append(os.readlink(os.path.join(fd_folder, fd)))
+        except OSError:
+            pass
+    return paths
+
+
+@pytest.mark.skipif(
+    not os.path.isdir('/proc/self/fd'), reason='cannot list open files')
+def test_restart_monitor_close_closes_lazy_netcdf_file(tmpdir):
+    filename = str(tmpdir.join('restart.nc'))
+    with RestartMonitor(filename) as monitor:
+        monitor.store(state)
+        loaded_state = monitor.load(lazy=True)
+        assert os.path.realpath(filename) in get_open_paths()
+        assert np.all(
+            loaded_state['air_pressure'].values == state['air_pressure'].values)
+    assert os.path.realpath(filename) not in get_open_paths()
+
+
+def test_restart_monitor_netcdf_load_eager(tmpdir):
+    filename = str(tmpdir.join('restart.nc'))
+    monitor = RestartMonitor(filename)
+    monitor.store(state)
+    loaded_state = monitor.load()
+    os.remove(filename)
+    for name in ('air_temperature', 'air_pressure'):
+        assert loaded_state[name].variable._in_memory
+        assert np.all(loaded_state[name].values == state[name].values)
+
+
+def test_restart_monitor_npy_load_eager(tmpdir):
+    filename = str(tmpdir.join('restart'))
+    monitor = RestartMonitor(filename, file_format='npy')
+    monitor.store(state)
+    loaded_state = monitor.load(lazy=False)
+    values = loaded_state['air_temperature'].values
+    assert not isinstance(values, np.memmap)
+    assert not isinstance(values.base, np.memmap)
+    assert np.all(values == state['air_temperature'].values)
+
+
+def get_object_files(filename):
+    objects_dir = os.path.join(filename, 'objects')
+    return {
+        name: os.stat(os.path.join(objects_dir, name)).st_mtime_ns
+        for name in os.listdir(objects_dir)}
+
+
+def test_restart_monitor_incremental_writes_changed_arrays(tmpdir):
+    filename = str(tmpdir.join('restart'))
+    monitor = RestartMonitor(filename, file_format='npy', incremental=True)
+    current_state = state.copy()
+    monitor.store(current_state)
+    old_files = get_object_files(filename)
+    assert len(old_files) == 2
+    current_state['time'] = datetime(2013, 7, 21)
+    current_state['air_temperature'] = current_state['air_temperature'] + 1.
+    monitor.store(current_state)
+    new_files = get_object_files(filename)
+    assert len(new_files) == 2
+    unchanged_files = set(old_files).intersection(new_files)
+    assert len(unchanged_files) == 1
+    for name in unchanged_files:
+        assert new_files[name] == old_files[name]
+    assert_states_equal(current_state, monitor.load(lazy=False))
+    assert monitor.compact() == 0
+
+
+def test_restart_monitor_incremental_identical_arrays(tmpdir):
+    filename = str(tmpdir.join('restart'))
+    monitor = RestartMonitor(filename, file_format='npy', incremental=True)
+    current_state = state.copy()
+    current_state['air_pressure'] = current_state['air_temperature'].copy()
+    current_state['air_pressure'].attrs['units'] = 'Pa'
+    monitor.store(current_state)
+    assert len(get_object_files(filename)) == 1
+    del current_state['air_pressure']
+    monitor.store(current_state)
+    assert len(get_object_files(filename)) == 1
+    assert_states_equal(current_state, monitor.load())
+
+
+def test_restart_monitor_incremental_replaces_full_checkpoint(tmpdir):
+    filename = str(tmpdir.join('restart'))
+    RestartMonitor(filename, file_format='npy').store(state)
+    monitor = RestartMonitor(filename, file_format='npy', incremental=True)
+    monitor.store(state)
+    assert sorted(os.listdir(filename)) == ['manifest.json', 'objects']
+    assert_states_equal(state, monitor.load())
+
+
+def test_restart_monitor_incremental_replaces_netcdf_file(tmpdir):
+    filename = str(tmpdir.join('restart'))
+    RestartMonitor(filename).store(state)
+    monitor = RestartMonitor(filename, file_format='npy', incremental=True)
+    monitor.store(state)
+    assert os.path.isdir(filename)
+    assert_states_equal(state, monitor.load())
+
+
+def test_restart_monitor_compact_removes_unused_files(tmpdir):
+    filename = str(tmpdir.join('restart'))
+    monitor = RestartMonitor(filename, file_format='npy', incremental=True)
+    monitor.store(state)
+    # as left by a store interrupted before its manifest was written
+    for name in ('0' * 40 + '.npy', '1' * 40 + '.npy.tmp'):
+        with open(os.path.join(filename, 'objects', name), 'w') as f:
+            f.write('')
+    assert monitor.compact() == 2
+    assert len(get_object_files(filename)) == 2
+    assert_states_equal(state, monitor.load())
+
+
+def test_restart_monitor_incremental_requires_npy():
+    with pytest.raises(ValueError):
+        RestartMonitor('restart', incremental=True)
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'file_format': 'netcdf'},
+    {'file_format': 'npy'},
+    {'file_format': 'npy', 'incremental': True},
+])
+def test_restart_monitor_background_stores_snapshot(tmpdir, kwargs):
+    filename = str(tmpdir.join('restart'))
+    monitor = RestartMonitor(filename, write_in_background=True, **kwargs)
+    current_state = {
+        name: value.copy() if name != 'time' else value
+        for name, value in state.items()}
+    for i in range(3):
+        current_state['time'] = datetime(2013, 7, 20, i)
+        monitor.store(current_state)
+        expected_state = {
+            name: value.copy() if name != 'time' else value
+            for name, value in current_state.items()}
+        # changes after store returns are not written
+        current_state['air_temperature'].values[:] += 1.
+    loaded_state = monitor.load(lazy=False)
+    assert loaded_state['time'] == expected_state['time']
+    for name in ('air_temperature', 'air_pressure'):
+        assert np.all(loaded_state[name].values == expected_state[name].values)
+    assert sorted(os.listdir(str(tmpdir))) == ['restart']
+
+
+def test_restart_monitor_background_one_store_in_flight(tmpdir):
+    filename = str(tmpdir.join('restart'))
+    monitor = RestartMonitor(
+        filename, file_format='npy', write_in_background=True)
+    n_writing = [0]
+    max_writing = [0]
+    store = monitor._store
+
+    def counting_store(state):
+        n_writing[0] += 1
+        max_writing[0] = max(max_writing[0], n_writing[0])
+        try:
+            time.sleep(0.01)
+            return store(state)
+        finally:
+            n_writing[0] -= 1
+
+    monitor._store = counting_store
+    for _ in range(3):
+        monitor.store(state)
+    monitor.wait()
+    assert max_writing[0] == 1
+    assert n_writing[0] == 0
+
+
+def test_restart_monitor_background_raises_on_next_call(tmpdir):
+    filename = str(tmpdir.join('restart'))
+    monitor = RestartMonitor(
+        filename, file_format='npy', write_in_background=True)
+    current_state = state.copy()
+    current_state['counter'] = 5
+    monitor.store(current_state)
+    with pytest.raises(TypeError):
+        monitor.wait()
+    assert os.listdir(str(tmpdir)) == []
+    monitor.store(state)
+    assert_states_equal(state, monitor.load())
+
+
+@pytest.mark.parametrize('file_format', ['netcdf', 'npy'])
+def test_restart_monitor_background_writes_state_at_exit(tmpdir, file_format):
+    filename = str(tmpdir.join('restart'))
+    script = '''
+import sys
+from datetime import datetime
+import numpy as np
+from sympl import RestartMonitor, DataArray
+monitor = RestartMonitor(
+    sys.argv[1], file_format=sys.argv[2], write_in_background=True)
+monitor.store({
+    'time': datetime(2013, 7, 20),
+    'air_temperature': DataArray(
+        np.full((1000000,), 2.), dims=['x'], attrs={'units': 'degK'}),
+})
+'''
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.path.dirname(os.path.dirname(sympl.__file__))] +
+        [path for path in [env.get('PYTHONPATH')] if path])
+    subprocess.check_call(
+        [sys.executable, '-c', script, filename, file_format], env=env)
+    loaded_state = RestartMonitor(filename).load(lazy=False)
+    assert loaded_state['time'] == datetime(2013, 7, 20)
+    assert np.all(loaded_state['air_temperature'].values == 2.)
+
+
+def test_restart_monitor_background_netcdf_with_foreground_netcdf(tmpdir):
+    filename = str(tmpdir.join('restart.nc'))
+    monitor = RestartMonitor(filename, write_in_background=True)
+    output_filename = str(tmpdir.join('out.nc'))
+    netcdf_monitor = NetCDFMonitor(output_filename, write_on_store=True)
+    current_state = state.copy()
+    for i in range(10):
+        current_state['time'] = datetime(2013, 7, 20, i)
+        current_state['air_temperature'] = state['air_temperature'] + i
+        monitor.store(current_state)
+        netcdf_monitor.store(current_state)
+        if i > 0:
+            # lazily read the previous restart file while writing the next
+            loaded_state = RestartMonitor(filename).load(lazy=True)
+            assert loaded_state['air_pressure'].shape == (nx, ny, nz)
+    loaded_state = monitor.load(lazy=False)
+    assert loaded_state['time'] == datetime(2013, 7, 20, 9)
+    assert np.all(
+        loaded_state['air_temperature'].values ==
+        state['air_temperature'].values + 9)
+    with xr.open_dataset(output_filename) as ds:
+        assert len(ds['time']) == 10
+
+
+def test_restart_monitor_load_during_directory_replace(tmpdir):
+    filename = str(tmpdir.join('restart'))
+    monitor = RestartMonitor(filename, file_format='npy')
+    monitor.store(state)
+    # as between the renames when a directory is replaced
+    os.rename(filename, filename + '.old')
+    assert_states_equal(state, monitor.load(lazy=False))
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
@@ -0,0 +1,266 @@
+import pytest
+import numpy as np
+from datetime import timedelta
+from sympl import (
+    TendencyComponent, DiagnosticComponent, ImplicitTendencyComponent,
+    Monitor, TendencyComponentComposite, DiagnosticComponentComposite,
+    ImplicitTendencyComponentComposite, MonitorComposite, DataArray,
+)
+from sympl._core.shared_memory import SharedMemoryExecutor
+
+
+class MockTendencyComponent(TendencyComponent):
+
+    input_properties = {'input1': {'dims': ['*'], 'units': 'm'}}
+    diagnostic_properties = {}
+    tendency_properties = {'input1': {'dims': ['*'], 'units': 'm/s'}}
+
+    def __init__(self, factor, diagnostic_name=None):
+        self.factor = factor
+        self.diagnostic_properties = {}
+        if diagnostic_name is not None:
+            self.diagnostic_properties[diagnostic_name] = {
+                'dims': ['*'], 'units': 'm'}
+        self.diagnostic_name = diagnostic_name
+        super(MockTendencyComponent, self).__init__()
+
+    def array_call(self, state):
+        diagnostics = {}
+        if self.diagnostic_name is not None:
+            diagnostics[self.diagnostic_name] = state['input1'] + self.factor
+        return {'input1': state['input1'] * self.factor}, diagnostics
+
+
+class MockCountingTendencyComponent(TendencyComponent):
+
+    input_properties = {'input1': {'dims': ['*'], 'units': 'm'}}
+    diagnostic_properties = {}
+    tendency_properties = {'input1': {'dims': ['*'], 'units': 'm/s'}}
+
+    def __init__(self):
+        self.times_called = 0
+        super(MockCountingTendencyComponent, self).__init__()
+
+    def array_call(self, state):
+        self.times_called += 1
+        return {'input1': np.zeros_like(state['input1']) + self.times_called}, {}
+
+
+class MockInPlaceTendencyComponent(TendencyComponent):
+
+    input_properties = {'input1': {'dims': ['*'], 'units': 'm'}}
+    diagnostic_properties = {}
+    tendency_properties = {'input1': {'dims': ['*'], 'units': 'm/s'}}
+
+    def array_call(self, state):
+        state['input1'][:] = 0.
+        return {'input1': state['input1']}, {}
+
+
+class MockPreallocatedTendencyComponent(TendencyComponent):
+
+    input_properties = {'input1': {'dims': ['*'], 'units': 'm'}}
+    diagnostic_properties = {'diag1': {'dims': ['*'], 'units': 'm'}}
+    tendency_properties = {'input1': {'dims': ['*'], 'units': 'm/s'}}
+    preallocate_outputs = True
+
+    def array_call(self, state, out_tendencies, out_diagnostics):
+        np.multiply(state['input1'], 2., out=out_tendencies['input1'])
+        np.add(state['input1'], 1., out=out_diagnostics['diag1'])
+        return out_tendencies, out_diagnostics
+
+
+class MockImplicitTendencyComponent(ImplicitTendencyComponent):
+
+    input_properties = {'input1': {'dims': ['*'], 'units': 'm'}}
+    diagnostic_properties = {}
+    tendency_properties = {'input1': {'dims': ['*'], 'units': 'm/s'}}
+
+    def array_call(self, state, timestep):
+        return {
+            'input1': np.zeros_like(state['input1']) +
+            timestep.total_seconds()}, {}
+
+
+class MockDiagnosticComponent(DiagnosticComponent):
+
+    input_properties = {'input1': {'dims': ['*'], 'units': 'km'}}
+    diagnostic_properties = {}
+
+    def __init__(self, diagnostic_name):
+        self.diagnostic_name = diagnostic_name
+        self.diagnostic_properties = {
+            diagnostic_name: {'dims': ['*'], 'units': 'km'}}
+        super(MockDiagnosticComponent, self).__init__()
+
+    def array_call(self, state):
+        return {self.diagnostic_name: state['input1'] * 2.}
+
+
+class MockMonitor(Monitor):
+
+    def store(self, state):
+        return
+
+
+def get_state(shape=(4, 3)):
+    np.random.seed(0)
+    return {
+        'time': timedelta(0),
+        'input1': DataArray(
+            np.random.randn(*shape), dims=['dim1', 'dim2'][:len(shape)],
+            attrs={'units': 'm'}),
+    }
+
+
+@pytest.fixture
+def composite_list():
+    composites = []
+    yield composites
+    for composite in composites:
+        composite.shutdown()
+
+
+def test_process_executor_matches_sequential(composite_list):
+    components = [
+        MockTendencyComponent(1., 'diag1'),
+        MockTendencyComponent(2., 'diag2'),
+        MockTendencyComponent(3.),
+    ]
+    sequential = TendencyComponentComposite(*components)
+    process = TendencyComponentComposite(
+        *components, executor='process', max_workers=2)
+    composite_list.append(process)
+    state = get_state()
+    expected_tendencies, expected_diagnostics = sequential(state)
+    for _ in range(3):
+        tendencies, diagnostics = process(state)
+        assert np.all(
+            tendencies['input1'].values == expected_tendencies['input1'].values)
+        assert tendencies['input1'].dims == ('dim1', 'dim2')
+        assert tendencies['input1'].attrs['units'] == 'm/s'
+        assert list(diagnostics.keys()) == ['diag1', 'diag2']
+        for name in ('diag1', 'diag2'):
+            assert np.all(
+                diagnostics[name].values == expected_diagnostics[name].values)
+
+
+def test_process_executor_reuses_shared_output_buffers(composite_list):
+    composite = TendencyComponentComposite(
+        MockTendencyComponent(2.), executor='process')
+    composite_list.append(composite)
+    state = get_state()
+    composite(state)
+    executor = composite.executor
+    assert isinstance(executor, SharedMemoryExecutor)
+    descriptor = executor._output_arrays[0][(0, 'input1')].descriptor
+    tendencies, _ = composite(state)
+    assert executor._output_arrays[0][(0, 'input1')].descriptor == descriptor
+    assert np.all(tendencies['input1'].values == state['input1'].values * 2.)
+    # returned arrays must not alias the reused buffer
+    assert not np.shares_memory(
+        tendencies['input1'].values,
+        executor._output_arrays[0][(0, 'input1')].array)
+
+
+def test_process_executor_preallocated_outputs_written_to_shared_memory(
+        composite_list):
+    composite = TendencyComponentComposite(
+        MockPreallocatedTendencyComponent(), executor='process')
+    composite_list.append(composite)
+    for shape in ((4, 3), (4, 3), (4, 3), (5,), (5,)):
+        state = get_state(shape)
+        tendencies, diagnostics = composite(state)
+        assert tendencies['input1'].dims == state['input1'].dims
+        assert np.all(tendencies['input1'].values == state['input1'].values * 2.)
+        assert np.all(diagnostics['diag1'].values == state['input1'].values + 1.)
+    output_arrays = composite.executor._output_arrays[0]
+    assert sorted(output_arrays.keys()) == [('pool', 0), ('pool', 1)]
+    # the worker wrote the outputs into the buffers given to array_call
+    buffers = [output_arrays[key].array for key in sorted(output_arrays)]
+    assert any(
+        np.all(buffer == tendencies['input1'].values) for buffer in buffers)
+    assert any(
+        np.all(buffer == diagnostics['diag1'].values) for buffer in buffers)
+    for buffer in buffers:
+        assert not np.shares_memory(tendencies['input1'].values, buffer)
+
+
+def test_process_executor_handles_shape_change(composite_list):
+    composite = TendencyComponentComposite(
+        MockTendencyComponent(2.), executor='process')
+    composite_list.append(composite)
+    composite(get_state((4, 3)))
+    composite(get_state((4, 3)))
+    state = get_state((5,))
+    tendencies, _ = composite(state)
+    assert tendencies['input1'].shape == (5,)
+    assert np.all(tendencies['input1'].values == state['input1'].values * 2.)
+    tendencies, _ = composite(state)
+    assert np.all(tendencies['input1'].values == state['input1'].values * 2.)
+
+
+def test_process_executor_calls_each_component_in_one_worker(composite_list):
+    composite = TendencyComponentComposite(
+        MockCountingTendencyComponent(),
+        MockCountingTendencyComponent(),
+        MockCountingTendencyComponent(),
+        executor='process', max_workers=2)
+    composite_list.append(composite)
+    state = get_state()
+    for i in range(1, 4):
+        tendencies, _ = composite(state)
+        assert np.all(tendencies['input1'].values == 3 * i)
+
+
+def test_process_executor_inputs_are_read_only(composite_list):
+    composite = TendencyComponentComposite(
+        MockInPlaceTendencyComponent(), executor='process')
+    composite_list.append(composite)
+    state = get_state()
+    with pytest.raises(ValueError):
+        composite(state)
+    assert not np.all(state['input1'].values == 0.)
+
+
+def test_process_executor_implicit_composite(composite_list):
+    composite = ImplicitTendencyComponentComposite(
+        MockImplicitTendencyComponent(), MockTendencyComponent(0.),
+        executor='process')
+    composite_list.append(composite)
+    tendencies, _ = composite(get_state(), timedelta(seconds=30))
+    assert np.all(tendencies['input1'].values == 30.)
+
+
+def test_process_executor_diagnostic_composite(composite_list):
+    composite = DiagnosticComponentComposite(
+        MockDiagnosticComponent('diag1'), MockDiagnosticComponent('diag2'),
+        executor='process')
+    composite_list.append(composite)
+    state = get_state()
+    for _ in range(2):
+        diagnostics = composite(state)
+        for name in ('diag1', 'diag2'):
+            assert diagnostics[name].attrs['units'] == 'km'
+            assert np.allclose(
+                diagnostics[name].values, state['input1'].values * 2e-3)
+
+
+def test_process_executor_restarts_on_new_component_list(composite_list):
+    composite = TendencyComponentComposite(
+        MockTendencyComponent(2.), executor='process')
+    composite_list.append(composite)
+    state = get_state()
+    composite(state)
+    composite.component_list = (MockTendencyComponent(5.),)
+    tendencies, _ = composite(state)
+    assert np.all(tendencies['input1'].values == state['input1'].values * 5.)
+
+
+def test_monitor_composite_does_not_allow_process_executor():
+    with pytest.raises(ValueError):
+        MonitorComposite(MockMonitor(), executor='process')
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
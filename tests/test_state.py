@@ -1,6 +1,8 @@
 import unittest
-from sympl import initialize_numpy_arrays_with_properties, DataArray
+from sympl import initialize_numpy_arrays_with_properties, DataArray, axpby
 import numpy as np
+from datetime import timedelta
+from sympl._core.init_np_arrays import ArrayPool
 
 
 class InitializeNumpyArraysWithPropertiesTests(unittest.TestCase):
@@ -224,3 +226,155 @@ class InitializeNumpyArraysWithPropertiesTests(unittest.TestCase):
         assert 'output1' in result.keys()
         assert result['output1'].shape == (10,)
         assert np.all(result['output1'] == np.zeros([10]))
+
+
+class ArrayPoolTests(unittest.TestCase):
+
+    def test_reuses_arrays_after_reset(self):
+        pool = ArrayPool()
+        array1 = pool.get((3, 4))
+        array2 = pool.get((3, 4))
+        assert array1 is not array2
+        assert np.all(array1 == 0.)
+        pool.reset()
+        assert pool.get((3, 4)) is array1
+        assert pool.get((3, 4)) is array2
+        assert len(pool) == 2
+
+    def test_keys_on_shape_and_dtype(self):
+        pool = ArrayPool()
+        array = pool.get((3,), np.float64)
+        pool.reset()
+        assert pool.get((4,), np.float64) is not array
+        assert pool.get((3,), np.float32).dtype == np.float32
+        assert pool.get((3,), np.float64) is array
+
+    def test_reset_excludes_arrays_sharing_memory(self):
+        pool = ArrayPool()
+        array = pool.get((3, 4))
+        pool.reset(exclude=[array.T, 'not an array'])
+        assert pool.get((3, 4)) is not array
+        pool.reset()
+        assert pool.get((3, 4)) is array
+
+    def test_initialize_with_pool(self):
+        pool = ArrayPool()
+        output_properties = {'output1': {'dims': ['dim1'], 'units': 'm'}}
+        input_properties = {'input1': {'dims': ['dim1'], 'units': 'm'}}
+        input_state = {'input1': np.zeros([10])}
+        result1 = initialize_numpy_arrays_with_properties(
+            output_properties, input_state, input_properties, pool=pool)
+        pool.reset()
+        result2 = initialize_numpy_arrays_with_properties(
+            output_properties, input_state, input_properties, pool=pool)
+        assert result2['output1'] is result1['output1']
+        assert result2['output1'].shape == (10,)
+
+
+class AxpbyTests(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        self.x = {
+            'time': timedelta(hours=1),
+            'quantity1': DataArray(
+                np.random.randn(3, 4), dims=['dim1', 'dim2'],
+                attrs={'units': 'm'}),
+            'quantity2': np.random.randn(5),
+            'quantity3': 2.,
+        }
+        self.y = {
+            'time': timedelta(hours=2),
+            'quantity1': DataArray(
+                np.random.randn(3, 4), dims=['dim1', 'dim2'],
+                attrs={'units': 'm'}),
+            'quantity2': np.random.randn(5),
+            'quantity3': 3.,
+        }
+
+    def assert_result(self, result, x_values, y_values, a, b):
+        assert result['time'] == timedelta(hours=1)
+        for key in ('quantity1', 'quantity2', 'quantity3'):
+            assert np.allclose(
+                np.asarray(result[key]),
+                a * np.asarray(x_values[key]) + b * np.asarray(y_values[key]))
+
+    def test_new_state(self):
+        x_values = {key: np.array(value) for key, value in self.x.items()}
+        y_values = {key: np.array(value) for key, value in self.y.items()}
+        result = axpby(0.75, self.x, 0.25, self.y)
+        self.assert_result(result, x_values, y_values, 0.75, 0.25)
+        assert isinstance(result['quantity1'], DataArray)
+        assert result['quantity1'].dims == ('dim1', 'dim2')
+        assert result['quantity1'].attrs == {'units': 'm'}
+        for key in ('quantity1', 'quantity2'):
+            assert np.all(np.asarray(self.x[key]) == x_values[key])
+            assert np.all(np.asarray(self.y[key]) == y_values[key])
+
+    def test_out_is_y(self):
+        x_values = {key: np.array(value) for key, value in self.x.items()}
+        y_values = {key: np.array(value) for key, value in self.y.items()}
+        y_array = self.y['quantity1'].values
+        result = axpby(1./3, self.x, 2./3, self.y, out=self.y)
+        assert result is self.y
+        assert result['quantity1'].values is y_array
+        self.assert_result(result, x_values, y_values, 1./3, 2./3)
+
+    def test_out_is_x(self):
+        x_values = {key: np.array(value) for key, value in self.x.items()}
+        y_values = {key: np.array(value) for key, value in self.y.items()}
+        x_array = self.x['quantity1'].values
+        result = axpby(1./3, self.x, 2./3, self.y, out=self.x)
+        assert result['quantity1'].values is x_array
+        self.assert_result(result, x_values, y_values, 1./3, 2./3)
+
+    def test_out_is_x_and_y(self):
+        x_values = {key: np.array(value) for key, value in self.x.items()}
+        result = axpby(0.5, self.x, 0.25, self.x, out=self.x)
+        self.assert_result(result, x_values, x_values, 0.5, 0.25)
+
+    def test_zero_coefficients(self):
+        x_values = {key: np.array(value) for key, value in self.x.items()}
+        y_values = {key: np.array(value) for key, value in self.y.items()}
+        for a, b in ((0., 2.), (2., 0.)):
+            result = axpby(a, self.x, b, self.y)
+            self.assert_result(result, x_values, y_values, a, b)
+        result = axpby(0., self.x, 2., self.y, out=self.y)
+        self.assert_result(result, x_values, y_values, 0., 2.)
+
+    def test_transposed_y(self):
+        y = self.y.copy()
+        y['quantity1'] = self.y['quantity1'].transpose()
+        result = axpby(0.5, self.x, 0.5, y)
+        assert result['quantity1'].dims == ('dim1', 'dim2')
+        assert np.allclose(
+            result['quantity1'].values,
+            0.5 * (self.x['quantity1'].values + self.y['quantity1'].values))
+
+    def test_transposed_y_is_out(self):
+        x = {
+            'quantity1': DataArray(
+                np.random.randn(3, 4), dims=['dim1', 'dim2'],
+                attrs={'units': 'm'}),
+        }
+        y = {
+            'quantity1': DataArray(
+                np.random.randn(4, 3), dims=['dim2', 'dim1'],
+                attrs={'units': 'm'}),
+        }
+        expected = 0.5 * x['quantity1'].values + 2. * y['quantity1'].values.T
+        y_array = y['quantity1'].values
+        result = axpby(0.5, x, 2., y, out=y)
+        assert result['quantity1'].values is y_array
+        assert result['quantity1'].dims == ('dim2', 'dim1')
+        assert np.allclose(result['quantity1'].values.T, expected)
+
+    def test_matches_expression_rounding(self):
+        x_array = np.random.randn(100)
+        y_array = np.random.randn(100)
+        for out in (None, 'x', 'y'):
+            x = {'quantity': x_array.copy()}
+            y = {'quantity': y_array.copy()}
+            result = axpby(0.1, x, 0.7, y, out={'x': x, 'y': y}.get(out))
+            assert np.array_equal(
+                result['quantity'], 0.1 * x_array + 0.7 * y_array)
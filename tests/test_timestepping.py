@@ -2,7 +2,7 @@ import pytest
 import mock
 from sympl import (
     TendencyComponent, Leapfrog, AdamsBashforth, DataArray, SSPRungeKutta, timedelta,
-    InvalidPropertyDictError, ImplicitTendencyComponent)
+    InvalidPropertyDictError, ImplicitTendencyComponent, InvalidStateError)
 from sympl._core.units import units_are_compatible
 import numpy as np
 import warnings
@@ -202,6 +202,41 @@ class PrognosticBase(object):
         assert units_are_compatible(diagnostics[tendency_name].attrs['units'], 'm s^-1')
         assert np.allclose(diagnostics[tendency_name].values, 2.)
 
+    def test_tendencies_in_diagnostics_input_units_alias(self):
+        input_properties = {
+            'output1': {
+                'dims': ['dim1'],
+                'units': 'degK'
+            }
+        }
+        diagnostic_properties = {}
+        tendency_properties = {
+            'output1': {
+                'dims': ['dim1'],
+                'units': 'K/s'
+            }
+        }
+        prognostic = self.prognostic_class(
+            input_properties, diagnostic_properties, tendency_properties,
+            {}, {'output1': np.ones([10]) * 2.}
+        )
+        stepper = self.timestepper_class(
+            prognostic, tendencies_in_diagnostics=True)
+        assert units_are_compatible(
+            stepper.output_properties['output1']['units'], 'degK')
+        assert stepper.output_properties is stepper.output_properties
+        state = {
+            'time': timedelta(0),
+            'output1': DataArray(
+                np.ones([10])*10.,
+                dims=['dim1'],
+                attrs={'units': 'degK'}
+            ),
+        }
+        diagnostics, _ = stepper(state, timedelta(seconds=5))
+        tendency_name = 'output1_tendency_from_{}'.format(stepper.__class__.__name__)
+        assert np.allclose(diagnostics[tendency_name].values, 2.)
+
     def test_tendencies_in_diagnostics_one_tendency_with_component_name(self):
         input_properties = {}
         diagnostic_properties = {}
@@ -823,6 +858,70 @@ class TestAdamsBashforthFourthOrderImplicitPrognostic(TimesteppingBase, Implicit
         return AdamsBashforth(*args, **kwargs)
 
 
+class TestAdamsBashforthFirstOrderInPlace(TimesteppingBase, PrognosticBase):
+
+    def timestepper_class(self, *args, **kwargs):
+        kwargs['order'] = 1
+        kwargs['in_place'] = True
+        return AdamsBashforth(*args, **kwargs)
+
+
+class TestAdamsBashforthFirstOrderInPlaceImplicitPrognostic(TimesteppingBase, ImplicitPrognosticBase):
+
+    def timestepper_class(self, *args, **kwargs):
+        kwargs['order'] = 1
+        kwargs['in_place'] = True
+        return AdamsBashforth(*args, **kwargs)
+
+
+class TestAdamsBashforthSecondOrderInPlace(TimesteppingBase, PrognosticBase):
+
+    def timestepper_class(self, *args, **kwargs):
+        kwargs['order'] = 2
+        kwargs['in_place'] = True
+        return AdamsBashforth(*args, **kwargs)
+
+
+class TestAdamsBashforthSecondOrderInPlaceImplicitPrognostic(TimesteppingBase, ImplicitPrognosticBase):
+
+    def timestepper_class(self, *args, **kwargs):
+        kwargs['order'] = 2
+        kwargs['in_place'] = True
+        return AdamsBashforth(*args, **kwargs)
+
+
+class TestAdamsBashforthThirdOrderInPlace(TimesteppingBase, PrognosticBase):
+
+    def timestepper_class(self, *args, **kwargs):
+        kwargs['order'] = 3
+        kwargs['in_place'] = True
+        return AdamsBashforth(*args, **kwargs)
+
+
+class TestAdamsBashforthThirdOrderInPlaceImplicitPrognostic(TimesteppingBase, ImplicitPrognosticBase):
+
+    def timestepper_class(self, *args, **kwargs):
+        kwargs['order'] = 3
+        kwargs['in_place'] = True
+        return AdamsBashforth(*args, **kwargs)
+
+
+class TestAdamsBashforthFourthOrderInPlace(TimesteppingBase, PrognosticBase):
+
+    def timestepper_class(self, *args, **kwargs):
+        kwargs['order'] = 4
+        kwargs['in_place'] = True
+        return AdamsBashforth(*args, **kwargs)
+
+
+class TestAdamsBashforthFourthOrderInPlaceImplicitPrognostic(TimesteppingBase, ImplicitPrognosticBase):
+
+    def timestepper_class(self, *args, **kwargs):
+        kwargs['order'] = 4
+        kwargs['in_place'] = True
+        return AdamsBashforth(*args, **kwargs)
+
+
 @mock.patch.object(MockEmptyTendencyComponent, '__call__')
 def test_leapfrog_float_two_steps_filtered(mock_prognostic_call):
     """Test that the Asselin filter is being correctly applied"""
@@ -925,5 +1024,95 @@ def test_leapfrog_array_two_steps_filtered_williams(mock_prognostic_call):
     assert (new_state['air_temperature'] == np.ones((3, 3))*276.5).all()
 
 
+class MockSequenceTendencyComponent(TendencyComponent):
+    """Returns the next tendency in a list each time it is called."""
+
+    input_properties = {'air_temperature': {'dims': ['lat', 'lon'], 'units': 'K'}}
+    diagnostic_properties = {}
+    tendency_properties = {
+        'air_temperature': {'dims': ['lon', 'lat'], 'units': 'K/day'}}
+
+    def __init__(self, tendencies):
+        self.tendencies = list(tendencies)
+        super(MockSequenceTendencyComponent, self).__init__()
+
+    def array_call(self, state):
+        return {'air_temperature': self.tendencies.pop(0)}, {}
+
+
+@pytest.mark.parametrize('order', [1, 2, 3, 4])
+def test_adams_bashforth_in_place_matches_default(order):
+    np.random.seed(0)
+    tendencies = [np.random.randn(4, 3) for _ in range(7)]
+    initial_state = {
+        'time': timedelta(0),
+        'air_temperature': DataArray(
+            np.random.randn(3, 4) + 280., dims=['lat', 'lon'],
+            attrs={'units': 'degK'}),
+    }
+    default_stepper = AdamsBashforth(
+        MockSequenceTendencyComponent(tendencies), order=order)
+    in_place_stepper = AdamsBashforth(
+        MockSequenceTendencyComponent(tendencies), order=order, in_place=True)
+    timestep = timedelta(hours=1)
+    default_state = initial_state
+    in_place_state = initial_state
+    output_arrays = []
+    for _ in range(len(tendencies)):
+        _, default_state = default_stepper(default_state, timestep)
+        _, in_place_state = in_place_stepper(in_place_state, timestep)
+        default_state['time'] += timestep
+        in_place_state['time'] += timestep
+        result = in_place_state['air_temperature']
+        assert result.dims == ('lat', 'lon')
+        assert result.attrs['units'] == 'degK'
+        assert np.allclose(
+            result.values, default_state['air_temperature'].values,
+            rtol=0, atol=1e-12)
+        output_arrays.append(result.values)
+    assert np.all(
+        initial_state['air_temperature'].values != output_arrays[0])
+    # outputs alternate between two preallocated arrays
+    assert output_arrays[0] is output_arrays[2]
+    assert output_arrays[1] is output_arrays[3]
+    assert output_arrays[0] is not output_arrays[1]
+
+
+def test_adams_bashforth_in_place_does_not_modify_input_state():
+    np.random.seed(0)
+    state = {
+        'time': timedelta(0),
+        'air_temperature': DataArray(
+            np.random.randn(3, 4), dims=['lat', 'lon'], attrs={'units': 'K'}),
+    }
+    original_values = state['air_temperature'].values.copy()
+    stepper = AdamsBashforth(
+        MockSequenceTendencyComponent(
+            [np.random.randn(4, 3) for _ in range(3)]),
+        order=2, in_place=True)
+    _, new_state = stepper(state, timedelta(hours=1))
+    _, newer_state = stepper(new_state, timedelta(hours=1))
+    _, _ = stepper(state, timedelta(hours=1))
+    assert np.all(state['air_temperature'].values == original_values)
+    assert not np.shares_memory(
+        newer_state['air_temperature'].values, new_state['air_temperature'].values)
+
+
+def test_adams_bashforth_in_place_requires_constant_shape():
+    stepper = AdamsBashforth(
+        MockSequenceTendencyComponent([np.ones((4, 3)), np.ones((5, 3))]),
+        in_place=True)
+    state = {
+        'time': timedelta(0),
+        'air_temperature': DataArray(
+            np.ones((3, 4)), dims=['lat', 'lon'], attrs={'units': 'K'}),
+    }
+    stepper(state, timedelta(hours=1))
+    state['air_temperature'] = DataArray(
+        np.ones((3, 5)), dims=['lat', 'lon'], attrs={'units': 'K'})
+    with pytest.raises(InvalidStateError):
+        stepper(state, timedelta(hours=1))
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
@@ -1,7 +1,8 @@
 from sympl._core.tracers import TracerPacker, reset_tracers, reset_packers
 from sympl import (
     TendencyComponent, Stepper, DiagnosticComponent, ImplicitTendencyComponent, register_tracer,
-    get_tracer_unit_dict, units_are_compatible, DataArray, InvalidPropertyDictError
+    get_tracer_unit_dict, units_are_compatible, DataArray, InvalidPropertyDictError,
+    TendencyComponentComposite
 )
 import unittest
 import numpy as np
@@ -234,6 +235,14 @@ class RegisterTracerTests(unittest.TestCase):
         with self.assertRaises(ValueError):
             register_tracer('tracer1', 'degK')
 
+    def test_composite_properties_update_on_register(self):
+        composite = TendencyComponentComposite(MockTracerTendencyComponent())
+        assert 'tracer1' not in composite.input_properties
+        register_tracer('tracer1', 'm')
+        assert 'tracer1' in composite.input_properties
+        reset_tracers()
+        assert 'tracer1' not in composite.input_properties
+
 
 class TracerPackerBase(object):
 
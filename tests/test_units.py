@@ -1,4 +1,9 @@
-from sympl import units_are_same, units_are_compatible, is_valid_unit
+import numpy as np
+import pytest
+from pint.errors import DimensionalityError
+from sympl import units_are_same, units_are_compatible, is_valid_unit, DataArray
+from sympl._core.units import (
+    clear_unit_caches, from_unit_to_another, get_conversion_factors)
 
 
 def test_is_valid_unit_meters():
@@ -22,3 +27,60 @@ def test_units_are_same_meters():
 def test_is_valid_unit_invalid_values():
     assert not is_valid_unit('george')
     assert not is_valid_unit('boop')
+
+
+def test_get_conversion_factors_scale():
+    scale, offset = get_conversion_factors('km', 'm')
+    assert scale == 1000.
+    assert offset == 0.
+
+
+def test_get_conversion_factors_offset():
+    scale, offset = get_conversion_factors('degC', 'degF')
+    assert np.isclose(scale, 1.8)
+    assert np.isclose(offset, 32.)
+
+
+def test_get_conversion_factors_incompatible_units():
+    with pytest.raises(DimensionalityError):
+        get_conversion_factors('m', 'm/s')
+
+
+def test_get_conversion_factors_is_cached():
+    clear_unit_caches()
+    get_conversion_factors('km', 'm')
+    get_conversion_factors('km', 'm')
+    info = get_conversion_factors.cache_info()
+    assert info.misses == 1
+    assert info.hits == 1
+
+
+def test_units_are_same_is_cached():
+    clear_unit_caches()
+    assert units_are_same('m', 'meter')
+    assert units_are_same('m', 'meter')
+    info = units_are_same.cache_info()
+    assert info.misses == 1
+    assert info.hits == 1
+
+
+def test_from_unit_to_another():
+    result = from_unit_to_another(np.array([0., 100.]), 'degC', 'K')
+    assert np.allclose(result, [273.15, 373.15])
+
+
+def test_data_array_to_units_keeps_coords_and_attrs():
+    array = DataArray(
+        np.array([1., 2.]), dims=['x'], coords={'x': [10, 20]},
+        attrs={'units': 'km', 'long_name': 'height'})
+    result = array.to_units('m')
+    assert np.all(result.values == [1000., 2000.])
+    assert np.all(result.coords['x'].values == [10, 20])
+    assert result.attrs == {'units': 'm', 'long_name': 'height'}
+    assert array.attrs['units'] == 'km'
+    assert np.all(array.values == [1., 2.])
+
+
+def test_data_array_to_units_same_units_returns_input():
+    array = DataArray(np.array([1., 2.]), dims=['x'], attrs={'units': 'm'})
+    assert array.to_units('meter') is array
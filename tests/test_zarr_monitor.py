@@ -0,0 +1,166 @@
+import multiprocessing
+import pytest
+import numpy as np
+import xarray as xr
+from datetime import datetime, timedelta
+from sympl import (
+    ZarrMonitor, DataArray, InvalidStateError, stack_ensemble_members)
+
+zarr = pytest.importorskip('zarr')
+
+nx = 4
+nz = 3
+
+
+def get_state(time=datetime(2013, 7, 20), offset=0.):
+    random = np.random.RandomState(0)
+    return {
+        'time': time,
+        'air_temperature': DataArray(
+            random.randn(nx, nz) + offset, dims=['lon', 'mid_levels'],
+            attrs={'units': 'degK', 'long_name': 'air_temperature'}),
+        'surface_pressure': DataArray(
+            random.randn(nx) + offset, dims=['lon'], attrs={'units': 'Pa'}),
+    }
+
+
+def test_zarr_monitor_appends_states(tmpdir):
+    path = str(tmpdir.join('out.zarr'))
+    monitor = ZarrMonitor(path, aliases={'air_temperature': 'T'})
+    for i in range(3):
+        monitor.store(get_state(datetime(2013, 7, 20, i), offset=i))
+    with ZarrMonitor(path, aliases={'air_temperature': 'T'}) as monitor:
+        monitor.store(get_state(datetime(2013, 7, 20, 3), offset=3))
+    ds = xr.open_zarr(path, consolidated=False)
+    assert set(ds.data_vars) == {'T', 'surface_pressure'}
+    assert ds['T'].dims == ('time', 'lon', 'mid_levels')
+    assert ds['T'].attrs['units'] == 'degK'
+    assert np.all(
+        ds['time'].values ==
+        [np.datetime64(datetime(2013, 7, 20, i)) for i in range(4)])
+    for i in range(4):
+        assert np.allclose(
+            ds['T'].values[i], get_state(offset=i)['air_temperature'].values)
+
+
+def test_zarr_monitor_timedelta_and_store_names(tmpdir):
+    path = str(tmpdir.join('out.zarr'))
+    monitor = ZarrMonitor(
+        path, time_units='hours', store_names=['surface_pressure'])
+    for i in range(2):
+        monitor.store(get_state(timedelta(hours=6 * i)))
+    monitor.close()
+    group = zarr.open_group(store=path, mode='r')
+    assert 'air_temperature' not in group
+    assert np.all(group['time'][:] == [0., 6.])
+    assert group['time'].attrs['units'] == 'hours'
+
+
+def test_zarr_monitor_initialize_does_not_resize(tmpdir):
+    path = str(tmpdir.join('out.zarr'))
+    monitor = ZarrMonitor(path)
+    monitor.initialize(get_state(), n_times=3)
+    assert zarr.open_group(store=path, mode='r')['air_temperature'].shape == (
+        3, nx, nz)
+    for i in range(2):
+        monitor.store(get_state(datetime(2013, 7, 20, i), offset=i))
+    group = zarr.open_group(store=path, mode='r')
+    assert group['air_temperature'].shape == (3, nx, nz)
+    assert np.all(np.isnan(group['air_temperature'][2]))
+    assert np.isnan(group['time'][2])
+    for i in range(2):
+        monitor.store(get_state(datetime(2013, 7, 20, 2 + i), offset=2 + i))
+    assert zarr.open_group(store=path, mode='r')['time'].shape == (6,)
+    monitor.close()
+    assert zarr.open_group(store=path, mode='r')['time'].shape == (4,)
+
+
+def test_zarr_monitor_grows_arrays_in_blocks(tmpdir):
+    path = str(tmpdir.join('out.zarr'))
+    monitor = ZarrMonitor(path)
+    lengths = []
+    for i in range(9):
+        monitor.store(get_state(datetime(2013, 7, 20, i), offset=i))
+        lengths.append(
+            zarr.open_group(store=path, mode='r')['air_temperature'].shape[0])
+    assert lengths == [1, 2, 4, 4, 8, 8, 8, 8, 16]
+    assert np.all(np.isnan(zarr.open_group(store=path, mode='r')['time'][9:]))
+    # a new monitor continues after the times stored
+    with ZarrMonitor(path) as new_monitor:
+        new_monitor.store(get_state(datetime(2013, 7, 20, 9), offset=9))
+    ds = xr.open_zarr(path, consolidated=False)
+    assert len(ds['time']) == 10
+    assert np.allclose(
+        ds['air_temperature'].values[9],
+        get_state(offset=9)['air_temperature'].values)
+    monitor.close()
+    assert zarr.open_group(store=path, mode='r')['time'].shape == (10,)
+
+
+def test_zarr_monitor_raises_when_names_change(tmpdir):
+    monitor = ZarrMonitor(str(tmpdir.join('out.zarr')))
+    state = get_state()
+    monitor.store(state)
+    state['air_density'] = state['surface_pressure']
+    with pytest.raises(InvalidStateError):
+        monitor.store(state)
+
+
+def test_zarr_monitor_region_requires_initialize(tmpdir):
+    monitor = ZarrMonitor(str(tmpdir.join('out.zarr')), region={'ensemble': 0})
+    with pytest.raises(InvalidStateError):
+        monitor.store(get_state())
+
+
+def store_member(path, index, n_times):
+    monitor = ZarrMonitor(path, region={'ensemble': index})
+    for i in range(n_times):
+        monitor.store(
+            get_state(datetime(2013, 7, 20, i), offset=10 * index + i))
+
+
+def test_zarr_monitor_ensemble_regions_in_processes(tmpdir):
+    path = str(tmpdir.join('out.zarr'))
+    n_members = 3
+    ensemble_state = stack_ensemble_members(
+        [get_state() for _ in range(n_members)])
+    ZarrMonitor(path, chunks={'ensemble': 1}).initialize(
+        ensemble_state, n_times=2)
+    processes = [
+        multiprocessing.get_context('fork').Process(
+            target=store_member, args=(path, index, 2))
+        for index in range(n_members)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+    ds = xr.open_zarr(path, consolidated=False)
+    assert ds['air_temperature'].dims == (
+        'time', 'ensemble', 'lon', 'mid_levels')
+    assert len(ds['time']) == 2
+    for index in range(n_members):
+        for i in range(2):
+            assert np.allclose(
+                ds['air_temperature'].values[i, index],
+                get_state(offset=10 * index + i)['air_temperature'].values)
+
+
+def test_zarr_monitor_subdomain_regions(tmpdir):
+    path = str(tmpdir.join('out.zarr'))
+    state = get_state()
+    ZarrMonitor(path, chunks={'lon': 2}).initialize(state, n_times=1)
+    for start in (2, 0):
+        region = {'lon': slice(start, start + 2)}
+        subdomain_state = {
+            name: value.isel(**region) if name != 'time' else value
+            for name, value in state.items()}
+        ZarrMonitor(path, region=region).store(subdomain_state)
+    ds = xr.open_zarr(path, consolidated=False)
+    assert np.all(
+        ds['air_temperature'].values[0] == state['air_temperature'].values)
+    assert ds['time'].values[0] == np.datetime64(state['time'])
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])